@@ -0,0 +1,141 @@
+"""
+Benchmark: Leselatenz der Trade-Abfragen auf dem Tick-Schema v3 (ReplacingMergeTree)
+mit und ohne Duplikate.
+
+Lädt serverseitig (numbers()) --rows eindeutige Trades (50 Symbole) in eine eigene
+Datenbank und fügt danach einen Anteil --dup-ratio noch einmal ein (wie ein zweiter
+Backfill bzw. eine Gap-Recovery). Gemessen wird jede Abfrage in drei Varianten:
+  plain     ORDER BY ts DESC                         (liefert Duplikate mit)
+  final     FROM trades FINAL                        (Merge beim Lesen)
+  limit_by  ORDER BY ..., version DESC LIMIT 1 BY    (db/clickhouse.py)
+einmal mit Duplikaten und einmal nach OPTIMIZE ... FINAL (Compaction).
+
+    python benchmarks/bench_dedup_reads.py --rows 20000000 --dup-ratio 0.2
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from db.pool import get_client  # noqa: E402
+
+DB = "bench_dedup"
+NO_TIMEOUT = {"max_execution_time": 0}
+START_MS = 1_700_000_000_000
+STEP_MS = 2
+SCHEMA_SQL = os.path.join(os.path.dirname(__file__), "..", "db", "migrations", "20250707_tick_schema_v3_dedup.sql")
+
+GENERATOR = """
+SELECT
+    concat('SYM', toString(number % 50), 'USDT')                                    AS symbol,
+    'spot'                                                                           AS market,
+    round(100 * (1 + number % 50) + (cityHash64(number) % 100) / 100, 2)             AS price,
+    round((cityHash64(number, 1) % 100000) / 10000, 4)                               AS size,
+    if(cityHash64(number, 2) % 2 = 0, 'buy', 'sell')                                 AS side,
+    fromUnixTimestamp64Milli(toInt64({start} + number * {step}))                     AS ts
+FROM numbers({offset}, {count})
+WHERE {where}
+"""
+
+VARIANTS = {
+    "plain": ("{db}.trades", " ORDER BY ts DESC"),
+    "final": ("{db}.trades FINAL", " ORDER BY ts DESC"),
+    "limit_by": ("{db}.trades", " ORDER BY ts DESC, trade_id, version DESC LIMIT 1 BY ts, trade_id"),
+}
+
+QUERIES = {
+    "last_1000_trades": """
+        SELECT symbol, market, price, size, side, ts FROM {src}
+        WHERE symbol = 'SYM7USDT' AND market = 'spot'{tail} LIMIT 1000
+    """,
+    "page_1000_deep": """
+        SELECT symbol, market, price, size, side, ts FROM {src}
+        WHERE symbol = 'SYM7USDT' AND market = 'spot' AND ts <= fromUnixTimestamp64Milli(toInt64({mid_ms})){tail}
+        LIMIT 1000 OFFSET 5000
+    """,
+    "one_hour_window": """
+        SELECT count(), sum(size) FROM (
+            SELECT size FROM {src}
+            WHERE symbol = 'SYM7USDT' AND market = 'spot'
+              AND ts >= fromUnixTimestamp64Milli(toInt64({mid_ms})) - INTERVAL 1 HOUR
+              AND ts < fromUnixTimestamp64Milli(toInt64({mid_ms})){tail}
+        )
+    """,
+}
+
+
+def _ddl() -> str:
+    with open(SCHEMA_SQL, encoding="utf-8") as f:
+        lines = [line for line in f if not line.lstrip().startswith("--")]
+    for stmt in "".join(lines).split(";"):
+        if "trades_v3" in stmt:
+            return stmt.replace("IF NOT EXISTS trades_v3", f"{DB}.trades")
+    raise RuntimeError("trades_v3 DDL not found")
+
+
+def setup(rows: int, dup_ratio: float, chunk: int):
+    with get_client() as client:
+        client.command(f"DROP DATABASE IF EXISTS {DB}")
+        client.command(f"CREATE DATABASE {DB}")
+        client.command(_ddl())
+        columns = "(symbol, market, price, size, side, ts)"
+        started = time.perf_counter()
+        for offset in range(0, rows, chunk):
+            sql = GENERATOR.format(start=START_MS, step=STEP_MS, offset=offset, count=min(chunk, rows - offset), where="1")
+            client.command(f"INSERT INTO {DB}.trades {columns} {sql}", settings=NO_TIMEOUT)
+        client.command(f"OPTIMIZE TABLE {DB}.trades FINAL", settings=NO_TIMEOUT)
+        print(f"loaded {rows:,} unique rows in {time.perf_counter() - started:.1f}s")
+
+        # Duplikate als eigene Parts (wie ein wiederholter Backfill); Merges anhalten, damit sie liegen bleiben
+        client.command(f"SYSTEM STOP MERGES {DB}.trades")
+        every = max(int(round(1 / dup_ratio)), 1) if dup_ratio > 0 else 0
+        if every:
+            for offset in range(0, rows, chunk):
+                sql = GENERATOR.format(start=START_MS, step=STEP_MS, offset=offset, count=min(chunk, rows - offset),
+                                       where=f"number % {every} = 0")
+                client.command(f"INSERT INTO {DB}.trades {columns} {sql}", settings=NO_TIMEOUT)
+        total = client.query(f"SELECT count() FROM {DB}.trades").result_rows[0][0]
+        print(f"inserted {total - rows:,} duplicate rows ({(total - rows) / max(total, 1):.1%} of {total:,})")
+
+
+def measure(label: str, rows: int, repeats: int):
+    mid_ms = START_MS + STEP_MS * rows // 2
+    print(f"\n[{label}]")
+    print(f"{'query':<20} {'variant':<9} {'median ms':>10} {'read MB':>9} {'rows':>8}")
+    for name, template in QUERIES.items():
+        for variant, (src, tail) in VARIANTS.items():
+            sql = template.format(src=src.format(db=DB), tail=tail, mid_ms=mid_ms)
+            timings, read_bytes, result_rows = [], 0, 0
+            for _ in range(repeats):
+                started = time.perf_counter()
+                with get_client() as client:
+                    result = client.query(sql, settings={"use_query_cache": 0, **NO_TIMEOUT})
+                timings.append((time.perf_counter() - started) * 1000)
+                read_bytes = int(result.summary.get("read_bytes", 0))
+                result_rows = result.result_rows[0][0] if name == "one_hour_window" else len(result.result_rows)
+            print(f"{name:<20} {variant:<9} {statistics.median(timings):>10.1f} {read_bytes / 1e6:>9.1f} {result_rows:>8}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=20_000_000)
+    parser.add_argument("--dup-ratio", type=float, default=0.2, help="Anteil der Zeilen, die doppelt eingefügt werden")
+    parser.add_argument("--chunk", type=int, default=10_000_000)
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--keep", action="store_true", help="Benchmark-Datenbank nicht löschen")
+    args = parser.parse_args()
+
+    setup(args.rows, args.dup_ratio, args.chunk)
+    measure("with duplicates", args.rows, args.repeats)
+    with get_client() as client:
+        client.command(f"SYSTEM START MERGES {DB}.trades")
+        started = time.perf_counter()
+        client.command(f"OPTIMIZE TABLE {DB}.trades FINAL", settings=NO_TIMEOUT)
+        print(f"\nOPTIMIZE FINAL (compaction) took {time.perf_counter() - started:.1f}s")
+    measure("after compaction", args.rows, args.repeats)
+    if not args.keep:
+        with get_client() as client:
+            client.command(f"DROP DATABASE IF EXISTS {DB}")
@@ -0,0 +1,105 @@
+"""
+Benchmark: Latenz paralleler /ohlc-Requests, während ein WS-Broadcast läuft.
+
+Läuft gegen eine laufende API (inkl. ClickHouse):
+    python benchmarks/bench_ohlc_latency.py --api http://localhost:8100 --clients 200 --requests 2000
+
+- öffnet --clients WebSockets auf /ws/{symbol}/{market}
+- publiziert über POST /publish fortlaufend Trades (Broadcast an alle WS-Clients)
+- feuert parallel --requests /ohlc-Aufrufe mit --concurrency gleichzeitigen Requests
+- gibt p50/p95/p99/max der /ohlc-Latenz und die Zahl empfangener WS-Nachrichten aus
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from datetime import datetime, timezone
+
+import httpx
+import websockets
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    if not values:
+        return 0.0
+    k = min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))
+    return values[k]
+
+
+async def ws_client(url: str, counter: list, stop: asyncio.Event):
+    async with websockets.connect(url, max_size=None) as ws:
+        while not stop.is_set():
+            try:
+                await asyncio.wait_for(ws.recv(), timeout=0.5)
+                counter[0] += 1
+            except asyncio.TimeoutError:
+                continue
+
+
+async def publisher(client: httpx.AsyncClient, symbol: str, market: str, rate: float, stop: asyncio.Event):
+    interval = 1.0 / rate
+    price = 60000.0
+    while not stop.is_set():
+        price += 0.5
+        await client.post("/publish", json={
+            "symbol": symbol,
+            "market": market,
+            "price": price,
+            "size": 0.01,
+            "side": "buy",
+            "ts": datetime.now(timezone.utc).isoformat(),
+        })
+        await asyncio.sleep(interval)
+
+
+async def ohlc_load(client: httpx.AsyncClient, symbol: str, market: str, total: int, concurrency: int):
+    latencies = []
+    sem = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with sem:
+            start = time.perf_counter()
+            r = await client.get("/ohlc", params={"symbol": symbol, "market": market, "limit": 500})
+            latencies.append((time.perf_counter() - start) * 1000)
+            r.raise_for_status()
+
+    await asyncio.gather(*(one() for _ in range(total)))
+    return latencies
+
+
+async def main(args):
+    ws_base = args.api.replace("http", "ws", 1)
+    ws_url = f"{ws_base}/ws/{args.symbol}/{args.market}"
+    stop = asyncio.Event()
+    received = [0]
+
+    limits = httpx.Limits(max_connections=args.concurrency + 10)
+    async with httpx.AsyncClient(base_url=args.api, timeout=30.0, limits=limits) as client:
+        ws_tasks = [asyncio.create_task(ws_client(ws_url, received, stop)) for _ in range(args.clients)]
+        await asyncio.sleep(1.0)
+        pub_task = asyncio.create_task(publisher(client, args.symbol, args.market, args.publish_rate, stop))
+
+        start = time.perf_counter()
+        latencies = await ohlc_load(client, args.symbol, args.market, args.requests, args.concurrency)
+        wall = time.perf_counter() - start
+
+        stop.set()
+        await asyncio.gather(pub_task, *ws_tasks, return_exceptions=True)
+
+    print(f"/ohlc requests: {len(latencies)} in {wall:.2f}s ({len(latencies) / wall:.0f} req/s), "
+          f"{args.clients} WS clients, {received[0]} WS messages received")
+    print(f"latency ms: p50={percentile(latencies, 50):.1f} p95={percentile(latencies, 95):.1f} "
+          f"p99={percentile(latencies, 99):.1f} max={max(latencies):.1f} mean={statistics.mean(latencies):.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--api", default="http://localhost:8100")
+    parser.add_argument("--symbol", default="BTCUSDT")
+    parser.add_argument("--market", default="spot")
+    parser.add_argument("--clients", type=int, default=200)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--publish-rate", type=float, default=200.0, help="Trades/s über /publish")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,137 @@
+"""
+Benchmark: Speicherbedarf und Scan-Kosten altes vs. v2-Tick-Schema.
+
+Erzeugt serverseitig (numbers()) einen synthetischen Datensatz mit --rows Trades
+(Default 100M, 50 Symbole, ~500 Trades/s) einmal im alten Layout
+(20250701_init_bitget_tables.sql) und einmal im v2-Layout
+(20250703_tick_schema_v2.sql) in einer eigenen Datenbank und vergleicht:
+  - komprimierte / unkomprimierte Bytes je Tabelle und Spalte
+  - Laufzeit und gelesene Bytes typischer Abfragen (OHLC 1m, letzter Trades, Full-Scan)
+
+    python benchmarks/bench_tick_schema.py --rows 100000000
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from db.pool import get_client  # noqa: E402
+
+DB = "bench_ticks"
+NO_TIMEOUT = {"max_execution_time": 0}
+START_MS = 1_700_000_000_000
+STEP_MS = 2  # ~500 Trades/s über alle Symbole
+
+OLD_DDL = f"""
+CREATE TABLE {DB}.trades_v1 (
+    symbol String, market String, price Float64, size Float64, side String, ts DateTime
+) ENGINE = MergeTree() ORDER BY (symbol, market, ts)
+"""
+
+NEW_DDL = f"""
+CREATE TABLE {DB}.trades_v2 (
+    symbol   LowCardinality(String),
+    market   LowCardinality(String),
+    price    Float64        CODEC(Gorilla, ZSTD(1)),
+    size     Float64        CODEC(ZSTD(1)),
+    side     LowCardinality(String),
+    ts       DateTime64(3)  CODEC(DoubleDelta, ZSTD(1))
+) ENGINE = MergeTree() PARTITION BY toYYYYMM(ts) ORDER BY (symbol, market, ts)
+"""
+
+# Gemeinsamer Generator: 50 Symbole, Preise als Random-Walk-ähnliche Kurve je Symbol
+GENERATOR = """
+SELECT
+    concat('SYM', toString(number % 50), 'USDT')                                    AS symbol,
+    'spot'                                                                           AS market,
+    round(100 * (1 + number % 50) * (1 + 0.05 * sin(number / 2000000)) + (cityHash64(number) % 100) / 100, 2) AS price,
+    round((cityHash64(number, 1) % 100000) / 10000, 4)                               AS size,
+    if(cityHash64(number, 2) % 2 = 0, 'buy', 'sell')                                 AS side,
+    {ts_expr}                                                                        AS ts
+FROM numbers({offset}, {count})
+"""
+
+QUERIES = {
+    "ohlc_1m_one_symbol_one_day": """
+        SELECT toStartOfMinute(ts) AS m, argMin(price, ts), max(price), min(price), argMax(price, ts), sum(size)
+        FROM {table} WHERE symbol = 'SYM7USDT' AND market = 'spot'
+          AND ts >= toDateTime(1700100000) AND ts < toDateTime(1700186400)
+        GROUP BY m ORDER BY m
+    """,
+    "last_1000_trades": """
+        SELECT * FROM {table} WHERE symbol = 'SYM7USDT' AND market = 'spot' ORDER BY ts DESC LIMIT 1000
+    """,
+    "full_scan_vwap_by_symbol": """
+        SELECT symbol, sum(price * size) / sum(size), count() FROM {table} GROUP BY symbol
+    """,
+}
+
+
+def setup(rows: int, chunk: int):
+    with get_client() as client:
+        client.command(f"DROP DATABASE IF EXISTS {DB}")
+        client.command(f"CREATE DATABASE {DB}")
+        client.command(OLD_DDL)
+        client.command(NEW_DDL)
+        for table, ts_expr in (
+            ("trades_v1", f"toDateTime(intDiv({START_MS} + number * {STEP_MS}, 1000))"),
+            ("trades_v2", f"fromUnixTimestamp64Milli(toInt64({START_MS} + number * {STEP_MS}))"),
+        ):
+            started = time.perf_counter()
+            for offset in range(0, rows, chunk):
+                sql = GENERATOR.format(ts_expr=ts_expr, offset=offset, count=min(chunk, rows - offset))
+                client.command(f"INSERT INTO {DB}.{table} {sql}", settings=NO_TIMEOUT)
+            client.command(f"OPTIMIZE TABLE {DB}.{table} FINAL", settings=NO_TIMEOUT)
+            print(f"loaded {rows:,} rows into {table} in {time.perf_counter() - started:.1f}s")
+
+
+def storage_report():
+    with get_client() as client:
+        result = client.query(f"""
+            SELECT table, name, sum(data_compressed_bytes), sum(data_uncompressed_bytes)
+            FROM system.columns WHERE database = '{DB}'
+            GROUP BY table, name ORDER BY table, name
+        """)
+    totals = {}
+    print(f"\n{'table':<10} {'column':<8} {'compressed':>14} {'uncompressed':>14} {'ratio':>7}")
+    for table, column, comp, uncomp in result.result_rows:
+        totals.setdefault(table, [0, 0])
+        totals[table][0] += comp
+        totals[table][1] += uncomp
+        print(f"{table:<10} {column:<8} {comp:>14,} {uncomp:>14,} {uncomp / max(comp, 1):>7.1f}")
+    for table, (comp, uncomp) in totals.items():
+        print(f"{table:<10} {'TOTAL':<8} {comp:>14,} {uncomp:>14,} {uncomp / max(comp, 1):>7.1f}")
+    return totals
+
+
+def scan_report(repeats: int):
+    print(f"\n{'query':<30} {'table':<10} {'median ms':>10} {'read MB':>10}")
+    for name, template in QUERIES.items():
+        for table in ("trades_v1", "trades_v2"):
+            timings, read_bytes = [], 0
+            for _ in range(repeats):
+                started = time.perf_counter()
+                with get_client() as client:
+                    result = client.query(template.format(table=f"{DB}.{table}"), settings={"use_query_cache": 0, **NO_TIMEOUT})
+                timings.append((time.perf_counter() - started) * 1000)
+                read_bytes = int(result.summary.get("read_bytes", 0))
+            print(f"{name:<30} {table:<10} {statistics.median(timings):>10.1f} {read_bytes / 1e6:>10.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100_000_000)
+    parser.add_argument("--chunk", type=int, default=10_000_000)
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--keep", action="store_true", help="Benchmark-Datenbank nicht löschen")
+    args = parser.parse_args()
+
+    setup(args.rows, args.chunk)
+    storage_report()
+    scan_report(args.repeats)
+    if not args.keep:
+        with get_client() as client:
+            client.command(f"DROP DATABASE IF EXISTS {DB}")
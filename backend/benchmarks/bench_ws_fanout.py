@@ -0,0 +1,91 @@
+"""
+Benchmark: Broadcast-Pfad des PerformantWebSocketManager (core/ws/ws_handler.py) mit vielen Clients.
+
+Ersetzt die Sockets durch In-Process-Attrappen (send_text schläft --send-ms, ein Anteil
+--slow-ratio hängt --slow-ms), verteilt --clients auf --symbols und schickt --ticks Ticks
+mit je einer Nachricht pro Symbol. Gemessen werden die Dauer eines Ticks im Batch-Loop
+(Hand-off an alle Clients), die Fan-out-Latenz bis zum letzten Send, CPU und Evictions.
+
+    python benchmarks/bench_ws_fanout.py --clients 10000 --symbols 50 --slow-ratio 0.01
+"""
+import argparse
+import asyncio
+import os
+import random
+import resource
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from core.ws.ws_handler import PerformantWebSocketManager  # noqa: E402
+
+
+class FakeSocket:
+    def __init__(self, send_s: float):
+        self.send_s = send_s
+        self.bytes = 0
+
+    async def accept(self, subprotocol=None):
+        pass
+
+    async def send_text(self, text: str):
+        await asyncio.sleep(self.send_s)
+        self.bytes += len(text)
+
+    async def close(self, code: int = 1000, reason: str = ""):
+        pass
+
+
+def _message(symbol: str, i: int) -> dict:
+    return {"type": "trade", "symbol": symbol, "market": "spot", "price": 60000.0 + i, "size": 0.01,
+            "side": "buy", "ts": "2025-07-01T00:00:00+00:00", "server_time": int(time.time() * 1000)}
+
+
+async def run(args):
+    manager = PerformantWebSocketManager(batch_interval_ms=args.interval_ms, debounce_ms=0,
+                                         send_timeout_ms=args.timeout_ms, max_send_timeouts=3)
+    symbols = [f"SYM{i}USDT" for i in range(args.symbols)]
+    for i in range(args.clients):
+        slow = random.random() < args.slow_ratio
+        await manager.connect(FakeSocket((args.slow_ms if slow else args.send_ms) / 1000), symbols[i % len(symbols)])
+
+    cpu_started = time.process_time()
+    handoff_ms = []
+    for i in range(args.ticks):
+        for symbol in symbols:
+            await manager.broadcast_to_symbol(symbol, _message(symbol, i))
+        started = time.perf_counter()
+        manager._watchdog()
+        manager.broadcast_tick()
+        handoff_ms.append((time.perf_counter() - started) * 1000)
+        await asyncio.sleep(args.interval_ms / 1000)
+    await asyncio.sleep(max(args.timeout_ms, args.send_ms) / 1000 + 0.2)
+    cpu_s = time.process_time() - cpu_started
+
+    metrics = manager.get_metrics()
+    fanout = metrics["fanout"]
+    handoff_ms.sort()
+    print(f"clients={args.clients} symbols={args.symbols} ticks={args.ticks} slow={args.slow_ratio:.1%}")
+    print(f"tick hand-off  median {statistics.median(handoff_ms):.2f}ms  p99 {handoff_ms[int(len(handoff_ms) * 0.99) - 1]:.2f}ms"
+          f"  max {handoff_ms[-1]:.2f}ms")
+    print(f"fan-out        p50 {fanout['p50_ms']}ms  p99 {fanout['p99_ms']}ms  max {fanout['max_ms']}ms")
+    print(f"sent {metrics['messages_sent']:,}  encodes {metrics['encodes']:,}  superseded {metrics['superseded']:,}  "
+          f"timeouts {metrics['send_timeouts']:,}  evicted {metrics['evicted']:,}")
+    print(f"CPU {cpu_s:.2f}s  max RSS {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.0f} MB")
+    await manager.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=10_000)
+    parser.add_argument("--symbols", type=int, default=50)
+    parser.add_argument("--ticks", type=int, default=100)
+    parser.add_argument("--interval-ms", type=int, default=50)
+    parser.add_argument("--send-ms", type=float, default=1.0, help="Dauer eines normalen send_text")
+    parser.add_argument("--slow-ms", type=float, default=5000.0, help="Dauer eines send_text bei langsamen Clients")
+    parser.add_argument("--slow-ratio", type=float, default=0.01)
+    parser.add_argument("--timeout-ms", type=int, default=500)
+    args = parser.parse_args()
+    asyncio.run(run(args))
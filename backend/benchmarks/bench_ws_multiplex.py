@@ -0,0 +1,113 @@
+"""
+Benchmark: ein Socket je beobachtetem Symbol vs. ein Socket mit Abos (PerformantWebSocketManager).
+
+--users Clients beobachten je eine Watchlist von --watchlist Symbolen (aus --symbols):
+  per_symbol   ein Socket je (Client, Symbol), per URL an das Symbol gebunden (bisher)
+  multiplexed  ein Socket je Client, Symbole per subscribe auf den Channel "trades"
+Gemessen werden Verbindungen und Writer-Tasks, Speicher des Managers (tracemalloc), die
+Hand-off-Dauer eines Ticks, gesendete Frames und CPU für --ticks Ticks. Kernel-Puffer,
+TLS und Pings je echtem Socket kommen im Betrieb noch dazu und sind hier nicht enthalten.
+
+    python benchmarks/bench_ws_multiplex.py --users 200 --watchlist 50 --symbols 200
+"""
+import argparse
+import asyncio
+import logging
+import os
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from core.ws.ws_handler import PerformantWebSocketManager  # noqa: E402
+
+logging.getLogger("core.ws.ws_handler").setLevel(logging.WARNING)
+
+
+class FakeSocket:
+    def __init__(self):
+        self.frames = 0
+
+    async def accept(self, subprotocol=None):
+        pass
+
+    async def send_text(self, text: str):
+        self.frames += 1
+
+    async def close(self, code: int = 1000, reason: str = ""):
+        pass
+
+
+def _trade(symbol: str, i: int) -> dict:
+    return {"type": "trade", "symbol": symbol, "market": "spot", "price": 100.0 + i % 10, "size": 0.5,
+            "side": "buy", "ts": 1_751_328_000_000 + i}
+
+
+async def run(mode: str, watchlists, symbols, args) -> dict:
+    manager = PerformantWebSocketManager(debounce_ms=0)
+    sockets = []
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    for watchlist in watchlists:
+        if mode == "per_symbol":
+            for symbol in watchlist:
+                socket = FakeSocket()
+                sockets.append(socket)
+                await manager.connect(socket, symbol)
+        else:
+            socket = FakeSocket()
+            sockets.append(socket)
+            await manager.connect(socket)
+            manager.subscribe(socket, [(symbol, "trades") for symbol in watchlist], notify=False)
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    memory = sum(stat.size_diff for stat in after.compare_to(before, "filename"))
+
+    cpu_started = time.process_time()
+    handoff_ms = []
+    for i in range(args.ticks):
+        for symbol in symbols:
+            await manager.broadcast_to_symbol(symbol, _trade(symbol, i))
+        started = time.perf_counter()
+        manager.broadcast_tick()
+        handoff_ms.append((time.perf_counter() - started) * 1000)
+        await asyncio.sleep(0)
+        await asyncio.sleep(0.005)
+    await asyncio.sleep(0.2)
+    cpu_s = time.process_time() - cpu_started
+    tasks = len([t for t in asyncio.all_tasks() if t is not asyncio.current_task()])
+    result = {
+        "connections": manager.get_connection_count(),
+        "tasks": tasks,
+        "memory_mb": memory / 1e6,
+        "handoff_ms": statistics.median(handoff_ms),
+        "frames": sum(s.frames for s in sockets),
+        "cpu_s": cpu_s,
+    }
+    await manager.stop()
+    return result
+
+
+async def main(args):
+    random.seed(1)
+    symbols = [f"SYM{i}USDT" for i in range(args.symbols)]
+    watchlists = [random.sample(symbols, args.watchlist) for _ in range(args.users)]
+    print(f"users={args.users} watchlist={args.watchlist} symbols={args.symbols} ticks={args.ticks}")
+    print(f"{'mode':<12} {'sockets':>8} {'tasks':>7} {'memory MB':>10} {'hand-off ms':>12} {'frames':>9} {'CPU s':>7}")
+    for mode in ("per_symbol", "multiplexed"):
+        r = await run(mode, watchlists, symbols, args)
+        print(f"{mode:<12} {r['connections']:>8,} {r['tasks']:>7,} {r['memory_mb']:>10.1f} {r['handoff_ms']:>12.2f} "
+              f"{r['frames']:>9,} {r['cpu_s']:>7.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--watchlist", type=int, default=50, help="Symbole je Client")
+    parser.add_argument("--symbols", type=int, default=200)
+    parser.add_argument("--ticks", type=int, default=50)
+    args = parser.parse_args()
+    asyncio.run(main(args))
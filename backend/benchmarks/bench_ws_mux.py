@@ -0,0 +1,173 @@
+"""
+Benchmark: CPU/Speicher des Bitget-Collectors – eine WS-Verbindung pro Symbol
+(BitgetCollector) vs. gemultiplexte Verbindungen (BitgetMuxCollector).
+
+Startet einen lokalen Ersatz-WS-Server (eigener Prozess), der das Bitget-v1-Protokoll
+nachbildet (op=subscribe/unsubscribe, action=update mit [ts, price, size, side])
+und für jede abonnierte instId --rate Updates/s schickt. Jedes Design läuft in einem
+frischen Prozess ohne ClickHouse (persist=False):
+
+    python benchmarks/bench_ws_mux.py --symbols 300 --rate 5 --duration 30
+
+Ausgabe je Design: Verbindungen, empfangene Trades, CPU-Sekunden (Prozess), RSS.
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing as mp
+import os
+import resource
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+
+# ----- Ersatz-Server -----
+
+async def _serve_connection(ws, rate: float):
+    subscribed = set()
+
+    async def reader():
+        async for message in ws:
+            if message == "ping":
+                await ws.send("pong")
+                continue
+            msg = json.loads(message)
+            for arg in msg.get("args", []):
+                if msg.get("op") == "subscribe":
+                    subscribed.add((arg["instType"], arg["channel"], arg["instId"]))
+                elif msg.get("op") == "unsubscribe":
+                    subscribed.discard((arg["instType"], arg["channel"], arg["instId"]))
+
+    read_task = asyncio.create_task(reader())
+    price = 100.0
+    try:
+        while not read_task.done():
+            ts = int(time.time() * 1000)
+            price += 0.01
+            for inst_type, channel, inst_id in list(subscribed):
+                await ws.send(json.dumps({
+                    "action": "update",
+                    "arg": {"instType": inst_type, "channel": channel, "instId": inst_id},
+                    "data": [[str(ts), f"{price:.2f}", "0.0100", "buy"]],
+                }))
+            await asyncio.sleep(1.0 / rate)
+    except Exception:
+        pass
+    finally:
+        read_task.cancel()
+
+
+def run_server(port: int, rate: float):
+    import websockets
+
+    async def main():
+        async with websockets.serve(lambda ws: _serve_connection(ws, rate), "127.0.0.1", port, max_queue=None):
+            await asyncio.Future()
+
+    asyncio.run(main())
+
+
+# ----- Clients -----
+
+def _rss_mb() -> float:
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+async def _run_design(design: str, url: str, symbols: int, per_connection: int, warmup: float, duration: float) -> dict:
+    from exchanges.bitget.collector import BitgetCollector, BitgetMuxCollector
+
+    received = [0]
+
+    async def sink(_trade):
+        received[0] += 1
+
+    names = [f"SYM{i}USDT" for i in range(symbols)]
+    tasks, queue, mux = [], asyncio.Queue(), None
+    if design == "per-symbol":
+        async def drain():
+            while True:
+                await queue.get()
+                received[0] += 1
+        tasks.append(asyncio.create_task(drain()))
+        for name in names:
+            collector = BitgetCollector(name, "spot", queue, persist=False)
+            collector._ws_url = url
+            tasks.append(asyncio.create_task(collector.start()))
+        connections = symbols
+    else:
+        mux = BitgetMuxCollector(max_per_connection=per_connection, persist=False, ws_url=url)
+        for name in names:
+            await mux.add(name, "spot", sink)
+
+    await asyncio.sleep(warmup)
+    if mux is not None:
+        connections = mux.get_metrics()["connections"]
+    received[0] = 0
+    cpu0, wall0 = time.process_time(), time.perf_counter()
+    await asyncio.sleep(duration)
+    cpu, wall = time.process_time() - cpu0, time.perf_counter() - wall0
+    result = {
+        "design": design,
+        "connections": connections,
+        "trades": received[0],
+        "trades_per_s": received[0] / wall,
+        "cpu_s": cpu,
+        "cpu_pct": 100 * cpu / wall,
+        "rss_mb": _rss_mb(),
+    }
+    if mux is not None:
+        await mux.stop()
+    for task in tasks:
+        task.cancel()
+    return result
+
+
+def run_client(design, url, symbols, per_connection, warmup, duration, out):
+    out.put(asyncio.run(_run_design(design, url, symbols, per_connection, warmup, duration)))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--symbols", type=int, default=300)
+    parser.add_argument("--rate", type=float, default=5.0, help="Updates/s je instId")
+    parser.add_argument("--per-connection", type=int, default=50, help="max. instIds pro Mux-Verbindung")
+    parser.add_argument("--warmup", type=float, default=5.0)
+    parser.add_argument("--duration", type=float, default=30.0)
+    parser.add_argument("--port", type=int, default=18765)
+    args = parser.parse_args()
+
+    ctx = mp.get_context("spawn")
+    server = ctx.Process(target=run_server, args=(args.port, args.rate), daemon=True)
+    server.start()
+    time.sleep(1.0)
+
+    url = f"ws://127.0.0.1:{args.port}"
+    results = []
+    try:
+        for design in ("per-symbol", "mux"):
+            out = ctx.Queue()
+            proc = ctx.Process(target=run_client, args=(design, url, args.symbols, args.per_connection,
+                                                        args.warmup, args.duration, out))
+            proc.start()
+            results.append(out.get())
+            proc.join(timeout=10)
+            if proc.is_alive():
+                proc.terminate()
+    finally:
+        server.terminate()
+
+    print(f"{args.symbols} symbols x {args.rate} updates/s, {args.duration:.0f}s measured")
+    print(f"{'design':<12} {'conns':>6} {'trades/s':>10} {'cpu %':>8} {'cpu µs/trade':>13} {'rss MB':>8}")
+    for r in results:
+        per_trade = 1e6 * r["cpu_s"] / max(r["trades"], 1)
+        print(f"{r['design']:<12} {r['connections']:>6} {r['trades_per_s']:>10.0f} {r['cpu_pct']:>8.1f} "
+              f"{per_trade:>13.1f} {r['rss_mb']:>8.1f}")
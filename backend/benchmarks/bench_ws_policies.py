@@ -0,0 +1,134 @@
+"""
+Benchmark: Zustellregeln je Nachrichtentyp im PerformantWebSocketManager (core/ws/ws_handler.py).
+
+Schickt --seconds lang je Symbol --rate Nachrichten/s eines Typs (trade, book_delta, candle)
+an --clients Attrappen-Sockets und misst je Regel (lossless, merge, conflate):
+  msgs/s in     Nachrichten, die broadcast_to_symbol annimmt
+  frames/s      gesendete Frames je Client
+  items/s       beim Client angekommene Einträge (Trades in trades-Arrays, Levels in Book-Deltas)
+Für Trades muss items/s == msgs/s in sein (nichts geht verloren).
+
+    python benchmarks/bench_ws_policies.py --clients 200 --symbols 10 --rate 2000
+"""
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import time
+
+import orjson
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from core.ws.ws_handler import PerformantWebSocketManager  # noqa: E402
+
+logging.getLogger("core.ws.ws_handler").setLevel(logging.WARNING)
+
+KINDS = {"trade": "lossless", "book_delta": "merge", "candle": "conflate"}
+
+
+class FakeSocket:
+    def __init__(self, send_s: float):
+        self.send_s = send_s
+        self.frames = 0
+        self.items = 0
+        self.bytes = 0
+
+    async def accept(self, subprotocol=None):
+        pass
+
+    async def send_text(self, text: str):
+        if self.send_s:
+            await asyncio.sleep(self.send_s)
+        message = orjson.loads(text)
+        self.frames += 1
+        self.bytes += len(text)
+        if message["type"] == "trades":
+            self.items += len(message["data"])
+        elif message["type"] == "book_delta":
+            self.items += len(message["asks"]) + len(message["bids"])
+        else:
+            self.items += 1
+
+    async def close(self, code: int = 1000, reason: str = ""):
+        pass
+
+
+def _message(kind: str, symbol: str, i: int) -> dict:
+    ts = int(time.time() * 1000)
+    if kind == "trade":
+        return {"type": "trade", "symbol": symbol, "market": "spot", "price": 60000.0 + i % 100, "size": 0.01,
+                "side": "buy", "ts": ts}
+    if kind == "book_delta":
+        return {"type": "book_delta", "symbol": symbol, "market": "spot", "prev_seq": i, "seq": i + 1, "ts": ts,
+                "asks": [[f"{60000 + i % 50}.0", "1.5"]], "bids": [[f"{59999 - i % 50}.0", "0.7"]]}
+    return {"type": "candle", "symbol": symbol, "market": "spot", "resolution": "1m", "time": ts // 60000 * 60,
+            "open": 60000.0, "high": 60010.0, "low": 59990.0, "close": 60000.0 + i % 10, "volume": i}
+
+
+async def run_kind(kind: str, args) -> dict:
+    manager = PerformantWebSocketManager(batch_interval_ms=args.interval_ms, debounce_ms=args.debounce_ms,
+                                         max_batch_items=args.max_items, max_pending_frames=10_000)
+    await manager.start()
+    symbols = [f"SYM{i}USDT" for i in range(args.symbols)]
+    sockets = []
+    for i in range(args.clients):
+        socket = FakeSocket(args.send_ms / 1000)
+        sockets.append(socket)
+        await manager.connect(socket, symbols[i % len(symbols)])
+
+    step_s = 0.005
+    per_step = max(int(args.rate * step_s), 1)
+    offered = 0
+    started = time.perf_counter()
+    i = 0
+    while time.perf_counter() - started < args.seconds:
+        for _ in range(per_step):
+            for symbol in symbols:
+                await manager.broadcast_to_symbol(symbol, _message(kind, symbol, i))
+                offered += 1
+            i += 1
+        await asyncio.sleep(step_s)
+    await asyncio.sleep(args.interval_ms / 1000 * 3 + args.send_ms / 1000 * 10)
+    elapsed = time.perf_counter() - started
+    await manager.stop()
+
+    metrics = manager.get_metrics()
+    per_client_in = offered / len(symbols)
+    return {
+        "policy": KINDS[kind],
+        "in_per_s": offered / elapsed,
+        "accepted_per_s": metrics["messages_queued"] / elapsed,
+        "frames_per_s": sum(s.frames for s in sockets) / len(sockets) / elapsed,
+        "items_per_client": sum(s.items for s in sockets) / len(sockets),
+        "in_per_client": per_client_in,
+        "kb_per_s": sum(s.bytes for s in sockets) / len(sockets) / elapsed / 1024,
+        "evicted": metrics["evicted"],
+    }
+
+
+async def main(args):
+    print(f"clients={args.clients} symbols={args.symbols} rate={args.rate}/s/symbol interval={args.interval_ms}ms "
+          f"max_items={args.max_items}")
+    print(f"{'type':<11} {'policy':<9} {'msgs/s in':>10} {'accepted/s':>11} {'frames/s':>9} {'items/client':>13} "
+          f"{'msgs/client':>12} {'KB/s/client':>12}")
+    for kind in KINDS:
+        r = await run_kind(kind, args)
+        print(f"{kind:<11} {r['policy']:<9} {r['in_per_s']:>10,.0f} {r['accepted_per_s']:>11,.0f} "
+              f"{r['frames_per_s']:>9,.1f} {r['items_per_client']:>13,.0f} {r['in_per_client']:>12,.0f} "
+              f"{r['kb_per_s']:>12,.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=200)
+    parser.add_argument("--symbols", type=int, default=10)
+    parser.add_argument("--rate", type=int, default=2000, help="Nachrichten/s je Symbol")
+    parser.add_argument("--seconds", type=float, default=3.0)
+    parser.add_argument("--interval-ms", type=int, default=50)
+    parser.add_argument("--debounce-ms", type=int, default=25)
+    parser.add_argument("--max-items", type=int, default=500, help="Trades je Frame")
+    parser.add_argument("--send-ms", type=float, default=0.0, help="Dauer eines send_text")
+    args = parser.parse_args()
+    asyncio.run(main(args))
@@ -0,0 +1,82 @@
+"""
+Benchmark: Bytes und Kodierkosten je Trade der WS-Wire-Formate (core/ws/wire.py).
+
+Vergleicht für --trades Trades eines Symbols:
+  json_per_trade   eine Nachricht je Trade wie broadcast_trade_data (json.dumps, bisher)
+  json_batch       trades-Array je Tick (orjson, Batches aus dem WS-Manager)
+  columnar.v1      binärer Spalten-Frame (Schema und Symbol-Wörterbuch einmalig, hier nicht mitgezählt)
+je mit --batch Trades pro Frame; gemessen werden Bytes/Trade, Encode- und Decode-Zeit je Trade.
+
+    python benchmarks/bench_ws_wire.py --trades 200000 --batch 100
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+import orjson
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from core.ws import wire  # noqa: E402
+
+
+def _trades(n: int) -> list:
+    """Trade-Nachrichten im Format von broadcast_trade_data"""
+    start = datetime(2025, 7, 1, tzinfo=timezone.utc)
+    price = 60000.0
+    trades = []
+    for i in range(n):
+        price = round(price + random.choice((-0.1, 0, 0.1)), 1)
+        trades.append({
+            "type": "trade", "symbol": "BTCUSDT", "market": "spot", "price": price,
+            "size": round(random.random(), 4), "side": random.choice(("buy", "sell")),
+            "ts": (start + timedelta(milliseconds=i * 7)).isoformat(),
+            "timestamp": datetime.utcnow().isoformat(), "server_time": int(time.time() * 1000),
+        })
+    return trades
+
+
+def _measure(encode, decode, chunks, n):
+    """encode(chunk) -> Liste von Frames; Ergebnis (Bytes, Encode-µs, Decode-µs) je Trade"""
+    started = time.perf_counter()
+    frames = [frame for chunk in chunks for frame in encode(chunk)]
+    encode_s = time.perf_counter() - started
+    started = time.perf_counter()
+    for frame in frames:
+        decode(frame)
+    decode_s = time.perf_counter() - started
+    return sum(len(f) for f in frames) / n, encode_s / n * 1e6, decode_s / n * 1e6
+
+
+def main(args):
+    trades = _trades(args.trades)
+    chunks = [trades[i:i + args.batch] for i in range(0, len(trades), args.batch)]
+    symbols = wire.SymbolDictionary()
+    symbol_id = symbols.id("BTCUSDT", "spot")
+    variants = {
+        "json_per_trade": (lambda chunk: [json.dumps(t) for t in chunk], json.loads),
+        "json_batch": (lambda chunk: [orjson.dumps({"type": "trades", "symbol": "BTCUSDT", "market": "spot",
+                                                    "count": len(chunk), "data": chunk}).decode()],
+                       orjson.loads),
+        wire.COLUMNAR: (lambda chunk: [wire.encode_trades(chunk, symbol_id)], wire.decode_trades),
+    }
+    print(f"trades={args.trades:,} batch={args.batch}  "
+          f"(columnar once per connection: schema {len(wire.SCHEMA_TEXT)} B, symbol entry {len(symbols.text(symbol_id))} B)")
+    print(f"{'format':<16} {'bytes/trade':>12} {'encode µs/trade':>16} {'decode µs/trade':>16}")
+    baseline = None
+    for name, (encode, decode) in variants.items():
+        size, enc, dec = _measure(encode, decode, chunks, len(trades))
+        baseline = baseline or size
+        print(f"{name:<16} {size:>12.1f} {enc:>16.3f} {dec:>16.3f}   ({size / baseline:.1%} of per-trade JSON)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--trades", type=int, default=200_000)
+    parser.add_argument("--batch", type=int, default=100, help="Trades je Frame (Batch-Formate)")
+    args = parser.parse_args()
+    main(args)
@@ -0,0 +1,227 @@
+import asyncio
+import logging
+import time
+import traceback
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+from core.ws.bus import TradeBus, trade_bus
+from db.writer import ClickHouseBatchWriter, batch_writer
+
+logger = logging.getLogger(__name__)
+
+# Live gebaute Auflösungen (Sekunden) und ihre Labels in den WS-Nachrichten
+LIVE_RESOLUTIONS = (1, 60, 300, 3600)
+RESOLUTION_LABELS = {1: "1s", 60: "1m", 300: "5m", 3600: "1h"}
+
+
+class _Bar:
+    """Veränderlicher OHLCV-Zustand einer Auflösung – wird wiederverwendet, nie neu angelegt"""
+    __slots__ = ("resolution", "res_ms", "start_ms", "open", "high", "low", "close", "volume",
+                 "trades", "complete", "closed", "dirty")
+
+    def __init__(self, resolution: int):
+        self.resolution = resolution
+        self.res_ms = resolution * 1000
+        self.start_ms = -1
+        self.open = self.high = self.low = self.close = self.volume = 0.0
+        self.trades = 0
+        self.complete = False   # Builder lief schon vor Beginn der Kerze -> alle Trades gesehen
+        self.closed = True
+        self.dirty = False
+
+
+class CandleBuilder:
+    """
+    OHLCV-Kerzen für ein (symbol, market) in mehreren Auflösungen gleichzeitig.
+    add() macht pro Trade und Auflösung konstante Arbeit auf vorab angelegten
+    _Bar-Objekten; nur beim Schließen einer Kerze entsteht ein Tupel in closed_bars.
+    """
+    def __init__(self, symbol: str, market: str, resolutions=LIVE_RESOLUTIONS):
+        self.symbol = symbol
+        self.market = market
+        self.bars: Tuple[_Bar, ...] = tuple(_Bar(r) for r in resolutions)
+        self.created_ms = int(time.time() * 1000)
+        self.closed_bars: List[tuple] = []   # (resolution, start_ms, o, h, l, c, v, trades, complete)
+        self.late_trades = 0
+
+    def add(self, price: float, size: float, ts_ms: int):
+        for bar in self.bars:
+            start = ts_ms - ts_ms % bar.res_ms
+            if start == bar.start_ms and not bar.closed:
+                if price > bar.high:
+                    bar.high = price
+                elif price < bar.low:
+                    bar.low = price
+                bar.close = price
+                bar.volume += size
+                bar.trades += 1
+            elif start > bar.start_ms:
+                if not bar.closed:
+                    self._close(bar)
+                bar.start_ms = start
+                bar.open = bar.high = bar.low = bar.close = price
+                bar.volume = size
+                bar.trades = 1
+                bar.complete = start >= self.created_ms
+                bar.closed = False
+            else:
+                self.late_trades += 1  # Kerze schon geschlossen/persistiert
+                continue
+            bar.dirty = True
+
+    def expire(self, now_ms: int, grace_ms: int):
+        """Schließt Kerzen, deren Intervall (plus Karenz für späte Trades) vorbei ist"""
+        for bar in self.bars:
+            if not bar.closed and now_ms >= bar.start_ms + bar.res_ms + grace_ms:
+                self._close(bar)
+
+    def _close(self, bar: _Bar):
+        bar.closed = True
+        bar.dirty = False
+        self.closed_bars.append((bar.resolution, bar.start_ms, bar.open, bar.high, bar.low, bar.close,
+                                 bar.volume, bar.trades, bar.complete))
+
+
+def candle_message(symbol: str, market: str, resolution: int, start_ms: int, open_: float, high: float,
+                   low: float, close: float, volume: float, trades: int, closed: bool) -> dict:
+    """WS-Nachricht im Format, das ChartView erwartet (msg.type == "candle", Werte unter msg.data)"""
+    return {
+        "type": "candle",
+        "symbol": symbol,
+        "market": market,
+        "resolution": RESOLUTION_LABELS.get(resolution, f"{resolution}s"),
+        "closed": closed,
+        "data": {
+            "timestamp": datetime.fromtimestamp(start_ms / 1000, tz=timezone.utc).isoformat(),
+            "time": start_ms // 1000,
+            "open": open_,
+            "high": high,
+            "low": low,
+            "close": close,
+            "volume": volume,
+            "trades": trades,
+        },
+    }
+
+
+class LiveCandleService:
+    """
+    Baut für alle verfolgten Symbole Live-Kerzen aus dem Collector-Trade-Stream.
+    - laufende Kerzen gehen alle publish_interval_ms als "candle"-Nachricht auf den Bus
+    - abgeschlossene Kerzen werden genau einmal über den Batch-Writer in candles geschrieben
+      (nur vollständige: die erste, angebrochene Kerze nach track() wird nicht persistiert)
+    """
+    def __init__(self, bus: TradeBus, writer: ClickHouseBatchWriter, resolutions=LIVE_RESOLUTIONS,
+                 publish_interval_ms: int = 250, close_grace_ms: int = 2000, persist: bool = True):
+        self._bus = bus
+        self._writer = writer
+        self._resolutions = tuple(resolutions)
+        self._publish_interval = publish_interval_ms / 1000.0
+        self._close_grace_ms = close_grace_ms
+        self._persist = persist
+        self._builders: Dict[str, CandleBuilder] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._running = False
+        self.metrics = {
+            "trades": 0,
+            "updates_published": 0,
+            "bars_closed": 0,
+            "bars_persisted": 0,
+            "bars_skipped_partial": 0,
+        }
+
+    async def start(self):
+        if self._running:
+            return
+        self._running = True
+        self._task = asyncio.create_task(self._tick_loop())
+        logger.info(f"Live candle service started (resolutions={self._resolutions}, publish={self._publish_interval * 1000:.0f}ms)")
+
+    async def stop(self):
+        self._running = False
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        # Laufende Kerzen sind unvollständig und werden bewusst nicht geschrieben
+        self._builders.clear()
+
+    def track(self, symbol: str, market: str) -> CandleBuilder:
+        key = f"{symbol}_{market}"
+        builder = self._builders.get(key)
+        if builder is None:
+            builder = self._builders[key] = CandleBuilder(symbol, market, self._resolutions)
+        return builder
+
+    async def untrack(self, symbol: str, market: str):
+        builder = self._builders.pop(f"{symbol}_{market}", None)
+        if builder is not None:
+            await self._drain_closed(builder)
+
+    async def on_trade(self, trade: dict):
+        """Sink für Collector-Trades (Dict aus parse_trade bzw. /publish)"""
+        builder = self._builders.get(f"{trade['symbol']}_{trade['market']}")
+        if builder is None:
+            return
+        ts_ms = trade.get("ts_ms")
+        if ts_ms is None:
+            ts = datetime.fromisoformat(str(trade["ts"]).rstrip("Z"))
+            if ts.tzinfo is None:
+                ts = ts.replace(tzinfo=timezone.utc)
+            ts_ms = int(ts.timestamp() * 1000)
+        builder.add(trade["price"], trade["size"], ts_ms)
+        self.metrics["trades"] += 1
+        if builder.closed_bars:
+            await self._drain_closed(builder)
+
+    async def _drain_closed(self, builder: CandleBuilder):
+        closed, builder.closed_bars = builder.closed_bars, []
+        topic = f"{builder.symbol}_{builder.market}"
+        for resolution, start_ms, o, h, l, c, v, trades, complete in closed:
+            self.metrics["bars_closed"] += 1
+            self._bus.publish(topic, candle_message(builder.symbol, builder.market, resolution, start_ms,
+                                                    o, h, l, c, v, trades, closed=True))
+            if not complete:
+                self.metrics["bars_skipped_partial"] += 1
+                continue
+            if self._persist:
+                await self._writer.add_candle(builder.symbol, builder.market, resolution,
+                                              datetime.fromtimestamp(start_ms / 1000, tz=timezone.utc),
+                                              o, h, l, c, v, trades)
+                self.metrics["bars_persisted"] += 1
+
+    async def _tick_loop(self):
+        while self._running:
+            try:
+                await asyncio.sleep(self._publish_interval)
+                now_ms = int(time.time() * 1000)
+                for key, builder in list(self._builders.items()):
+                    builder.expire(now_ms, self._close_grace_ms)
+                    if builder.closed_bars:
+                        await self._drain_closed(builder)
+                    for bar in builder.bars:
+                        if bar.dirty:
+                            bar.dirty = False
+                            self._bus.publish(key, candle_message(builder.symbol, builder.market, bar.resolution,
+                                                                  bar.start_ms, bar.open, bar.high, bar.low,
+                                                                  bar.close, bar.volume, bar.trades, closed=False))
+                            self.metrics["updates_published"] += 1
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Error in live candle loop: {e}")
+                traceback.print_exc()
+
+    def get_metrics(self) -> dict:
+        return {
+            **self.metrics,
+            "symbols": len(self._builders),
+            "late_trades": sum(b.late_trades for b in self._builders.values()),
+        }
+
+
+# Globale Instanz (Trades-Router, main.py)
+candle_service = LiveCandleService(trade_bus, batch_writer)
@@ -30,5 +30,86 @@ class Settings:
     CH_USER = os.getenv("CLICKHOUSE_USER", "default")
     CH_PASSWORD = os.getenv("CLICKHOUSE_PASSWORD", "")
 
+    # ClickHouse-Client-Pool (db/pool.py)
+    CH_POOL_SIZE = int(os.getenv("CLICKHOUSE_POOL_SIZE", "16"))
+    CH_POOL_TIMEOUT = float(os.getenv("CLICKHOUSE_POOL_TIMEOUT", "10"))      # Sekunden Wartezeit auf freien Client
+    CH_CONNECT_TIMEOUT = int(os.getenv("CLICKHOUSE_CONNECT_TIMEOUT", "5"))
+    CH_QUERY_TIMEOUT = int(os.getenv("CLICKHOUSE_QUERY_TIMEOUT", "30"))      # max_execution_time je Query
+    CH_KEEPALIVE = int(os.getenv("CLICKHOUSE_KEEPALIVE", "30"))              # TCP-Keep-Alive-Intervall
+    CH_HEALTHCHECK_INTERVAL = float(os.getenv("CLICKHOUSE_HEALTHCHECK_INTERVAL", "30"))  # ping nach x s Leerlauf
+
+    # Async-DB-Zugriff (db/clickhouse.py: run_db) – Executor muss kleiner als der Pool sein
+    CH_EXECUTOR_WORKERS = int(os.getenv("CLICKHOUSE_EXECUTOR_WORKERS", "8"))
+    CH_MAX_CONCURRENT_PER_QUERY = int(os.getenv("CLICKHOUSE_MAX_CONCURRENT_PER_QUERY", "4"))
+
+    # Trade-Bus (core/ws/bus.py): Ringpuffer je WS-Subscriber und Slow-Consumer-Policy
+    BUS_SUBSCRIBER_BUFFER = int(os.getenv("BUS_SUBSCRIBER_BUFFER", "1000"))
+    BUS_SLOW_CONSUMER_POLICY = os.getenv("BUS_SLOW_CONSUMER_POLICY", "drop_oldest")  # drop_oldest | conflate | disconnect
+
+    # WS-Broadcast (core/ws/ws_handler.py): Timeout je Send (ms), nach so vielen Timeouts in Folge wird getrennt
+    WS_SEND_TIMEOUT_MS = int(os.getenv("WS_SEND_TIMEOUT_MS", "500"))
+    WS_MAX_SEND_TIMEOUTS = int(os.getenv("WS_MAX_SEND_TIMEOUTS", "3"))
+    # Trades je Frame (volle Batches gehen sofort raus), max. ungesendete Frames je Client vor dem Trennen
+    WS_BATCH_MAX_ITEMS = int(os.getenv("WS_BATCH_MAX_ITEMS", "500"))
+    WS_MAX_PENDING_FRAMES = int(os.getenv("WS_MAX_PENDING_FRAMES", "256"))
+    # Max. (Symbol, Channel)-Abos je Client-WebSocket
+    WS_MAX_SUBSCRIPTIONS = int(os.getenv("WS_MAX_SUBSCRIPTIONS", "200"))
+
+    # Batch-Writer (db/writer.py): vorübergehende Insert-Fehler höchstens so oft wiederholen (Backoff bis max. s),
+    # danach und bei dauerhaften Fehlern (Typ/Konvertierung) landet der Batch als JSON im Dead-Letter-Verzeichnis;
+    # leer = verwerfen (nur Metrik)
+    WRITER_MAX_RETRIES = int(os.getenv("WRITER_MAX_RETRIES", "8"))
+    WRITER_RETRY_BACKOFF_MAX = float(os.getenv("WRITER_RETRY_BACKOFF_MAX", "30"))
+    WRITER_DEAD_LETTER_DIR = os.getenv(
+        "WRITER_DEAD_LETTER_DIR",
+        os.path.normpath(os.path.join(os.path.dirname(__file__), "..", "dead_letter"))
+    )
+
+    # Collector-Supervisor (exchanges/bitget/supervisor.py): store_live-Symbole auf N Worker-Prozesse
+    # verteilt; 0 = aus (dann persistiert der API-Prozess nur die gerade angesehenen Symbole)
+    COLLECTOR_WORKERS = int(os.getenv("COLLECTOR_WORKERS", "2"))
+    COLLECTOR_REFRESH_INTERVAL = float(os.getenv("COLLECTOR_REFRESH_INTERVAL", "60"))  # Settings neu lesen (s)
+    COLLECTOR_BACKOFF_MAX = float(os.getenv("COLLECTOR_BACKOFF_MAX", "60"))            # max. Restart-Wartezeit (s)
+
+    # Backfill (exchanges/bitget/backfill.py): parallele Worker, Seiten je Zeitscheibe
+    BACKFILL_CONCURRENCY = int(os.getenv("BACKFILL_CONCURRENCY", "16"))
+    BACKFILL_PAGES_PER_SLICE = int(os.getenv("BACKFILL_PAGES_PER_SLICE", "10"))
+    # Backfill-Jobs (exchanges/bitget/backfill_jobs.py): Checkpoint-Intervall (s), Versuche je Zeitscheibe
+    BACKFILL_CHECKPOINT_INTERVAL = float(os.getenv("BACKFILL_CHECKPOINT_INTERVAL", "5"))
+    BACKFILL_MAX_ATTEMPTS = int(os.getenv("BACKFILL_MAX_ATTEMPTS", "3"))
+    # So viele abgeschlossene Jobs (done/failed/cancelled) bleiben im Speicher und werden beim Start geladen
+    BACKFILL_FINISHED_JOBS = int(os.getenv("BACKFILL_FINISHED_JOBS", "500"))
+    # Coverage-Index (core/coverage.py): beim Aufbau aus bars gelten Lücken bis zu so vielen Kerzen als abgedeckt
+    COVERAGE_MAX_GAP_BARS = int(os.getenv("COVERAGE_MAX_GAP_BARS", "5"))
+
+    # Tick-Schema v3 (ReplacingMergeTree): Lese-Queries deduplizieren per LIMIT 1 BY, Compaction läuft.
+    # auto = nur wenn trades.trade_id/version und bars.version existieren (Startup-Prüfung), 1 = immer, 0 = nie
+    TICK_DEDUP = os.getenv("TICK_DEDUP", "auto").lower()
+    # Compaction (db/compaction.py): Partitionen mit mehr als COMPACTION_DUP_RATIO Duplikaten werden
+    # per OPTIMIZE ... FINAL zusammengeführt, höchstens COMPACTION_MAX_PARTITIONS je Lauf
+    COMPACTION_INTERVAL = float(os.getenv("COMPACTION_INTERVAL", "3600"))
+    COMPACTION_DUP_RATIO = float(os.getenv("COMPACTION_DUP_RATIO", "0.01"))
+    COMPACTION_MAX_PARTITIONS = int(os.getenv("COMPACTION_MAX_PARTITIONS", "4"))
+    # Rollups (ohlc_*) abgeschlossener Monate (1s/1m/5m) bzw. Jahre (1h/1d, UTC) aus deduplizierten Trades
+    # neu aufbauen (Staging-Tabelle + REPLACE PARTITION, erledigte Zeiträume in rollup_rebuilds)
+    COMPACTION_REBUILD_ROLLUPS = os.getenv("COMPACTION_REBUILD_ROLLUPS", "1") == "1"
+
+    # Bitget-REST-Client (exchanges/bitget/rest_client.py): HTTP/2 (braucht h2), Verbindungen im Pool,
+    # Keep-Alive-Leerlauf (s), Wiederholungen bei Transportfehlern/5xx/429
+    BITGET_HTTP2 = os.getenv("BITGET_HTTP2", "1") == "1"
+    BITGET_HTTP_MAX_CONNECTIONS = int(os.getenv("BITGET_HTTP_MAX_CONNECTIONS", "32"))
+    BITGET_HTTP_KEEPALIVE = float(os.getenv("BITGET_HTTP_KEEPALIVE", "30"))
+    BITGET_HTTP_RETRIES = int(os.getenv("BITGET_HTTP_RETRIES", "3"))
+    # Single-Flight/LRU-Cache der REST-Helper (exchanges/bitget/rest_cache.py): max. Einträge
+    BITGET_CACHE_MAX_ENTRIES = int(os.getenv("BITGET_CACHE_MAX_ENTRIES", "1024"))
+
+    # Ticker-Snapshot (core/tickers.py): Refresh-Intervall (s); älter als TICKER_STALE_AFTER s -> stale
+    TICKER_REFRESH_INTERVAL = float(os.getenv("TICKER_REFRESH_INTERVAL", "2"))
+    TICKER_STALE_AFTER = float(os.getenv("TICKER_STALE_AFTER", "30"))
+    # Live-Ticker (exchanges/bitget/tickers.py, /ws/tickers): Märkte, Delta-Intervall (s), instIds je WS-Verbindung
+    TICKER_WS_MARKETS = os.getenv("TICKER_WS_MARKETS", "spot,usdtm,coinm,usdcm")
+    TICKER_WS_FLUSH_INTERVAL = float(os.getenv("TICKER_WS_FLUSH_INTERVAL", "0.25"))
+    TICKER_WS_PER_CONNECTION = int(os.getenv("TICKER_WS_PER_CONNECTION", "100"))
+
 # Instanziiere globale Settings
 settings = Settings()
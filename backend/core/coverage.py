@@ -0,0 +1,226 @@
+"""
+Coverage-Index für bars: welche [start, end)-Zeiträume je (symbol, market, granularity)
+schon vollständig in ClickHouse liegen.
+
+- Quelle sind die Backfill-Checkpoints (exchanges/bitget/backfill_jobs.py): jeder gesicherte
+  Seitenbereich wird eingetragen, auch wenn Bitget dort keine Kerzen hatte.
+- Jeder erfolgreich geflushte bars-Batch (db/writer.py, Flush-Listener) wird eingetragen,
+  zusammenhängend bis auf Lücken von COVERAGE_MAX_GAP_BARS Kerzen (Minuten ohne Handel).
+- Für Schlüssel ohne Index-Zeile wird er einmalig aus bars gebaut (Gaps-and-Islands, gleiche
+  Lückenregel) – nur über bars.granularity; Zeilen ohne bekannte Auflösung zählen nicht.
+- /settings/completeness und der Backfill-Planer fragen nur den Speicher ab.
+"""
+import asyncio
+import bisect
+import logging
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Set, Tuple
+
+from core.config import settings
+from core.utils.time import parse_resolution
+from db.clickhouse import run_db, fetch_bar_coverage, fetch_bar_islands, insert_rows, schema_features, COVERAGE_COLUMNS
+
+logger = logging.getLogger(__name__)
+
+CoverageKey = Tuple[str, str, str]  # (symbol, market, granularity)
+
+
+def step_ms(granularity: str) -> int:
+    """Kerzenlänge in ms; unbekannte Formate (z.B. '1min') zählen als 1m"""
+    try:
+        return parse_resolution(granularity) * 1000
+    except ValueError:
+        return 60_000
+
+
+class IntervalSet:
+    """Sortierte, disjunkte [start, end)-Intervalle in ms; benachbarte werden verschmolzen"""
+    __slots__ = ("starts", "ends")
+
+    def __init__(self, starts: Optional[List[int]] = None, ends: Optional[List[int]] = None):
+        self.starts: List[int] = []
+        self.ends: List[int] = []
+        for lo, hi in sorted(zip(starts or [], ends or [])):
+            self.add(lo, hi)
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def add(self, lo: int, hi: int) -> bool:
+        """Fügt [lo, hi) hinzu; True, wenn sich etwas geändert hat"""
+        if hi <= lo:
+            return False
+        # erstes Intervall, das an lo heranreicht, und erstes, das hinter hi beginnt
+        i = bisect.bisect_left(self.ends, lo)
+        j = bisect.bisect_right(self.starts, hi)
+        if i < j:
+            if self.starts[i] <= lo and self.ends[j - 1] >= hi and j - i == 1:
+                return False
+            lo = min(lo, self.starts[i])
+            hi = max(hi, self.ends[j - 1])
+        self.starts[i:j] = [lo]
+        self.ends[i:j] = [hi]
+        return True
+
+    def gaps(self, lo: int, hi: int, min_gap: int = 1) -> List[Tuple[int, int]]:
+        """Nicht abgedeckte Teile von [lo, hi), kürzere als min_gap werden ignoriert"""
+        out = []
+        cursor = lo
+        for i in range(bisect.bisect_right(self.ends, lo), len(self.starts)):
+            start, end = self.starts[i], self.ends[i]
+            if start >= hi:
+                break
+            if start - cursor >= min_gap:
+                out.append((cursor, start))
+            cursor = max(cursor, end)
+        if hi - cursor >= min_gap:
+            out.append((cursor, hi))
+        return out
+
+    def intervals(self) -> List[Tuple[int, int]]:
+        return list(zip(self.starts, self.ends))
+
+
+class CoverageIndex:
+    def __init__(self, max_gap_bars: int = 5):
+        self.max_gap_bars = max_gap_bars
+        self._sets: Dict[CoverageKey, IntervalSet] = {}
+        self._known: Set[CoverageKey] = set()   # aus bar_coverage geladen oder aus bars gebaut
+        self._dirty: Set[CoverageKey] = set()
+        self._build_locks: Dict[CoverageKey, asyncio.Lock] = {}
+        self._persist_lock = asyncio.Lock()
+        self.loaded = False
+        self.metrics = {"builds": 0, "build_ms_total": 0.0, "persists": 0, "persist_errors": 0, "queries": 0}
+
+    async def load(self):
+        """Index aus bar_coverage laden (Startup); Fehler -> später erneut über ensure()"""
+        try:
+            rows = await run_db(fetch_bar_coverage)
+        except Exception as e:
+            logger.error(f"Could not load bar coverage: {e}")
+            return
+        for row in rows:
+            key = (row["symbol"], row["market"], row["granularity"])
+            loaded = IntervalSet(row["starts"], row["ends"])
+            current = self._sets.get(key)
+            if current is not None:
+                for lo, hi in current.intervals():
+                    loaded.add(lo, hi)
+            self._sets[key] = loaded
+            self._known.add(key)
+        self.loaded = True
+        logger.info(f"Bar coverage loaded: {len(rows)} keys")
+
+    async def ensure(self, symbol: str, market: str, granularity: str) -> IntervalSet:
+        """Index für den Schlüssel; fehlt er, einmalig aus bars bauen"""
+        key = (symbol, market, granularity)
+        if key in self._known:
+            return self._sets[key]
+        if not self.loaded:
+            await self.load()
+            if key in self._known:
+                return self._sets[key]
+        if not schema_features["bar_granularity"]:
+            # bars ohne Auflösung: Kerzen anderer Granularität dürfen nicht als Abdeckung zählen
+            return self._sets.setdefault(key, IntervalSet())
+        lock = self._build_locks.setdefault(key, asyncio.Lock())
+        async with lock:
+            if key not in self._known:
+                step = step_ms(granularity) // 1000
+                started = time.perf_counter()
+                islands = await run_db(fetch_bar_islands, symbol, market, granularity, step, step * self.max_gap_bars)
+                self.metrics["build_ms_total"] += (time.perf_counter() - started) * 1000
+                self.metrics["builds"] += 1
+                intervals = self._sets.setdefault(key, IntervalSet())
+                for lo, hi in islands:
+                    intervals.add(lo, hi)
+                self._known.add(key)
+                self._dirty.add(key)
+                logger.info(f"Bar coverage for {symbol}/{market} {granularity} built from bars: {len(intervals)} intervals")
+        return self._sets[key]
+
+    def add(self, symbol: str, market: str, granularity: str, lo_ms: int, hi_ms: int):
+        """Zeitraum als abgedeckt eintragen (nur nach erfolgreichem Flush der Kerzen!)"""
+        key = (symbol, market, granularity)
+        if self._sets.setdefault(key, IntervalSet()).add(lo_ms, hi_ms):
+            self._dirty.add(key)
+
+    def on_bars_flushed(self, column_names: List[str], columns: List[list]):
+        """Flush-Listener des Batch-Writers: geschriebene Kerzen je Schlüssel als Läufe eintragen"""
+        rows = dict(zip(column_names, columns))
+        stamps: Dict[CoverageKey, List[int]] = {}
+        for symbol, market, granularity, ts in zip(rows["symbol"], rows["market"], rows["granularity"], rows["ts"]):
+            if granularity:
+                stamps.setdefault((symbol, market, granularity), []).append(int(ts.timestamp() * 1000))
+        for (symbol, market, granularity), values in stamps.items():
+            step = step_ms(granularity)
+            max_gap = step * self.max_gap_bars
+            values.sort()
+            lo = prev = values[0]
+            for ts in values[1:]:
+                if ts - prev > max_gap:
+                    self.add(symbol, market, granularity, lo, prev + step)
+                    lo = ts
+                prev = ts
+            self.add(symbol, market, granularity, lo, prev + step)
+
+    def gaps(self, symbol: str, market: str, granularity: str, lo_ms: int, hi_ms: int) -> List[Tuple[int, int]]:
+        intervals = self._sets.get((symbol, market, granularity))
+        if intervals is None:
+            return [(lo_ms, hi_ms)] if hi_ms > lo_ms else []
+        return intervals.gaps(lo_ms, hi_ms, min_gap=step_ms(granularity))
+
+    async def persist(self):
+        """Geänderte Schlüssel als neue bar_coverage-Zeilen schreiben"""
+        async with self._persist_lock:
+            if not self._dirty:
+                return
+            keys, self._dirty = self._dirty, set()
+            now = datetime.now(timezone.utc)
+            rows = [(*key, list(self._sets[key].starts), list(self._sets[key].ends), now) for key in keys]
+            try:
+                await run_db(insert_rows, "bar_coverage", COVERAGE_COLUMNS, rows)
+                self.metrics["persists"] += 1
+            except Exception as e:
+                self._dirty |= keys
+                self.metrics["persist_errors"] += 1
+                logger.error(f"Persisting bar coverage for {len(keys)} keys failed: {e}")
+
+    async def completeness(self, symbol: str, market: str, granularity: str,
+                           start: datetime, end: datetime, max_gaps: int = 100) -> dict:
+        self.metrics["queries"] += 1
+        await self.ensure(symbol, market, granularity)
+        lo_ms, hi_ms = int(start.timestamp() * 1000), int(end.timestamp() * 1000)
+        gaps = self.gaps(symbol, market, granularity, lo_ms, hi_ms)
+        missing_ms = sum(hi - lo for lo, hi in gaps)
+        total_ms = max(hi_ms - lo_ms, 1)
+        return {
+            "symbol": symbol,
+            "market": market,
+            "granularity": granularity,
+            "until": start.isoformat(),
+            "end": end.isoformat(),
+            "complete": not gaps,
+            "coverage": round(1 - missing_ms / total_ms, 6),
+            "missing_s": missing_ms // 1000,
+            "gap_count": len(gaps),
+            "gaps": [
+                {"start": datetime.fromtimestamp(lo / 1000, tz=timezone.utc).isoformat(),
+                 "end": datetime.fromtimestamp(hi / 1000, tz=timezone.utc).isoformat()}
+                for lo, hi in gaps[:max_gaps]
+            ],
+        }
+
+    def get_metrics(self) -> dict:
+        return {
+            "loaded": self.loaded,
+            "keys": len(self._sets),
+            "intervals": sum(len(s) for s in self._sets.values()),
+            "dirty": len(self._dirty),
+            **self.metrics,
+        }
+
+
+# Globaler Index (main.py lädt ihn und hängt ihn an den Batch-Writer, der Backfill-Scheduler pflegt ihn)
+coverage_index = CoverageIndex(max_gap_bars=settings.COVERAGE_MAX_GAP_BARS)
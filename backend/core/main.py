@@ -14,8 +14,23 @@ from core.routers.ohlc import router as ohlc_router
 from core.routers.orderbook import router as orderbook_router
 from core.routers.health import router as health_router
 from core.routers.ticker import router as ticker_router
+from core.routers.backfill import router as backfill_router
 
-from db.clickhouse import fetch_trades, fetch_bars, fetch_coin_settings, ping
+from db.clickhouse import fetch_trades, fetch_bars, fetch_coin_settings, ping, shutdown_executor, detect_schema, run_db
+from db.pool import clickhouse_pool
+from db.writer import batch_writer
+from db.compaction import compaction_scheduler
+from exchanges.bitget.collector import mux_collector
+from core.candles import candle_service
+from exchanges.bitget.orderbook import book_service
+from exchanges.bitget.supervisor import collector_supervisor
+from core.coverage import coverage_index
+from exchanges.bitget.backfill_jobs import backfill_scheduler
+from exchanges.bitget.rest_client import bitget_rest
+from core.tickers import ticker_service
+from exchanges.bitget.tickers import live_tickers
+from core.ws.ws_handler import ws_manager
+from core.ws.bridge import ws_bridge
 
 # Logging-Konfiguration
 logging.basicConfig(
@@ -36,18 +51,20 @@ app.add_middleware(
     allow_origins=["*"],
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
 # StaticFiles-Mount entfällt, da Frontend im eigenen Container läuft!
 
-# Alle Router einbinden
+# Alle Router einbinden (ticker_router vor trades_router, sonst fängt /ws/{symbol} den Pfad /ws/tickers ab)
+app.include_router(ticker_router)
 app.include_router(trades_router)
 app.include_router(symbols_router)
 app.include_router(settings_router)
 app.include_router(ohlc_router)
 app.include_router(orderbook_router)
 app.include_router(health_router)
-app.include_router(ticker_router)
+app.include_router(backfill_router)
 
 
 # Root-Redirect auf externes Frontend (optional, oder entferne die Funktion!)
@@ -60,4 +77,38 @@ def root():
 # Startup-Event
 @app.on_event("startup")
 async def on_startup():
+    # Tick-Schema v3 (TICK_DEDUP=auto) und bars.granularity erkennen, bevor Writer, Leser und Compaction loslegen
+    await run_db(detect_schema)
+    batch_writer.add_flush_listener("bars", coverage_index.on_bars_flushed)
+    await batch_writer.start()
+    await bitget_rest.start()
+    await ticker_service.start()
+    await candle_service.start()
+    await collector_supervisor.start()
+    await coverage_index.load()
+    await backfill_scheduler.start()
+    await compaction_scheduler.start()
+    # Multi-Symbol-WebSocket /ws: Batch-Loop und Producer-Brücke
+    await ws_manager.start()
+    ws_bridge.start()
     logger.info("Trading API gestartet & bereit!")
+
+# Shutdown-Event: Backfill-Checkpoints sichern, gepufferte Trades/Bars noch wegschreiben
+@app.on_event("shutdown")
+async def on_shutdown():
+    await ws_bridge.stop()
+    await ws_manager.stop()
+    await collector_supervisor.stop()
+    await ticker_service.stop()
+    await live_tickers.stop()
+    await backfill_scheduler.stop()
+    await compaction_scheduler.stop()
+    await mux_collector.stop()
+    await bitget_rest.close()
+    await candle_service.stop()
+    await book_service.stop()
+    await batch_writer.stop()
+    await coverage_index.persist()
+    shutdown_executor()
+    clickhouse_pool.close()
+    logger.info("Trading API gestoppt.")
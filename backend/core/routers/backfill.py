@@ -0,0 +1,71 @@
+import logging
+import traceback
+from datetime import datetime, timezone
+from typing import Optional
+
+from fastapi import APIRouter, Body, HTTPException
+
+from exchanges.bitget.backfill_jobs import backfill_scheduler
+
+router = APIRouter()
+logger = logging.getLogger("trading-api")
+
+
+def _parse_dt(value: str) -> datetime:
+    return datetime.fromisoformat(value.rstrip('Z')).replace(tzinfo=timezone.utc)
+
+
+# ----- Backfill-Jobs (persistiert, dedupliziert, nach Neustart fortgesetzt) -----
+@router.post("/backfill")
+@router.post("/backfill/jobs")
+async def backfill_endpoint(
+    symbol: str = Body(...),
+    until: str = Body(...),
+    end: Optional[str] = Body(None),
+    market: str = Body("spot"),
+    granularity: str = Body("1m"),
+):
+    """
+    Legt Backfill-Jobs für [until, end) an (end Default: jetzt) und kehrt sofort zurück.
+    Bereits von anderen Jobs abgedeckte Teile werden nicht erneut geladen (deduplicated).
+    """
+    try:
+        result = await backfill_scheduler.submit(
+            symbol, _parse_dt(until), _parse_dt(end) if end else None, market=market, granularity=granularity,
+        )
+        return {"ok": True, **result}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Backfill Fehler: {e}")
+        traceback.print_exc()
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/backfill/jobs")
+async def list_backfill_jobs(status: Optional[str] = None, symbol: Optional[str] = None, limit: int = 100):
+    """Jobs mit Fortschritt, Rows/s, ETA und fehlgeschlagenen Scheiben (neueste zuerst)"""
+    return {"jobs": backfill_scheduler.list_jobs(status, symbol, limit), "metrics": backfill_scheduler.get_metrics()}
+
+
+@router.get("/backfill/jobs/{job_id}")
+async def get_backfill_job(job_id: str):
+    job = backfill_scheduler.get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job nicht gefunden")
+    return {
+        **job.progress(),
+        "slices": [
+            {"slice": s.slice_no, "lo": s.lo.isoformat(), "hi": s.hi.isoformat(), "status": s.status,
+             "rows": s.rows, "pages": s.pages, "attempts": s.attempts, "error": s.error}
+            for s in job.slices
+        ],
+    }
+
+
+@router.delete("/backfill/jobs/{job_id}")
+async def cancel_backfill_job(job_id: str):
+    job = await backfill_scheduler.cancel(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job nicht gefunden")
+    return job
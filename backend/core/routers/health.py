@@ -1,7 +1,24 @@
 import logging
 from fastapi import APIRouter
 
-from db.clickhouse import ping
+from db.clickhouse import ping_async, run_db, schema_features
+from db.pool import clickhouse_pool
+from db.writer import batch_writer
+from db.compaction import compaction_scheduler
+from exchanges.bitget.collector import mux_collector
+from core.ws.bus import trade_bus
+from core.ws.ws_handler import ws_manager
+from core.ws.bridge import ws_bridge
+from core.candles import candle_service
+from exchanges.bitget.orderbook import book_service
+from exchanges.bitget.supervisor import collector_supervisor
+from exchanges.bitget.ratelimit import bitget_limiter
+from exchanges.bitget.rest_client import bitget_rest
+from exchanges.bitget.rest_cache import rest_cache
+from exchanges.bitget.backfill_jobs import backfill_scheduler
+from core.coverage import coverage_index
+from core.tickers import ticker_service
+from exchanges.bitget.tickers import live_tickers
 from core.routers.trades import symbol_clients
 # from core.routers.market_trades import trade_ws_clients  # optional
 from whale.detector import is_detector_alive  # <- NEU (siehe unten)
@@ -16,14 +33,48 @@ async def healthz():
     Health-Check für API, WebSockets, ClickHouse, Whale-Detection und Coins.
     """
     return {
-        "clickhouse": ping(),
+        "clickhouse": await ping_async(),
         "websockets_trades": sum(len(s) for s in symbol_clients.values()),
         # "websockets_markettrades": sum(len(s) for s in trade_ws_clients.values()),  # falls vorhanden
         "whale_detector": is_detector_alive(),
-        "coins_active": len(fetch_coins(active=1)),
+        "coins_active": len(await run_db(fetch_coins, active=1)),
         "ok": True
     }
 
+@router.get("/metrics")
+async def metrics():
+    """
+    Performance-Metriken: Batch-Writer (Flush-Latenz, Rows/s, Pufferfüllstand),
+    ClickHouse-Pool (Checkouts, Wartezeiten), Bitget-Collector (Verbindungen, Subscriptions),
+    Trade-Bus (Lag/Drops je Subscriber), Multi-Symbol-WebSocket /ws (Fan-out, Protokolle, Pumpen), Live-Kerzen, lokale Orderbücher
+    Collector-Supervisor (Shards, Restarts, Worker-Status), Bitget-Rate-Limiter je Endpoint,
+    Bitget-REST-Client (HTTP-Version, Latenz-Histogramm, Status-Codes, Retries je Endpoint),
+    REST-Cache (Hits, Misses = Upstream-Requests, zusammengelegte Aufrufe je Endpoint),
+    Backfill-Scheduler (Jobs je Status, Scheiben, Checkpoints), Coverage-Index,
+    Compaction (Duplikatanteil je Partition), erkannte Schema-Features, Ticker-Snapshot (Alter, stale, Refresh-Fehler)
+    und Live-Ticker (Tabellenzeilen, geänderte Updates, Delta-Größen).
+    """
+    return {
+        "writer": batch_writer.get_metrics(),
+        "clickhouse_pool": clickhouse_pool.get_metrics(),
+        "collector": mux_collector.get_metrics(),
+        "bus": trade_bus.get_metrics(),
+        "ws": ws_manager.get_metrics(),
+        "ws_bridge": ws_bridge.get_metrics(),
+        "candles": candle_service.get_metrics(),
+        "orderbook": book_service.get_metrics(),
+        "supervisor": collector_supervisor.get_metrics(),
+        "rate_limiter": bitget_limiter.get_metrics(),
+        "bitget_rest": bitget_rest.get_metrics(),
+        "rest_cache": rest_cache.get_metrics(),
+        "backfill": backfill_scheduler.get_metrics(),
+        "coverage": coverage_index.get_metrics(),
+        "compaction": compaction_scheduler.get_metrics(),
+        "schema": dict(schema_features),
+        "ticker": ticker_service.get_metrics(),
+        "live_tickers": live_tickers.get_metrics(),
+    }
+
 @router.get("/debugtest")
 async def debug_test():
     """
@@ -1,6 +1,9 @@
 import logging
+from typing import Optional
 from fastapi import APIRouter, HTTPException, Response
-from db.clickhouse import fetch_bars
+from db.clickhouse import fetch_bars_page_async, decode_cursor
+from core.utils.time import parse_resolution
+from exchanges.bitget.rest_utils import FUTURES_MARKETS
 
 router = APIRouter()
 logger = logging.getLogger("trading-api")
@@ -8,23 +11,36 @@ logger = logging.getLogger("trading-api")
 
 @router.get("/ohlc")
 async def get_ohlc(
+    response: Response,
     symbol: str,
     market: str = "spot",
     resolution: str = "1s",
-    limit: int = 200
+    limit: int = 200,
+    cursor: Optional[str] = None
 ):
     """
     Liefert OHLC-Candlestick-Daten für Symbol/Markt aus der Datenbank.
     Standard: 1s-Bars, limit=200 (letzte x Einheiten je resolution).
-    Spot: gibt tatsächliche Kerzen zurück.
-    Futures (usdtm, coinm): noch keine History → 204 No Content.
+    Gelesen wird aus dem gröbsten passenden Rollup (ohlc_1s/1m/5m/1h/1d),
+    ältere Seiten gehen nahtlos in die Backfill-Kerzen in bars mit derselben Auflösung über (bars.granularity).
+    Pagination: der Header X-Next-Cursor enthält einen opaken Cursor; mit
+    ?cursor=... kommen die `limit` Kerzen davor (Infinite Scroll nach links).
+    Märkte: spot, usdtm, coinm, usdcm – Futures-Historie kommt aus den Live-Trades
+    (Collector) bzw. dem Backfill über /api/v2/mix/market/history-candles.
     """
+    if market != "spot" and market not in FUTURES_MARKETS:
+        raise HTTPException(status_code=400, detail=f"Unbekannter market: {market}")
     try:
-        if market != "spot":
-            # noch keine historische OHLC für Futures
-            return Response(status_code=204)
+        parse_resolution(resolution)
+        if cursor:
+            decode_cursor(cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
-        bars = fetch_bars(symbol, market, limit=limit)
+    try:
+        bars, next_cursor = await fetch_bars_page_async(symbol, market, limit=limit, cursor=cursor, resolution=resolution)
+        if next_cursor:
+            response.headers["X-Next-Cursor"] = next_cursor
         # reverse, damit älteste zuerst
         return [
             {
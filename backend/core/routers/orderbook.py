@@ -1,10 +1,16 @@
+import json
 import logging
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, WebSocket, WebSocketDisconnect
 from exchanges.bitget.rest_utils import fetch_orderbook
+from exchanges.bitget.orderbook import book_service
+from core.ws.bus import trade_bus, DISCONNECT
 
 router = APIRouter()
 logger = logging.getLogger("trading-api")
 
+# So lange wartet der erste /orderbook-Aufruf auf den WS-Snapshot, bevor REST einspringt
+SNAPSHOT_WAIT_S = 1.0
+
 @router.get("/orderbook")
 async def get_orderbook(
     symbol: str,
@@ -12,9 +18,13 @@ async def get_orderbook(
     limit: int = 10
 ):
     """
-    Holt Orderbuch für ein Symbol/Markt über zentrale Bitget-Utility.
+    Orderbuch aus dem lokal gepflegten L2-Buch (Bitget books-Channel).
+    Solange das Buch noch nicht synchron ist, einmalig Fallback auf die Bitget-REST-Utility.
     """
     try:
+        book = await book_service.ensure(symbol, market_type)
+        if book.synced or await book_service.wait_synced(book, SNAPSHOT_WAIT_S):
+            return book.top(limit)
         data = await fetch_orderbook(symbol, market_type, limit)
         asks = [{"price": float(p), "size": float(s)} for p, s in data.get("asks", [])]
         bids = [{"price": float(p), "size": float(s)} for p, s in data.get("bids", [])]
@@ -22,3 +32,32 @@ async def get_orderbook(
     except Exception as e:
         logger.error("Orderbook-Fehler:", exc_info=True)
         raise HTTPException(status_code=500, detail=f"Orderbook-Error: {e}")
+
+@router.websocket("/ws/{symbol}/{market}/orderbook")
+async def websocket_orderbook(ws: WebSocket, symbol: str, market: str):
+    """
+    Live-Orderbuch: zuerst book_snapshot (alle Stufen), danach book_delta mit seq/prev_seq.
+    Nach einem Resync kommt ein neuer book_snapshot. Wer mit den Deltas nicht mithält,
+    wird getrennt (Lücken würden das Client-Buch verfälschen) und muss neu verbinden.
+    """
+    await ws.accept()
+    book = await book_service.ensure(symbol, market)
+    sub = await trade_bus.subscribe(book_service.topic(symbol, market), name=f"ws-book:{id(ws):x}", policy=DISCONNECT)
+    try:
+        snapshot_seq = -1
+        if book.synced or await book_service.wait_synced(book, SNAPSHOT_WAIT_S * 5):
+            asks, bids = book.levels()
+            snapshot_seq = book.seq
+            await ws.send_text(json.dumps({"type": "book_snapshot", "symbol": symbol, "market": market,
+                                           "seq": book.seq, "ts": book.ts, "asks": asks, "bids": bids}))
+        async for msg in sub:
+            if msg["type"] == "book_delta" and msg["seq"] <= snapshot_seq:
+                continue  # schon im Snapshot enthalten
+            await ws.send_text(json.dumps(msg))
+        if sub.close_reason == "slow consumer":
+            await ws.close(code=1013, reason="slow consumer")
+    except (WebSocketDisconnect, RuntimeError):
+        pass
+    finally:
+        await trade_bus.unsubscribe(sub)
+        logger.info(f"Orderbook-WebSocket getrennt: {symbol}/{market}")
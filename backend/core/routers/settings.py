@@ -1,12 +1,13 @@
 import logging
-import asyncio
-from typing import Any, Dict, List
-from datetime import datetime
+from typing import Any, Dict, List, Optional
+from datetime import datetime, timezone
 
 from fastapi import APIRouter, Body, HTTPException
 
-from db.clickhouse import fetch_coin_settings, upsert_coin_setting
-from exchanges.bitget.backfill import BitgetBackfill
+from db.clickhouse import fetch_coin_settings_async, upsert_coin_setting_async
+from core.coverage import coverage_index
+from exchanges.bitget.backfill_jobs import backfill_scheduler
+from exchanges.bitget.supervisor import collector_supervisor
 
 router = APIRouter(
     prefix="/settings",
@@ -22,7 +23,7 @@ async def get_settings():
     Gibt alle gespeicherten Coin-Einstellungen (Datenbank) zurück.
     """
     try:
-        return fetch_coin_settings()
+        return await fetch_coin_settings_async()
     except Exception as e:
         logger.error(f"Settings-GET-Error: {e}")
         raise HTTPException(status_code=500, detail="Settings-Fehler")
@@ -32,13 +33,14 @@ async def get_settings():
 async def save_settings(settings: List[Dict[str, Any]] = Body(...)):
     """
     Speichert/aktualisiert Einstellungen für Coins (store_live, load_history, ...).
-    Optional: Startet Backfill, wenn load_history + history_until gesetzt.
+    Optional: Legt einen Backfill-Job an, wenn load_history + history_until gesetzt (siehe /backfill/jobs).
+    Danach verteilt der Collector-Supervisor die store_live-Symbole neu.
     """
     results = []
     for s in settings:
         try:
             dt = datetime.fromisoformat(s["history_until"]) if s.get("history_until") else None
-            upsert_coin_setting(
+            await upsert_coin_setting_async(
                 symbol=s["symbol"],
                 market=s.get("market", "spot"),
                 store_live=int(s.get("store_live", 1)),
@@ -48,23 +50,44 @@ async def save_settings(settings: List[Dict[str, Any]] = Body(...)):
                 db_resolution=int(s.get("db_resolution", 1)),
                 chart_resolution=s.get("chart_resolution", "1s"),
             )
-            # falls History geladen werden soll, Backfill im Hintergrund starten
+            # falls History geladen werden soll, Backfill-Job anlegen (läuft im Scheduler)
+            backfill = None
             if s.get("load_history") and dt:
-                manager = BitgetBackfill()
-                asyncio.create_task(manager.history(s["symbol"], dt))
+                backfill = await backfill_scheduler.submit(
+                    s["symbol"], dt.replace(tzinfo=dt.tzinfo or timezone.utc), market=s.get("market", "spot"),
+                )
 
-            results.append({"symbol": s["symbol"], "ok": True})
+            results.append({"symbol": s["symbol"], "ok": True, "backfill": backfill})
         except Exception as e:
             logger.error(f"Settings-Save-Error for symbol {s.get('symbol')}: {e}")
             results.append({"symbol": s.get("symbol"), "ok": False, "error": str(e)})
 
+    try:
+        await collector_supervisor.refresh()
+    except Exception as e:
+        logger.error(f"Collector-Rebalance-Error: {e}")
     return results
 
 
 @router.get("/completeness")
-async def get_completeness(symbol: str, until: str):
+async def get_completeness(
+    symbol: str,
+    until: str,
+    market: str = "spot",
+    granularity: str = "1m",
+    end: Optional[str] = None,
+):
     """
-    Prüft, ob wir bis 'until' historische Daten komplett haben.
-    Liefert aktuell immer False.
+    Prüft, ob wir von 'until' bis 'end' (Default: jetzt) historische Kerzen komplett haben.
+    Antwortet aus dem Coverage-Index (core/coverage.py) inkl. der fehlenden Lücken.
     """
-    return {"symbol": symbol, "complete": False, "until": until}
+    try:
+        start_dt = datetime.fromisoformat(until.rstrip("Z")).replace(tzinfo=timezone.utc)
+        end_dt = datetime.fromisoformat(end.rstrip("Z")).replace(tzinfo=timezone.utc) if end else datetime.now(timezone.utc)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    try:
+        return await coverage_index.completeness(symbol, market, granularity, start_dt, end_dt)
+    except Exception as e:
+        logger.error(f"Completeness-Error for {symbol}/{market}: {e}")
+        raise HTTPException(status_code=500, detail="Completeness-Fehler")
@@ -1,82 +1,62 @@
 import logging
-import traceback
-from typing import Any, Dict, List
 
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Request, Response, WebSocket, WebSocketDisconnect
 
-from exchanges.bitget.rest_utils import fetch_spot_tickers, fetch_futures_tickers
+from core.tickers import ticker_service
+from core.ws.bus import trade_bus, DISCONNECT
+from exchanges.bitget.tickers import live_tickers, TOPIC as TICKER_TOPIC
 
 router = APIRouter()
 logger = logging.getLogger("trading-api")
 
 
 @router.get("/ticker")
-async def get_ticker() -> List[Dict[str, Any]]:
+async def get_ticker(request: Request) -> Response:
     """
-    Holt aktuelle Ticker/Preise für alle Symbole und Märkte von Bitget REST.
+    Aktuelle Ticker/Preise aller Symbole und Märkte aus dem Snapshot des Ticker-Service
+    (core/tickers.py) – fertig serialisiert, ohne Bitget-Aufruf.
+    X-Ticker-Stale: 1, wenn mindestens ein Markt nicht rechtzeitig aktualisiert wurde;
+    If-None-Match mit dem aktuellen ETag -> 304.
     """
+    snapshot = ticker_service.snapshot
+    if snapshot is None:
+        return Response(status_code=503, content=b'{"detail":"Ticker-Snapshot noch nicht geladen"}',
+                        media_type="application/json", headers={"Retry-After": "1"})
+    age = ticker_service.age() or 0.0
+    headers = {
+        "ETag": snapshot.etag,
+        "Cache-Control": "no-cache",
+        "X-Ticker-Stale": "1" if ticker_service.is_stale() else "0",
+        "X-Ticker-Age": f"{age:.1f}",
+    }
+    if request.headers.get("if-none-match") == snapshot.etag:
+        ticker_service.metrics["not_modified"] += 1
+        return Response(status_code=304, headers=headers)
+    ticker_service.metrics["served"] += 1
+    return Response(content=snapshot.body, media_type="application/json", headers=headers)
+
+
+@router.websocket("/ws/tickers")
+async def websocket_tickers(ws: WebSocket):
+    """
+    Live-Ticker aller Symbole (Bitget ticker-Channel): zuerst ticker_snapshot mit fields und
+    allen Zeilen, danach ticker_delta nur mit geänderten Zeilen ([symbol, market, ...] wie fields).
+    Wer mit den Deltas nicht mithält, wird getrennt und bekommt beim Reconnect einen neuen Snapshot.
+    """
+    await ws.accept()
+    sub = await trade_bus.subscribe(TICKER_TOPIC, name=f"ws-tickers:{id(ws):x}", policy=DISCONNECT,
+                                    start=live_tickers.start, stop=live_tickers.stop)
     try:
-        out: List[Dict[str, Any]] = []
-
-        # Spot-Ticker
-        spot_tickers = await fetch_spot_tickers()
-        for tk in spot_tickers:
-            out.append({
-                "symbol":      tk["symbol"],
-                "last":        float(tk.get("last", 0)),
-                "high24h":     float(tk.get("high24h", 0)),
-                "low24h":      float(tk.get("low24h", 0)),
-                "changeRate":  float(tk.get("changeRate", 0)),
-                "baseVol":     float(tk.get("baseVol", 0)),
-                "quoteVol":    float(tk.get("quoteVol", 0)),
-                "market_type": "spot",
-            })
-
-        # USDT-Margined Futures
-        usdtm_tickers = await fetch_futures_tickers("umcbl")
-        for tk in usdtm_tickers:
-            out.append({
-                "symbol":      tk["symbol"],
-                "last":        float(tk.get("last", 0)),
-                "high24h":     float(tk.get("high24h", 0)),
-                "low24h":      float(tk.get("low24h", 0)),
-                "changeRate":  float(tk.get("changeRate", 0)),
-                "baseVol":     float(tk.get("baseVol", 0)),
-                "quoteVol":    float(tk.get("quoteVol", 0)),
-                "market_type": "usdtm",
-            })
-
-        # Coin-Margined Futures
-        coinm_tickers = await fetch_futures_tickers("dmcbl")
-        for tk in coinm_tickers:
-            out.append({
-                "symbol":      tk["symbol"],
-                "last":        float(tk.get("last", 0)),
-                "high24h":     float(tk.get("high24h", 0)),
-                "low24h":      float(tk.get("low24h", 0)),
-                "changeRate":  float(tk.get("changeRate", 0)),
-                "baseVol":     float(tk.get("baseVol", 0)),
-                "quoteVol":    float(tk.get("quoteVol", 0)),
-                "market_type": "coinm",
-            })
-
-        # USDC-Margined Futures
-        usdcm_tickers = await fetch_futures_tickers("cmcbl")
-        for tk in usdcm_tickers:
-            out.append({
-                "symbol":      tk["symbol"],
-                "last":        float(tk.get("last", 0)),
-                "high24h":     float(tk.get("high24h", 0)),
-                "low24h":      float(tk.get("low24h", 0)),
-                "changeRate":  float(tk.get("changeRate", 0)),
-                "baseVol":     float(tk.get("baseVol", 0)),
-                "quoteVol":    float(tk.get("quoteVol", 0)),
-                "market_type": "usdcm",
-            })
-
-        return out
-
-    except Exception as e:
-        logger.error(f"TICKER-API-ERROR: {e}")
-        traceback.print_exc()
-        raise HTTPException(status_code=500, detail=f"Ticker-API-Fehler: {e}")
+        snapshot_seq, snapshot = live_tickers.snapshot()
+        await ws.send_text(snapshot)
+        async for msg in sub:
+            if msg["seq"] <= snapshot_seq:
+                continue  # schon im Snapshot enthalten
+            await ws.send_text(msg["text"])
+        if sub.close_reason == "slow consumer":
+            await ws.close(code=1013, reason="slow consumer")
+    except (WebSocketDisconnect, RuntimeError):
+        pass
+    finally:
+        await trade_bus.unsubscribe(sub)
+        logger.info("Ticker-WebSocket getrennt")
@@ -3,38 +3,59 @@ import json
 import logging
 import traceback
 from datetime import datetime, timezone
-from typing import Dict, Set, Any
+from typing import Dict, Set, Any, Optional
 
-from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Body, HTTPException, Query
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Body, HTTPException, Query, Response
 
-from db.clickhouse import insert_trade, fetch_trades
-from exchanges.bitget.collector import BitgetCollector
-from exchanges.bitget.backfill import BitgetBackfill
+from db.clickhouse import fetch_trades_async, fetch_trades_page_async, decode_cursor
+from db.writer import batch_writer
+from core.ws.bus import trade_bus, Subscription
+from core.ws.bridge import trade_producer
+from core.ws.ws_handler import handle_websocket_connection
+from core.candles import candle_service
 from core.routers.symbols import get_symbols  # Optional für Routing-Integration
 
 router = APIRouter()
 logger = logging.getLogger("trading-api")
 
-# Globale Maps für WS-Clients und Collector/Queues
+# WS-Clients je symbol_key (für /healthz); Live-Trades laufen über den trade_bus,
+# Producer je symbol_key ist der gemeinsame mux_collector
 symbol_clients: Dict[str, Set[WebSocket]] = {}
-collectors: Dict[str, BitgetCollector] = {}
-queues: Dict[str, asyncio.Queue] = {}
+
+
+async def _watch_disconnect(ws: WebSocket, sub: Subscription):
+    """Erkennt Client-Disconnects auch dann, wenn gerade keine Trades fließen"""
+    try:
+        while True:
+            message = await ws.receive()
+            if message["type"] == "websocket.disconnect":
+                break
+    except Exception:
+        pass
+    sub.close("client disconnected")
+
 
 # ----- Gemeinsamer WebSocket-Handler -----
-async def websocket_handler(ws: WebSocket, symbol: str, market: str):
+async def websocket_handler(ws: WebSocket, symbol: str, market: str, resolution: str = "1m"):
+    """
+    Live-Trades plus Live-Kerzen (nur der gewünschten resolution, Default 1m) für ein Symbol.
+    """
     await ws.accept()
     symbol_key = f"{symbol}_{market}"
     symbol_clients.setdefault(symbol_key, set()).add(ws)
-    if symbol_key not in queues:
-        queues[symbol_key] = asyncio.Queue()
-        collector = BitgetCollector(symbol, market, queues[symbol_key])
-        collectors[symbol_key] = collector
-        asyncio.create_task(collector.start())
-        logger.info(f"[Collector] Started for {symbol}/{market}")
+
+    start_producer, stop_producer = trade_producer(symbol, market)
+    sub = await trade_bus.subscribe(
+        symbol_key,
+        name=f"ws:{ws.client.host if ws.client else '?'}:{id(ws):x}",
+        start=start_producer,
+        stop=stop_producer,
+    )
+    watcher = asyncio.create_task(_watch_disconnect(ws, sub))
 
     # Sende initial letzten N Trades
     try:
-        trades = fetch_trades(symbol, market, limit=30)
+        trades = await fetch_trades_async(symbol, market, limit=30)
         for trade in reversed(trades):
             await ws.send_text(json.dumps({
                 "type": "trade",
@@ -44,89 +65,94 @@ async def websocket_handler(ws: WebSocket, symbol: str, market: str):
         logger.error(f"Trade-Snapshot Fehler: {e}")
 
     try:
-        while True:
-            trade = await queues[symbol_key].get()
-            await ws.send_text(json.dumps({
-                "type": "trade",
-                **trade
-            }))
-    except WebSocketDisconnect:
-        symbol_clients[symbol_key].discard(ws)
+        async for msg in sub:
+            if msg.get("type") == "candle" and msg.get("resolution") != resolution:
+                continue
+            await ws.send_text(json.dumps(msg))
+        if sub.close_reason == "slow consumer":
+            logger.warning(f"WebSocket {symbol}/{market} getrennt: zu langsam ({sub.dropped} verworfen)")
+            await ws.close(code=1013, reason="slow consumer")
+    except (WebSocketDisconnect, RuntimeError):
+        pass
+    finally:
+        watcher.cancel()
+        symbol_clients.get(symbol_key, set()).discard(ws)
+        await trade_bus.unsubscribe(sub)
         logger.info(f"WebSocket getrennt: {symbol}/{market}")
 
 # ----- Neue & Alte URL-Varianten -----
 
+# Multi-Symbol: /ws (ein Socket, Subscribe-Protokoll, Wire-Protokoll json|columnar.v1;
+# core/ws/ws_handler.py, Producer über core/ws/bridge.py). Kein Konflikt mit /ws/{symbol}.
+@router.websocket("/ws")
+async def websocket_multiplex(ws: WebSocket):
+    await handle_websocket_connection(ws)
+
 # Variante 1: /ws/BTCUSDT (Frontend-ALT, implizit market="spot")
 @router.websocket("/ws/{symbol}")
-async def websocket_legacy(ws: WebSocket, symbol: str):
-    await websocket_handler(ws, symbol, "spot")
+async def websocket_legacy(ws: WebSocket, symbol: str, resolution: str = Query("1m")):
+    await websocket_handler(ws, symbol, "spot", resolution)
 
 # Variante 2: /ws/BTCUSDT/spot/trades (Frontend-ALT, Standard)
 @router.websocket("/ws/{symbol}/{market}/trades")
-async def websocket_legacy_trades(ws: WebSocket, symbol: str, market: str):
-    await websocket_handler(ws, symbol, market)
+async def websocket_legacy_trades(ws: WebSocket, symbol: str, market: str, resolution: str = Query("1m")):
+    await websocket_handler(ws, symbol, market, resolution)
 
 # Variante 3: /ws/BTCUSDT/spot (NEU, Backend Default)
 @router.websocket("/ws/{symbol}/{market}")
-async def websocket_trades(ws: WebSocket, symbol: str, market: str):
-    await websocket_handler(ws, symbol, market)
+async def websocket_trades(ws: WebSocket, symbol: str, market: str, resolution: str = Query("1m")):
+    await websocket_handler(ws, symbol, market, resolution)
 
 # ----- Trades Publish-Endpoint -----
 @router.post("/publish")
 async def publish(trade: Dict[str, Any] = Body(...)):
     ts = trade.get("ts")
     dt = datetime.fromisoformat(ts.rstrip("Z")) if ts else datetime.now(timezone.utc)
-    insert_trade(
+    await batch_writer.add_trade(
         trade["symbol"],
         trade.get("market", "spot"),
         float(trade["price"]),
         float(trade["size"]),
         trade.get("side", ""),
-        dt.isoformat()
+        dt
     )
-    # Push für alle WS-Clients (Broadcast)
+    # Push für alle WS-Clients (Broadcast über den Bus)
     symbol_key = f'{trade["symbol"]}_{trade.get("market", "spot")}'
-    for ws in symbol_clients.get(symbol_key, set()):
-        try:
-            asyncio.create_task(ws.send_text(json.dumps({
-                "type": "trade",
-                **trade
-            })))
-        except Exception as e:
-            logger.error(f"WS-Broadcast Error: {e}")
-            symbol_clients[symbol_key].discard(ws)
+    trade_bus.publish(symbol_key, {"type": "trade", **trade})
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    await candle_service.on_trade({
+        "symbol": trade["symbol"],
+        "market": trade.get("market", "spot"),
+        "price": float(trade["price"]),
+        "size": float(trade["size"]),
+        "ts_ms": int(dt.timestamp() * 1000),
+    })
     return {"ok": True}
 
 # ----- Trades GET-Endpoint für Curl & Frontend -----
 @router.get("/trades")
 async def get_trades(
+    response: Response,
     symbol: str = Query(...),
     market: str = Query("spot"),
-    limit: int = Query(100)
+    limit: int = Query(100),
+    cursor: Optional[str] = Query(None)
 ):
+    """
+    Trades (neueste zuerst). Header X-Next-Cursor → ?cursor=... liefert die nächste ältere Seite.
+    """
+    if cursor:
+        try:
+            decode_cursor(cursor)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
     try:
-        trades = fetch_trades(symbol, market, limit=limit)
+        trades, next_cursor = await fetch_trades_page_async(symbol, market, limit=limit, cursor=cursor)
+        if next_cursor:
+            response.headers["X-Next-Cursor"] = next_cursor
         return trades
     except Exception as e:
         logger.error(f"Fetch trades error: {e}")
         traceback.print_exc()
         raise HTTPException(status_code=500, detail="Fetch trades error")
-
-# ----- Backfill (direkt aus Settings oder als Helper für Tasks) -----
-@router.post("/backfill")
-async def backfill_endpoint(
-    symbol: str = Body(...),
-    until: str = Body(...),
-    granularity: str = Body("1s"),
-    limit: int = Body(200)
-):
-    try:
-        until_dt = datetime.fromisoformat(until.rstrip('Z')).replace(tzinfo=timezone.utc)
-        manager = BitgetBackfill()
-        await manager.history(symbol, until_dt, granularity, limit)
-        await manager.close()
-        return {"ok": True}
-    except Exception as e:
-        logger.error(f"Backfill Fehler: {e}")
-        traceback.print_exc()
-        raise HTTPException(status_code=500, detail=str(e))
@@ -4,7 +4,7 @@ from fastapi import APIRouter, Query
 from typing import List, Optional, Dict, Any
 import logging
 from whale.settings import fetch_coins
-import clickhouse_connect
+from db.pool import get_client
 
 router = APIRouter(prefix="/api", tags=["whales"])
 
@@ -12,21 +12,6 @@ router = APIRouter(prefix="/api", tags=["whales"])
 logging.basicConfig(level=logging.INFO, format='[%(asctime)s] [%(levelname)s] %(message)s')
 logger = logging.getLogger(__name__)
 
-CLICKHOUSE_HOST = "localhost"
-CLICKHOUSE_PORT = 8123
-CLICKHOUSE_USER = "default"
-CLICKHOUSE_PASSWORD = ""
-CLICKHOUSE_DB = "bitget"
-
-def get_client():
-    return clickhouse_connect.get_client(
-        host=CLICKHOUSE_HOST,
-        port=CLICKHOUSE_PORT,
-        username=CLICKHOUSE_USER,
-        password=CLICKHOUSE_PASSWORD,
-        database=CLICKHOUSE_DB,
-    )
-
 @router.get("/coins", response_model=List[Dict[str, Any]])
 def get_coins(
     symbol: Optional[str] = Query(None),
@@ -53,7 +38,6 @@ def get_whale_events(
     Liefert Whale-Events (on-chain Großtransfers), filterbar nach Symbol, Exchange und Zeitraum.
     """
     try:
-        client = get_client()
         sql = "SELECT event_id, ts, chain, tx_hash, from_addr, to_addr, token, symbol, amount, is_native, exchange FROM whale_events"
         conditions = []
         params = {}
@@ -73,7 +57,8 @@ def get_whale_events(
             sql += " WHERE " + " AND ".join(conditions)
         sql += " ORDER BY ts DESC LIMIT %(limit)s"
         params["limit"] = limit
-        result = client.query(sql, params)
+        with get_client() as client:
+            result = client.query(sql, params)
         events = [dict(zip(result.column_names, row)) for row in result.result_rows]
         logger.info(f"[API] /whale_events -> {len(events)} events returned (filters: {params})")
         return events
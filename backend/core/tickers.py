@@ -0,0 +1,148 @@
+"""
+Ticker-Snapshot für GET /ticker.
+
+Ein Hintergrund-Task holt alle TICKER_REFRESH_INTERVAL s die Ticker der vier Märkte
+parallel von Bitget und legt daraus einen Snapshot an: fertig serialisiertes JSON (bytes)
+plus ETag. Requests liefern nur noch diese Bytes aus (O(1), kein Warten auf Bitget).
+Schlägt ein Markt fehl, bleiben seine letzten Zeilen im Snapshot; ist ein Markt älter
+als TICKER_STALE_AFTER s, gilt der Snapshot als stale.
+"""
+import asyncio
+import hashlib
+import logging
+import time
+import traceback
+from typing import Any, Dict, List, Optional
+
+import orjson
+
+from core.config import settings
+from exchanges.bitget.rest_utils import fetch_spot_tickers, fetch_futures_tickers
+
+logger = logging.getLogger(__name__)
+
+# market -> productType der v1-Ticker-Endpunkte (None = Spot)
+TICKER_MARKETS = {"spot": None, "usdtm": "umcbl", "coinm": "dmcbl", "usdcm": "cmcbl"}
+
+
+def _row(tk: Dict[str, Any], market: str) -> Dict[str, Any]:
+    return {
+        "symbol":      tk["symbol"],
+        "last":        float(tk.get("last") or 0),
+        "high24h":     float(tk.get("high24h") or 0),
+        "low24h":      float(tk.get("low24h") or 0),
+        "changeRate":  float(tk.get("changeRate") or 0),
+        "baseVol":     float(tk.get("baseVol") or 0),
+        "quoteVol":    float(tk.get("quoteVol") or 0),
+        "market_type": market,
+    }
+
+
+class TickerSnapshot:
+    """Unveränderlicher Stand: JSON-Body und ETag, einmal je Refresh berechnet"""
+    __slots__ = ("body", "etag", "count", "created")
+
+    def __init__(self, rows: List[Dict[str, Any]]):
+        self.body: bytes = orjson.dumps(rows)
+        self.etag = '"' + hashlib.blake2b(self.body, digest_size=12).hexdigest() + '"'
+        self.count = len(rows)
+        self.created = time.time()
+
+
+class TickerService:
+    def __init__(self, interval_s: float = 2.0, stale_after_s: float = 30.0):
+        self.interval_s = interval_s
+        self.stale_after_s = stale_after_s
+        self._rows: Dict[str, List[Dict[str, Any]]] = {}
+        self._updated: Dict[str, float] = {}     # market -> letzter erfolgreicher Refresh
+        self._errors: Dict[str, str] = {}
+        self.snapshot: Optional[TickerSnapshot] = None
+        self._task: Optional[asyncio.Task] = None
+        self.running = False
+        self.metrics = {"refreshes": 0, "refresh_errors": 0, "refresh_ms_last": 0.0, "encode_ms_last": 0.0,
+                        "served": 0, "not_modified": 0}
+
+    async def start(self):
+        if self.running:
+            return
+        self.running = True
+        self._task = asyncio.create_task(self._loop())
+        logger.info(f"Ticker service started (every {self.interval_s:.1f}s)")
+
+    async def stop(self):
+        if not self.running:
+            return
+        self.running = False
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    async def _loop(self):
+        while self.running:
+            started = time.monotonic()
+            try:
+                await self.refresh()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Ticker refresh failed: {e}")
+                traceback.print_exc()
+            await asyncio.sleep(max(self.interval_s - (time.monotonic() - started), 0.1))
+
+    async def _fetch(self, market: str, product_type: Optional[str]) -> List[Dict[str, Any]]:
+        data = await (fetch_futures_tickers(product_type) if product_type else fetch_spot_tickers())
+        return [_row(tk, market) for tk in data]
+
+    async def refresh(self):
+        """Alle Märkte parallel holen; fehlgeschlagene behalten ihre letzten Zeilen"""
+        started = time.perf_counter()
+        results = await asyncio.gather(
+            *(self._fetch(market, pt) for market, pt in TICKER_MARKETS.items()), return_exceptions=True
+        )
+        now = time.time()
+        for market, result in zip(TICKER_MARKETS, results):
+            if isinstance(result, BaseException):
+                self.metrics["refresh_errors"] += 1
+                self._errors[market] = f"{type(result).__name__}: {result}"
+                logger.warning(f"Ticker refresh {market} failed, serving last snapshot: {result}")
+                continue
+            self._rows[market] = result
+            self._updated[market] = now
+            self._errors.pop(market, None)
+        self.metrics["refresh_ms_last"] = round((time.perf_counter() - started) * 1000, 1)
+        if len(self._errors) == len(TICKER_MARKETS) and self.snapshot is not None:
+            return  # komplett ausgefallen: alter Snapshot bleibt unverändert
+        encode_started = time.perf_counter()
+        self.snapshot = TickerSnapshot([row for market in TICKER_MARKETS for row in self._rows.get(market, ())])
+        self.metrics["encode_ms_last"] = round((time.perf_counter() - encode_started) * 1000, 2)
+        self.metrics["refreshes"] += 1
+
+    def age(self) -> Optional[float]:
+        """Alter des ältesten Markts in s (None = noch nie geladen)"""
+        if not self._updated:
+            return None
+        oldest = min(self._updated.get(market, 0.0) for market in TICKER_MARKETS)
+        return time.time() - oldest
+
+    def is_stale(self) -> bool:
+        age = self.age()
+        return age is None or age > self.stale_after_s
+
+    def get_metrics(self) -> dict:
+        age = self.age()
+        return {
+            "running": self.running,
+            "symbols": self.snapshot.count if self.snapshot else 0,
+            "bytes": len(self.snapshot.body) if self.snapshot else 0,
+            "age_s": round(age, 1) if age is not None else None,
+            "stale": self.is_stale(),
+            "errors": dict(self._errors),
+            **self.metrics,
+        }
+
+
+# Globale Instanz (Start/Stop über FastAPI-Lifecycle in core/main.py)
+ticker_service = TickerService(settings.TICKER_REFRESH_INTERVAL, settings.TICKER_STALE_AFTER)
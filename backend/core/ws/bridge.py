@@ -0,0 +1,232 @@
+"""
+Producer für den Multi-Symbol-WebSocket /ws (core/ws/ws_handler.py: ws_manager).
+
+Der ws_manager meldet jede neue (symbol, channel)-Subscription und wann der letzte
+Subscriber eines Channels geht. Solange jemand zuhört, läuft je Symbol und Quelle eine Pumpe,
+die den trade_bus liest und in den ws_manager schreibt:
+- trades, candles:<res>: Topic "{symbol}_{market}" – startet mux_collector und Live-Kerzen
+  wie /ws/{symbol}/{market} (trade_producer)
+- book: Topic "book:{symbol}_{market}" (book_service); jeder neue book-Subscriber löst einen
+  frischen book_snapshot aus, die Deltas davor verwirft der Batch des ws_managers
+- ALL (per URL gepinnte Sockets) braucht beide Pumpen
+
+Symbole im Subscribe heißen wie die Bus-Topics: "BTCUSDT" = Spot, "BTCUSDT_usdtm" = Futures.
+Einen ticker-Channel gibt es hier nicht (Ticker laufen über /ws/tickers), valid_channel lehnt ihn ab.
+"""
+import asyncio
+import logging
+from typing import Dict, Optional, Set, Tuple
+
+from core.candles import candle_service
+from core.ws.bus import DISCONNECT, Subscription, trade_bus
+from core.ws.ws_handler import ALL, PerformantWebSocketManager, ws_manager
+from exchanges.bitget.collector import mux_collector
+from exchanges.bitget.orderbook import LocalOrderBook, book_service
+from exchanges.bitget.rest_utils import FUTURES_MARKETS
+
+logger = logging.getLogger(__name__)
+
+# Pumpen je Routing-Symbol: Trades + Live-Kerzen bzw. Orderbuch
+TRADES = "trades"
+BOOK = "book"
+BOOK_SNAPSHOT_WAIT_S = 5.0
+
+
+def split_symbol(key: str) -> Tuple[str, str]:
+    """Routing-Symbol -> (symbol, market); ohne bekannten Markt-Suffix Spot"""
+    symbol, _, market = key.rpartition("_")
+    if symbol and (market == "spot" or market in FUTURES_MARKETS):
+        return symbol, market
+    return key, "spot"
+
+
+def _pump_of(channel: str) -> Optional[str]:
+    if channel == "trades" or channel.startswith("candles:"):
+        return TRADES
+    if channel == "book":
+        return BOOK
+    return None
+
+
+class _Pump:
+    """Laufende Pumpe; gestoppt wird über die Subscription, nicht per cancel() (Start-Hooks laufen zu Ende)"""
+    __slots__ = ("task", "sub", "stopped")
+
+    def __init__(self):
+        self.task: Optional[asyncio.Task] = None
+        self.sub: Optional[Subscription] = None
+        self.stopped = False
+
+    def attach(self, sub: Subscription):
+        self.sub = sub
+        if self.stopped:
+            sub.close("no subscribers")
+
+    def stop(self):
+        self.stopped = True
+        if self.sub is not None:
+            self.sub.close("no subscribers")
+
+
+def trade_producer(symbol: str, market: str):
+    """start/stop-Hooks für das Bus-Topic "{symbol}_{market}": Collector-Trades plus Live-Kerzen"""
+    topic = f"{symbol}_{market}"
+
+    async def publish_trade(trade: dict):
+        trade_bus.publish(topic, {"type": "trade", **trade})
+        await candle_service.on_trade(trade)
+
+    async def start():
+        candle_service.track(symbol, market)
+        await mux_collector.add(symbol, market, publish_trade)
+
+    async def stop():
+        await mux_collector.remove(symbol, market)
+        await candle_service.untrack(symbol, market)
+
+    return start, stop
+
+
+class WebSocketBridge:
+    def __init__(self, manager: PerformantWebSocketManager):
+        self._manager = manager
+        self._channels: Dict[str, Set[str]] = {}                  # Routing-Symbol -> aktive Channels
+        self._pumps: Dict[Tuple[str, str], _Pump] = {}            # (Routing-Symbol, Pumpe)
+        self._books: Dict[str, LocalOrderBook] = {}
+        self._snapshot_seq: Dict[str, int] = {}
+        self.metrics = {"pumps_started": 0, "pumps_stopped": 0, "forwarded": 0, "book_snapshots": 0, "errors": 0}
+
+    def start(self):
+        self._manager.on_subscribe = self._on_subscribe
+        self._manager.on_channel_idle = self._on_channel_idle
+
+    async def stop(self):
+        self._manager.on_subscribe = self._manager.on_channel_idle = None
+        pumps = list(self._pumps.values())
+        self._pumps.clear()
+        for pump in pumps:
+            pump.stop()
+        await asyncio.gather(*(pump.task for pump in pumps), return_exceptions=True)
+        self._channels.clear()
+        self._books.clear()
+
+    # --- Hooks des ws_managers (synchron) ---
+    def _on_subscribe(self, key: str, channel: str):
+        self._channels.setdefault(key, set()).add(channel)
+        for pump in self._needed(channel):
+            if (key, pump) not in self._pumps:
+                self._start_pump(key, pump)
+            elif pump == BOOK:
+                # späte Subscriber brauchen ein Buch, auf das die folgenden Deltas passen
+                self._send_book_snapshot(key)
+
+    def _on_channel_idle(self, key: str, channel: str):
+        channels = self._channels.get(key)
+        if channels is None:
+            return
+        channels.discard(channel)
+        needed = {pump for ch in channels for pump in self._needed(ch)}
+        for pump in self._needed(channel):
+            if pump not in needed:
+                self._stop_pump(key, pump)
+        if not channels:
+            del self._channels[key]
+
+    @staticmethod
+    def _needed(channel: str) -> Tuple[str, ...]:
+        if channel == ALL:
+            return TRADES, BOOK
+        pump = _pump_of(channel)
+        return (pump,) if pump else ()
+
+    def _start_pump(self, key: str, kind: str):
+        pump = self._pumps[(key, kind)] = _Pump()
+        run = self._pump_trades if kind == TRADES else self._pump_book
+        pump.task = asyncio.create_task(run(key, pump))
+        self.metrics["pumps_started"] += 1
+
+    def _stop_pump(self, key: str, kind: str):
+        pump = self._pumps.pop((key, kind), None)
+        if pump is not None:
+            pump.stop()
+            self.metrics["pumps_stopped"] += 1
+        if kind == BOOK:
+            self._books.pop(key, None)
+            self._snapshot_seq.pop(key, None)
+
+    def _forget_pump(self, key: str, kind: str, pump: _Pump):
+        """Gescheiterte Pumpe austragen, damit der nächste Subscribe sie neu startet"""
+        if self._pumps.get((key, kind)) is pump:
+            self._stop_pump(key, kind)
+
+    # --- Pumpen ---
+    async def _pump_trades(self, key: str, pump: _Pump):
+        symbol, market = split_symbol(key)
+        start, stop = trade_producer(symbol, market)
+        try:
+            sub = await trade_bus.subscribe(f"{symbol}_{market}", name=f"ws-bridge:{key}", start=start, stop=stop)
+        except Exception as e:
+            self.metrics["errors"] += 1
+            logger.error(f"[WebSocketBridge] Trade producer for {key} failed to start: {e}")
+            self._forget_pump(key, TRADES, pump)
+            return
+        pump.attach(sub)
+        try:
+            async for msg in sub:
+                # Live-Kerzen sind schon gedrosselt; Debounce würde die geschlossene Kerze verschlucken
+                self._manager.queue_message(key, msg, debounce_ms=0 if msg.get("type") == "candle" else None)
+                self.metrics["forwarded"] += 1
+        finally:
+            await trade_bus.unsubscribe(sub)
+
+    async def _pump_book(self, key: str, pump: _Pump):
+        symbol, market = split_symbol(key)
+        while not pump.stopped:
+            try:
+                book = await book_service.ensure(symbol, market)
+            except Exception as e:
+                self.metrics["errors"] += 1
+                logger.error(f"[WebSocketBridge] Order book for {key} failed to start: {e}")
+                self._forget_pump(key, BOOK, pump)
+                return
+            sub = await trade_bus.subscribe(book_service.topic(symbol, market), name=f"ws-bridge-book:{key}",
+                                            policy=DISCONNECT)
+            pump.attach(sub)
+            if not pump.stopped:
+                self._books[key] = book
+            try:
+                if book.synced or await book_service.wait_synced(book, BOOK_SNAPSHOT_WAIT_S):
+                    self._send_book_snapshot(key)
+                async for msg in sub:
+                    if msg["type"] == "book_delta" and msg["seq"] <= self._snapshot_seq.get(key, -1):
+                        continue  # schon im Snapshot enthalten
+                    if msg["type"] == "book_snapshot":
+                        self._snapshot_seq[key] = msg["seq"]
+                    self._manager.queue_message(key, msg)
+                    self.metrics["forwarded"] += 1
+            finally:
+                await trade_bus.unsubscribe(sub)
+            if not pump.stopped:
+                # DISCONNECT: Deltas verpasst -> mit neuem Snapshot weiter
+                logger.warning(f"[WebSocketBridge] Book pump for {key} fell behind ({sub.close_reason}), resyncing")
+
+    def _send_book_snapshot(self, key: str):
+        book = self._books.get(key)
+        if book is None or not book.synced:
+            return  # die Pumpe schickt den Snapshot, sobald das Buch synchron ist
+        asks, bids = book.levels()
+        self._snapshot_seq[key] = book.seq
+        self._manager.queue_message(key, {"type": "book_snapshot", "symbol": book.symbol, "market": book.market,
+                                          "seq": book.seq, "ts": book.ts, "asks": asks, "bids": bids})
+        self.metrics["book_snapshots"] += 1
+
+    def get_metrics(self) -> dict:
+        return {
+            **self.metrics,
+            "symbols": len(self._channels),
+            "pumps": sorted(f"{key}:{pump}" for key, pump in self._pumps),
+        }
+
+
+# Globale Brücke (Start/Stop über FastAPI-Lifecycle in core/main.py)
+ws_bridge = WebSocketBridge(ws_manager)
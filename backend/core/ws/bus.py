@@ -0,0 +1,233 @@
+import asyncio
+import contextlib
+import logging
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Dict, Optional, Set
+
+from core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Verhalten, wenn der Ringpuffer eines Subscribers voll ist
+DROP_OLDEST = "drop_oldest"   # älteste Nachricht verwerfen
+CONFLATE = "conflate"         # Puffer auf die jeweils neueste Nachricht je conflate_key eindampfen
+DISCONNECT = "disconnect"     # Subscriber schließen (Client muss neu verbinden)
+POLICIES = (DROP_OLDEST, CONFLATE, DISCONNECT)
+
+Hook = Callable[[], Awaitable[None]]
+
+
+class SubscriberClosed(Exception):
+    """Subscription wurde geschlossen (Unsubscribe oder Slow-Consumer-Policy 'disconnect')"""
+
+
+def _type_key(msg: Any) -> Any:
+    return (msg.get("type"), msg.get("resolution")) if isinstance(msg, dict) else None
+
+
+class Subscription:
+    """
+    Ein Empfänger auf einem Topic mit eigenem, begrenztem Ringpuffer.
+    Der Producer blockiert nie: ist der Puffer voll, greift die Policy.
+    """
+    def __init__(self, topic: str, maxlen: int, policy: str, name: str = "",
+                 conflate_key: Callable[[Any], Any] = _type_key):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown slow-consumer policy: {policy}")
+        self.topic = topic
+        self.name = name
+        self.maxlen = maxlen
+        self.policy = policy
+        self._conflate_key = conflate_key
+        self._buffer: deque = deque()
+        self._ready = asyncio.Event()
+        self.closed = False
+        self.close_reason = ""
+        self.created = time.time()
+        # Metriken
+        self.published = 0
+        self.delivered = 0
+        self.dropped = 0
+        self.conflated = 0
+        self.max_lag = 0
+
+    def offer(self, msg: Any) -> bool:
+        """Vom Producer aufgerufen; False, wenn der Subscriber (jetzt) geschlossen ist"""
+        if self.closed:
+            return False
+        self.published += 1
+        if len(self._buffer) >= self.maxlen:
+            if self.policy == DISCONNECT:
+                self.close("slow consumer")
+                self.dropped += 1
+                return False
+            if self.policy == CONFLATE:
+                self._conflate()
+            if len(self._buffer) >= self.maxlen:
+                self._buffer.popleft()
+                self.dropped += 1
+        self._buffer.append(msg)
+        self.max_lag = max(self.max_lag, len(self._buffer))
+        self._ready.set()
+        return True
+
+    def _conflate(self):
+        latest: Dict[Any, Any] = {}
+        for msg in self._buffer:
+            key = self._conflate_key(msg)
+            latest.pop(key, None)
+            latest[key] = msg
+        self.conflated += len(self._buffer) - len(latest)
+        self._buffer = deque(latest.values())
+
+    async def get(self) -> Any:
+        while not self._buffer:
+            if self.closed:
+                raise SubscriberClosed(self.close_reason)
+            self._ready.clear()
+            await self._ready.wait()
+        if self.closed and self.policy == DISCONNECT:
+            raise SubscriberClosed(self.close_reason)
+        self.delivered += 1
+        return self._buffer.popleft()
+
+    def close(self, reason: str = "closed"):
+        if not self.closed:
+            self.closed = True
+            self.close_reason = reason
+            self._ready.set()
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        try:
+            return await self.get()
+        except SubscriberClosed:
+            raise StopAsyncIteration
+
+    @property
+    def lag(self) -> int:
+        return len(self._buffer)
+
+    def get_metrics(self) -> dict:
+        return {
+            "name": self.name,
+            "policy": self.policy,
+            "maxlen": self.maxlen,
+            "lag": self.lag,
+            "max_lag": self.max_lag,
+            "published": self.published,
+            "delivered": self.delivered,
+            "dropped": self.dropped,
+            "conflated": self.conflated,
+            "closed": self.closed,
+            "close_reason": self.close_reason,
+            "age_s": round(time.time() - self.created, 1),
+        }
+
+
+class TradeBus:
+    """
+    In-Process Publish/Subscribe: ein Producer (z.B. Collector) pro Topic,
+    beliebig viele Subscriber mit je eigenem Ringpuffer – jede Nachricht geht
+    an jeden Subscriber. Der erste Subscriber eines Topics startet den Producer
+    (start-Hook), der letzte stoppt ihn wieder (stop-Hook).
+    Subscribe/Unsubscribe sind je Topic serialisiert: ein langsamer Start-Hook (z.B. REST-
+    Symbollisten der Live-Ticker) hält nur Subscriber desselben Topics auf.
+    """
+    def __init__(self, maxlen: int = 1000, policy: str = DROP_OLDEST):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown slow-consumer policy: {policy}")
+        self.default_maxlen = maxlen
+        self.default_policy = policy
+        self._topics: Dict[str, Set[Subscription]] = {}
+        self._stop_hooks: Dict[str, Hook] = {}
+        self._locks: Dict[str, list] = {}   # topic -> [Lock, Anzahl Halter/Wartende]
+        self.published = 0
+
+    @contextlib.asynccontextmanager
+    async def _topic_lock(self, topic: str):
+        """Lock je Topic; wird entfernt, sobald niemand mehr ihn hält oder darauf wartet"""
+        entry = self._locks.get(topic)
+        if entry is None:
+            entry = self._locks[topic] = [asyncio.Lock(), 0]
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                yield
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0:
+                self._locks.pop(topic, None)
+
+    async def subscribe(self, topic: str, *, name: str = "", maxlen: Optional[int] = None,
+                        policy: Optional[str] = None, start: Optional[Hook] = None,
+                        stop: Optional[Hook] = None, **kwargs) -> Subscription:
+        sub = Subscription(topic, maxlen or self.default_maxlen, policy or self.default_policy, name, **kwargs)
+        async with self._topic_lock(topic):
+            subs = self._topics.setdefault(topic, set())
+            first = not subs
+            subs.add(sub)
+            if first:
+                if stop is not None:
+                    self._stop_hooks[topic] = stop
+                if start is not None:
+                    try:
+                        await start()
+                    except Exception:
+                        subs.discard(sub)
+                        self._drop_topic_if_empty(topic)
+                        raise
+                    logger.info(f"[TradeBus] Producer started for {topic}")
+        return sub
+
+    async def unsubscribe(self, sub: Subscription):
+        sub.close("unsubscribed")
+        async with self._topic_lock(sub.topic):
+            subs = self._topics.get(sub.topic)
+            if not subs or sub not in subs:
+                return
+            subs.discard(sub)
+            if not subs:
+                stop = self._stop_hooks.pop(sub.topic, None)
+                self._drop_topic_if_empty(sub.topic)
+                if stop is not None:
+                    try:
+                        await stop()
+                        logger.info(f"[TradeBus] Producer stopped for {sub.topic} (last subscriber left)")
+                    except Exception as e:
+                        logger.error(f"[TradeBus] Stop hook for {sub.topic} failed: {e}")
+
+    def _drop_topic_if_empty(self, topic: str):
+        if not self._topics.get(topic):
+            self._topics.pop(topic, None)
+
+    def publish(self, topic: str, msg: Any) -> int:
+        """Verteilt msg an alle Subscriber des Topics (blockiert nie), gibt die Anzahl zurück"""
+        subs = self._topics.get(topic)
+        if not subs:
+            return 0
+        self.published += 1
+        delivered = 0
+        for sub in tuple(subs):
+            if sub.offer(msg):
+                delivered += 1
+        return delivered
+
+    def subscriber_count(self, topic: str) -> int:
+        return len(self._topics.get(topic, ()))
+
+    def get_metrics(self) -> dict:
+        return {
+            "published": self.published,
+            "topics": {
+                topic: [sub.get_metrics() for sub in subs]
+                for topic, subs in self._topics.items()
+            },
+        }
+
+
+# Globale Instanz (Trades-Router, /metrics)
+trade_bus = TradeBus(maxlen=settings.BUS_SUBSCRIBER_BUFFER, policy=settings.BUS_SLOW_CONSUMER_POLICY)
@@ -0,0 +1,132 @@
+"""
+Wire-Protokolle der Client-WebSockets (core/ws/ws_handler.py).
+
+- json (Standard und Fallback): jeder Frame als JSON-Text wie bisher.
+- columnar.v1: Trade-Batches als binärer Frame mit fester Spaltenanordnung; alles andere
+  (Candles, Book, Steuer-Nachrichten) bleibt JSON-Text. Schema und Symbol-Wörterbuch gehen
+  einmal als JSON an den Client, danach nur noch Zahlenarrays.
+
+Ausgehandelt wird beim Connect über Sec-WebSocket-Protocol oder ?proto=...; unbekannte
+Werte fallen auf json zurück. Das Protokoll gilt für die ganze Verbindung.
+
+Layout columnar.v1, Frame "trades" (Little Endian):
+    Header  <BBHIIqq  version, frame_type (1), symbol_id, n, cseq, base_ts_ms, server_time_ms  (28 B)
+    price   float64[n]
+    size    float64[n]
+    dt_ms   uint32[n]  ts - base_ts_ms
+    side    uint8[n]   0 = buy, 1 = sell
+= 21 B je Trade plus 28 B je Frame; cseq ist die Kanal-Sequenz wie in den JSON-Frames
+"""
+import struct
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+import orjson
+
+JSON = "json"
+COLUMNAR = "columnar.v1"
+PROTOCOLS = (JSON, COLUMNAR)
+# Kurzformen für ?proto=
+ALIASES = {"json": JSON, "columnar": COLUMNAR, "columnar.v1": COLUMNAR, "binary": COLUMNAR}
+
+VERSION = 1
+FRAME_TRADES = 1
+HEADER = struct.Struct("<BBHIIqq")
+SIDES = ("buy", "sell")
+
+SCHEMA = {
+    "type": "schema",
+    "protocol": COLUMNAR,
+    "byte_order": "little",
+    "frames": {
+        "trades": {
+            "frame_type": FRAME_TRADES,
+            "header": [["version", "u8"], ["frame_type", "u8"], ["symbol_id", "u16"], ["count", "u32"],
+                       ["cseq", "u32"], ["base_ts_ms", "i64"], ["server_time_ms", "i64"]],
+            "columns": [["price", "f64"], ["size", "f64"], ["dt_ms", "u32"], ["side", "u8"]],
+        },
+    },
+    "sides": list(SIDES),
+}
+SCHEMA_TEXT = orjson.dumps(SCHEMA).decode()
+
+
+def negotiate(websocket) -> Tuple[str, Optional[str]]:
+    """
+    (Protokoll, Subprotocol für accept()) aus dem Handshake: zuerst Sec-WebSocket-Protocol,
+    dann ?proto=; sonst json
+    """
+    for offered in websocket.scope.get("subprotocols") or ():
+        if offered in PROTOCOLS:
+            return offered, offered
+    proto = websocket.query_params.get("proto")
+    return ALIASES.get((proto or JSON).lower(), JSON), None
+
+
+def ts_ms(value) -> int:
+    """Trade-Zeitstempel (ms, s, datetime oder ISO-String) -> ms; ohne Zeitzone gilt UTC"""
+    if isinstance(value, (int, float)):
+        return int(value if value > 1e11 else value * 1000)
+    if isinstance(value, str):
+        if value.isdigit():
+            return int(value)
+        value = datetime.fromisoformat(value)
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return int(value.timestamp() * 1000)
+
+
+class SymbolDictionary:
+    """
+    Globale Zuordnung (symbol, market) -> u16-ID; der Eintrag wird je Symbol einmal kodiert.
+    IDs werden nie wiederverwendet (Clients cachen sie); ist der Raum voll, liefert id() None
+    und der Handler schickt dieses Symbol als JSON.
+    """
+    def __init__(self):
+        self.ids: Dict[Tuple[str, str], int] = {}
+        self.texts: List[str] = []
+
+    def id(self, symbol: str, market: str) -> Optional[int]:
+        key = (symbol, market)
+        symbol_id = self.ids.get(key)
+        if symbol_id is None:
+            symbol_id = len(self.texts)
+            if symbol_id > 0xFFFF:
+                return None
+            self.ids[key] = symbol_id
+            self.texts.append(orjson.dumps({"type": "symbols", "symbols": [[symbol_id, symbol, market]]}).decode())
+        return symbol_id
+
+    def text(self, symbol_id: int) -> str:
+        return self.texts[symbol_id]
+
+
+def encode_trades(trades: List[dict], symbol_id: int, cseq: int = 0, server_time_ms: Optional[int] = None) -> bytes:
+    """Trade-Nachrichten (wie broadcast_trade_data) -> ein columnar.v1-Frame"""
+    n = len(trades)
+    stamps = [ts_ms(t["ts"]) for t in trades]
+    base = min(stamps) if stamps else 0
+    return b"".join((
+        HEADER.pack(VERSION, FRAME_TRADES, symbol_id, n, cseq & 0xFFFFFFFF, base,
+                    int(time.time() * 1000) if server_time_ms is None else server_time_ms),
+        struct.pack(f"<{n}d", *[t["price"] for t in trades]),
+        struct.pack(f"<{n}d", *[t["size"] for t in trades]),
+        struct.pack(f"<{n}I", *[s - base for s in stamps]),
+        bytes(0 if t["side"] == "buy" else 1 for t in trades),
+    ))
+
+
+def decode_trades(frame: bytes) -> dict:
+    """Gegenstück zu encode_trades (Client-Referenz, Benchmarks)"""
+    version, frame_type, symbol_id, n, cseq, base, server_time = HEADER.unpack_from(frame)
+    offset = HEADER.size
+    price = struct.unpack_from(f"<{n}d", frame, offset)
+    offset += 8 * n
+    size = struct.unpack_from(f"<{n}d", frame, offset)
+    offset += 8 * n
+    dt = struct.unpack_from(f"<{n}I", frame, offset)
+    offset += 4 * n
+    side = frame[offset:offset + n]
+    return {"symbol_id": symbol_id, "cseq": cseq, "server_time": server_time, "price": price, "size": size,
+            "ts": [base + d for d in dt], "side": [SIDES[s] for s in side]}
@@ -3,10 +3,17 @@ import json
 import time
 import traceback
 import logging
-from typing import Dict, Set
-from fastapi import WebSocket
+from collections import deque
+from typing import Callable, Dict, List, Optional, Tuple
+from fastapi import WebSocket, WebSocketDisconnect
 from datetime import datetime
 
+import orjson
+
+from core.candles import RESOLUTION_LABELS
+from core.config import settings
+from core.ws import wire
+
 # Structured logging setup
 logging.basicConfig(
     level=logging.INFO,
@@ -14,40 +21,282 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+
+class _Tick:
+    """One broadcast tick: completes when every client it was handed to has sent, dropped or been evicted"""
+    __slots__ = ("started", "remaining", "manager")
+
+    def __init__(self, manager: "PerformantWebSocketManager", started: float):
+        self.manager = manager
+        self.started = started
+        self.remaining = 0
+
+    def done(self):
+        self.remaining -= 1
+        if self.remaining == 0:
+            self.manager._record_fanout((time.perf_counter() - self.started) * 1000)
+
+
+# Delivery policy per message type
+LOSSLESS = "lossless"     # every message, sent as arrays ("trades")
+MERGE = "merge"           # order-book deltas of a tick merged into one delta
+CONFLATE = "conflate"     # only the latest value per key (candles, tickers, anything else)
+MESSAGE_POLICIES = {"trade": LOSSLESS, "book_delta": MERGE, "book_snapshot": MERGE,
+                    "candle": CONFLATE, "ticker": CONFLATE}
+
+
+def _conflate_key(message: dict) -> tuple:
+    return message.get("type"), message.get("resolution")
+
+
+# Subscription channels per symbol; ALL is what URL-pinned (legacy) sockets get.
+# Only channels with a producer (core/ws/bridge.py): live candles exist for LIVE_RESOLUTIONS,
+# tickers have their own socket (/ws/tickers)
+ALL = "*"
+CHANNELS = ("trades", "book")
+CANDLE_CHANNELS = frozenset(f"candles:{label}" for label in RESOLUTION_LABELS.values())
+
+
+def channel_of(message: dict) -> str:
+    """Channel a message or frame is routed to"""
+    kind = message.get("type")
+    if kind in ("trade", "trades"):
+        return "trades"
+    if kind in ("book_delta", "book_snapshot"):
+        return "book"
+    if kind == "candle":
+        return f"candles:{message.get('resolution') or '1m'}"
+    return kind
+
+
+def valid_channel(channel) -> bool:
+    return isinstance(channel, str) and (channel in CHANNELS or channel == ALL or channel in CANDLE_CHANNELS)
+
+
+class _SymbolBatch:
+    """Everything queued for one symbol since the last flush, grouped by delivery policy"""
+    __slots__ = ("trades", "latest", "book_snapshot", "book_asks", "book_bids", "book_first", "book_last")
+
+    def __init__(self):
+        self.trades: list = []
+        self.latest: Dict[tuple, dict] = {}
+        self.book_snapshot: Optional[dict] = None
+        self.book_asks: Dict = {}
+        self.book_bids: Dict = {}
+        self.book_first: Optional[dict] = None   # first delta of the tick (prev_seq)
+        self.book_last: Optional[dict] = None    # last delta of the tick (seq, ts)
+
+    def __bool__(self) -> bool:
+        return bool(self.trades or self.latest or self.book_snapshot or self.book_last)
+
+    def add(self, message: dict) -> str:
+        policy = MESSAGE_POLICIES.get(message.get("type"), CONFLATE)
+        if policy == LOSSLESS:
+            self.trades.append(message)
+        elif policy == MERGE:
+            if message.get("type") == "book_snapshot":
+                # a snapshot replaces everything queued before it
+                self.book_snapshot = message
+                self.book_asks.clear()
+                self.book_bids.clear()
+                self.book_first = self.book_last = None
+            else:
+                for price, size, *_ in message.get("asks", ()):
+                    self.book_asks[price] = size
+                for price, size, *_ in message.get("bids", ()):
+                    self.book_bids[price] = size
+                if self.book_first is None:
+                    self.book_first = message
+                self.book_last = message
+        else:
+            self.latest[_conflate_key(message)] = message
+        return policy
+
+    def frames(self, symbol: str, max_items: int) -> List[Tuple[str, Optional[tuple], dict]]:
+        """
+        (policy, conflate key or None, frame) in send order, then reset; trades are split into
+        frames of at most max_items prints. Frames without key are never replaced in a client queue.
+        """
+        frames: List[Tuple[str, Optional[tuple], dict]] = []
+        if self.book_snapshot is not None:
+            frames.append((MERGE, None, dict(self.book_snapshot)))
+        if self.book_last is not None:
+            merged = {k: v for k, v in self.book_last.items() if k not in ("asks", "bids", "prev_seq")}
+            if "prev_seq" in self.book_first:
+                merged["prev_seq"] = self.book_first["prev_seq"]
+            merged["asks"] = [[p, q] for p, q in self.book_asks.items()]
+            merged["bids"] = [[p, q] for p, q in self.book_bids.items()]
+            frames.append((MERGE, None, merged))
+        for i in range(0, len(self.trades), max_items):
+            chunk = self.trades[i:i + max_items]
+            frames.append((LOSSLESS, None, {"type": "trades", "symbol": chunk[-1].get("symbol", symbol),
+                                  "market": chunk[-1].get("market"), "count": len(chunk), "data": chunk}))
+        frames.extend((CONFLATE, key, dict(message)) for key, message in self.latest.items())
+        self.trades = []
+        self.latest = {}
+        self.book_snapshot = self.book_first = self.book_last = None
+        self.book_asks = {}
+        self.book_bids = {}
+        return frames
+
+
+class _Client:
+    """
+    Per-socket sender with its own frame queue: the batch loop only appends encoded frames,
+    the writer task sends them in order. A conflated frame (candle, ticker) replaces the
+    unsent one with the same key in place; lossless frames (trades, book deltas) queue up
+    to max_pending_frames, after that the client is too slow and gets evicted.
+    One client per socket, however many symbols/channels it is subscribed to.
+    """
+    __slots__ = ("websocket", "name", "protocol", "subscriptions", "known_symbols", "queue", "slots", "ready", "task",
+                 "timeouts", "sent", "superseded", "send_started")
+
+    def __init__(self, websocket: WebSocket, protocol: str = wire.JSON):
+        self.websocket = websocket
+        peer = getattr(websocket, "client", None)
+        self.name = f"{peer.host}:{peer.port}" if peer else f"{id(websocket):x}"
+        self.protocol = protocol
+        self.subscriptions: Dict[str, set] = {}  # symbol -> channels
+        self.known_symbols: set = set()        # symbol ids already sent to a columnar client
+        self.queue: deque = deque()            # [key, payload, tick]
+        self.slots: Dict[tuple, list] = {}     # conflate key -> queued entry
+        self.ready = asyncio.Event()
+        self.task: Optional[asyncio.Task] = None
+        self.timeouts = 0      # consecutive send timeouts
+        self.sent = 0
+        self.superseded = 0
+        self.send_started = 0.0
+
+    def offer(self, key: Optional[tuple], payload, tick: Optional[_Tick] = None) -> bool:
+        """Returns True if an unsent frame with the same key was replaced; control messages have no tick"""
+        if tick is not None:
+            tick.remaining += 1
+        entry = self.slots.get(key) if key is not None else None
+        if entry is not None:
+            replaced = entry[2]
+            entry[1] = payload
+            entry[2] = tick
+            self.superseded += 1
+            if replaced is not None:
+                replaced.done()
+            return True
+        entry = [key, payload, tick]
+        self.queue.append(entry)
+        if key is not None:
+            self.slots[key] = entry
+        self.ready.set()
+        return False
+
+    def next(self) -> Optional[list]:
+        if not self.queue:
+            return None
+        entry = self.queue.popleft()
+        if entry[0] is not None:
+            self.slots.pop(entry[0], None)
+        return entry
+
+    def drop_all(self):
+        while self.queue:
+            tick = self.queue.popleft()[2]
+            if tick is not None:
+                tick.done()
+        self.slots.clear()
+
+    def subscription_count(self) -> int:
+        return sum(len(channels) for channels in self.subscriptions.values())
+
+
 class PerformantWebSocketManager:
     """
     Optimized WebSocket manager with connection pooling, message batching,
-    and comprehensive error logging
+    and comprehensive error logging.
+    Delivery depends on the message type (MESSAGE_POLICIES): trades are lossless and go out
+    as arrays of every print since the last flush, order-book deltas of a tick are merged
+    into one, candles/tickers are conflated to the latest value. A symbol's batch is flushed
+    every batch_interval_ms, or at once when it holds max_batch_items prints.
+    Each frame is encoded once (orjson) and handed to every client's writer task, so sends
+    run concurrently. A send slower than send_timeout_ms counts as a timeout; clients with
+    max_send_timeouts in a row, with one send stuck for that long in total, or with more
+    than max_pending_frames unsent frames are evicted.
+    The wire protocol is kept per client (core/ws/wire.py): columnar clients get trade
+    batches as binary frames, encoded once per frame like the JSON text.
+    One socket can subscribe to any mix of symbols and channels (trades, candles:<res>,
+    book); frames are routed through the channel index symbol -> channel -> clients
+    and carry a per-channel sequence (cseq) that subscribe acks refer to.
+    Producers attach through on_subscribe / on_channel_idle (core/ws/bridge.py): called for
+    every new (symbol, channel) subscription and when the last one of a channel goes away.
     """
-    def __init__(self, batch_interval_ms: int = 50, debounce_ms: int = 25):
-        # Connection pools per symbol
-        self.connections: Dict[str, Set[WebSocket]] = {}
-        # Message queues for batching
-        self.message_queues: Dict[str, list] = {}
-        # Last update timestamps for debouncing
-        self.last_updates: Dict[str, float] = {}
+    def __init__(self, batch_interval_ms: int = 50, debounce_ms: int = 25,
+                 send_timeout_ms: int = 500, max_send_timeouts: int = 3,
+                 max_batch_items: int = 500, max_pending_frames: int = 256, max_subscriptions: int = 200):
+        # All sockets, one client each
+        self.clients: Dict[WebSocket, _Client] = {}
+        # Clients subscribed to any channel of a symbol
+        self.connections: Dict[str, Dict[WebSocket, _Client]] = {}
+        # Channel index: symbol -> channel -> clients
+        self.channels: Dict[str, Dict[str, Dict[WebSocket, _Client]]] = {}
+        # Last frame sequence per (symbol, channel) and latest conflated frame per channel (sent on subscribe)
+        self.channel_seq: Dict[Tuple[str, str], int] = {}
+        self.snapshots: Dict[str, Dict[str, str]] = {}
+        # Message batches per symbol
+        self.message_queues: Dict[str, _SymbolBatch] = {}
+        # Last update timestamps for debouncing (conflated types only)
+        self.last_updates: Dict[tuple, float] = {}
         # Configurable intervals for performance tuning
         self.batch_interval_ms = batch_interval_ms
         self.debounce_ms = debounce_ms
+        self.send_timeout_ms = send_timeout_ms
+        self.max_send_timeouts = max_send_timeouts
+        self.max_batch_items = max_batch_items
+        self.max_pending_frames = max_pending_frames
+        self.max_subscriptions = max_subscriptions
+        # Producer hooks (symbol, channel); set by the bridge
+        self.on_subscribe: Optional[Callable[[str, str], None]] = None
+        self.on_channel_idle: Optional[Callable[[str, str], None]] = None
         # Batch processing task
         self._batch_task = None
         self._running = False
+        # Clients with a send in progress (checked by the watchdog each tick)
+        self._sending: set = set()
+        # Fan-out latency (tick start -> last client sent) of recent ticks, ms
+        self._fanout_ms: deque = deque(maxlen=1000)
+        self._last_tick = {"symbols": 0, "clients": 0, "frames": 0, "bytes": 0, "handoff_ms": 0.0}
         # Performance metrics
         self.metrics = {
             "messages_sent": 0,
             "messages_queued": 0,
             "connections_total": 0,
-            "errors_count": 0
+            "errors_count": 0,
+            "ticks": 0,
+            "encodes": 0,
+            "superseded": 0,
+            "send_timeouts": 0,
+            "evicted": 0,
+            "frames": 0,
+            "columnar_fallbacks": 0,
+            "size_flushes": 0,
+            "debounced": 0,
+            "subscribes": 0,
+            "unsubscribes": 0,
+            "rejected_subscriptions": 0,
         }
+        # Messages in / frames out per delivery policy
+        self.policy_metrics = {policy: {"messages": 0, "frames": 0} for policy in (LOSSLESS, MERGE, CONFLATE)}
+        # Encoded frames / payload bytes per wire protocol
+        self.symbol_ids = wire.SymbolDictionary()
+        self.protocol_metrics = {protocol: {"encodes": 0, "bytes": 0} for protocol in wire.PROTOCOLS}
     
     async def start(self):
         """Start the batch processing task"""
+        if self._running:
+            return
         self._running = True
         self._batch_task = asyncio.create_task(self._process_message_batches())
-        logger.info(f"WebSocket manager started with batch_interval={self.batch_interval_ms}ms, debounce={self.debounce_ms}ms")
+        logger.info(f"WebSocket manager started with batch_interval={self.batch_interval_ms}ms, debounce={self.debounce_ms}ms, "
+                    f"send_timeout={self.send_timeout_ms}ms")
     
     async def stop(self):
-        """Stop the batch processing task"""
+        """Stop the batch processing task and all client writers"""
         self._running = False
         if self._batch_task:
             self._batch_task.cancel()
@@ -55,6 +304,10 @@ class PerformantWebSocketManager:
                 await self._batch_task
             except asyncio.CancelledError:
                 pass
+        writers = [c.task for c in self.clients.values() if c.task]
+        for task in writers:
+            task.cancel()
+        await asyncio.gather(*writers, return_exceptions=True)
         logger.info("WebSocket manager stopped")
     
     def update_performance_settings(self, batch_interval_ms: int = None, debounce_ms: int = None):
@@ -69,40 +322,151 @@ class PerformantWebSocketManager:
             self.debounce_ms = debounce_ms
             logger.info(f"Updated debounce to {debounce_ms}ms")
     
-    async def connect(self, websocket: WebSocket, symbol: str):
-        """Connect a WebSocket to a symbol channel"""
+    async def connect(self, websocket: WebSocket, symbol: Optional[str] = None, protocol: str = wire.JSON,
+                      subprotocol: Optional[str] = None):
+        """
+        Accept a WebSocket with the negotiated wire protocol. With a symbol the socket is pinned
+        to all of its channels (legacy URLs); without one it only gets what it subscribes to.
+        """
         try:
-            await websocket.accept()
+            await websocket.accept(subprotocol=subprotocol)
+            if protocol == wire.COLUMNAR:
+                # schema first, before the writer can send any binary frame
+                await websocket.send_text(wire.SCHEMA_TEXT)
             
-            if symbol not in self.connections:
-                self.connections[symbol] = set()
-                self.message_queues[symbol] = []
-            
-            self.connections[symbol].add(websocket)
+            client = _Client(websocket, protocol)
+            client.task = asyncio.create_task(self._writer(client))
+            self.clients[websocket] = client
             self.metrics["connections_total"] += 1
+            if symbol is not None:
+                self.subscribe(websocket, [(symbol, ALL)], notify=False)
             
-            logger.info(f"Client connected to {symbol}. Symbol connections: {len(self.connections[symbol])}, Total: {self.get_connection_count()}")
+            logger.info(f"Client {client.name} connected{f' to {symbol}' if symbol else ''}. "
+                        f"Total: {self.get_connection_count()}")
             
         except Exception as e:
             logger.error(f"Error connecting client to {symbol}: {e}")
             traceback.print_exc()
             raise
-    
-    async def disconnect(self, websocket: WebSocket, symbol: str):
-        """Disconnect a WebSocket from a symbol channel"""
+
+    def subscribe(self, websocket: WebSocket, pairs, request_id=None, notify: bool = True) -> dict:
+        """
+        Subscribe a connected socket to (symbol, channel) pairs. Queues one "subscribed" ack
+        (per channel: seq = last cseq sent on it, frames with a higher cseq follow) and then the
+        latest value of conflated channels as their snapshot. Returns the ack.
+        """
+        client = self.clients.get(websocket)
+        if client is None:
+            return {}
+        acks, rejected, snapshots = [], [], []
+        for symbol, channel in pairs:
+            if not isinstance(symbol, str) or not symbol or not valid_channel(channel):
+                rejected.append({"symbol": symbol, "channel": channel, "reason": "unknown channel"})
+                continue
+            channels = client.subscriptions.get(symbol)
+            if channels is None or channel not in channels:
+                if client.subscription_count() >= self.max_subscriptions:
+                    rejected.append({"symbol": symbol, "channel": channel, "reason": "subscription limit"})
+                    continue
+                client.subscriptions.setdefault(symbol, set()).add(channel)
+                self.channels.setdefault(symbol, {}).setdefault(channel, {})[websocket] = client
+                self.connections.setdefault(symbol, {})[websocket] = client
+                if symbol not in self.message_queues:
+                    self.message_queues[symbol] = _SymbolBatch()
+                self.metrics["subscribes"] += 1
+                self._hook(self.on_subscribe, symbol, channel)
+            acks.append({"symbol": symbol, "channel": channel, "seq": self.channel_seq.get((symbol, channel), 0)})
+            symbol_snapshots = self.snapshots.get(symbol, {})
+            snapshots += [text for ch, text in symbol_snapshots.items() if channel in (ch, ALL)]
+        self.metrics["rejected_subscriptions"] += len(rejected)
+        ack = {"type": "subscribed", "id": request_id, "acks": acks, "rejected": rejected}
+        if notify:
+            client.offer(None, orjson.dumps(ack).decode())
+            for text in snapshots:
+                client.offer(None, text)
+        return ack
+
+    def unsubscribe(self, websocket: WebSocket, pairs, request_id=None) -> dict:
+        """Remove (symbol, channel) pairs; channel ALL removes every channel of the symbol"""
+        client = self.clients.get(websocket)
+        if client is None:
+            return {}
+        removed = []
+        for symbol, channel in pairs:
+            channels = client.subscriptions.get(symbol)
+            if not channels:
+                continue
+            for ch in (list(channels) if channel == ALL else [channel] if channel in channels else []):
+                channels.discard(ch)
+                self._unindex(websocket, symbol, ch)
+                removed.append({"symbol": symbol, "channel": ch})
+                self.metrics["unsubscribes"] += 1
+            if not channels:
+                del client.subscriptions[symbol]
+                self._drop_symbol_client(websocket, symbol)
+        ack = {"type": "unsubscribed", "id": request_id, "channels": removed}
+        client.offer(None, orjson.dumps(ack).decode())
+        return ack
+
+    def _unindex(self, websocket: WebSocket, symbol: str, channel: str):
+        index = self.channels.get(symbol)
+        clients = index.get(channel) if index else None
+        if clients is None:
+            return
+        clients.pop(websocket, None)
+        if not clients:
+            del index[channel]
+            # the channel's batch state and snapshot stay consistent only while someone listens
+            self.snapshots.get(symbol, {}).pop(channel, None)
+            self._hook(self.on_channel_idle, symbol, channel)
+
+    def _hook(self, hook: Optional[Callable[[str, str], None]], symbol: str, channel: str):
+        if hook is None:
+            return
         try:
-            if symbol in self.connections:
-                self.connections[symbol].discard(websocket)
-                if not self.connections[symbol]:
-                    # Clean up empty channels
-                    del self.connections[symbol]
-                    if symbol in self.message_queues:
-                        del self.message_queues[symbol]
-                    if symbol in self.last_updates:
-                        del self.last_updates[symbol]
-                    logger.info(f"Cleaned up empty channel for {symbol}")
+            hook(symbol, channel)
+        except Exception as e:
+            logger.error(f"Subscription hook for {symbol}/{channel} failed: {e}")
+            traceback.print_exc()
+
+    def _drop_symbol_client(self, websocket: WebSocket, symbol: str):
+        clients = self.connections.get(symbol)
+        if clients is None:
+            return
+        clients.pop(websocket, None)
+        if not clients:
+            # Clean up empty channels
+            del self.connections[symbol]
+            self.channels.pop(symbol, None)
+            self.snapshots.pop(symbol, None)
+            self.message_queues.pop(symbol, None)
+            for key in [k for k in self.last_updates if k[0] == symbol]:
+                del self.last_updates[key]
+            for key in [k for k in self.channel_seq if k[0] == symbol]:
+                del self.channel_seq[key]
+            logger.info(f"Cleaned up empty channel for {symbol}")
+
+    def _remove(self, websocket: WebSocket) -> Optional[_Client]:
+        client = self.clients.pop(websocket, None)
+        if client is None:
+            return None
+        client.drop_all()
+        for symbol, channels in client.subscriptions.items():
+            for channel in channels:
+                self._unindex(websocket, symbol, channel)
+            self._drop_symbol_client(websocket, symbol)
+        client.subscriptions.clear()
+        return client
+
+    async def disconnect(self, websocket: WebSocket, symbol: str = None):
+        """Disconnect a WebSocket and drop all of its subscriptions"""
+        try:
+            client = self._remove(websocket)
+            if client is not None and client.task is not None and client.task is not asyncio.current_task():
+                client.task.cancel()
             
-            logger.info(f"Client disconnected from {symbol}. Total connections: {self.get_connection_count()}")
+            logger.info(f"Client disconnected{f' from {symbol}' if symbol else ''}. "
+                        f"Total connections: {self.get_connection_count()}")
             
         except Exception as e:
             logger.error(f"Error disconnecting client from {symbol}: {e}")
@@ -110,35 +474,214 @@ class PerformantWebSocketManager:
     
     async def broadcast_to_symbol(self, symbol: str, message: dict, debounce_ms: int = None):
         """
-        Broadcast message to all connections for a symbol with configurable debouncing
+        Queue a message for all connections of a symbol. Debouncing only applies to conflated
+        types (candles, tickers); trades and book deltas are never dropped here.
         """
+        self.queue_message(symbol, message, debounce_ms)
+
+    def queue_message(self, symbol: str, message: dict, debounce_ms: int = None):
+        """Synchronous broadcast_to_symbol: the message is in the batch when this returns"""
         try:
-            if symbol not in self.connections or not self.connections[symbol]:
+            # Only queue what some client listens to (channel index)
+            index = self.channels.get(symbol)
+            if not index or (ALL not in index and channel_of(message) not in index):
                 return
             
-            # Use instance debounce or override
-            effective_debounce = debounce_ms if debounce_ms is not None else self.debounce_ms
-            current_time = time.time() * 1000  # Convert to milliseconds
-            
-            # Debouncing: Skip if last update was too recent
-            if symbol in self.last_updates:
-                if current_time - self.last_updates[symbol] < effective_debounce:
+            policy = MESSAGE_POLICIES.get(message.get("type"), CONFLATE)
+            if policy == CONFLATE:
+                # Use instance debounce or override
+                effective_debounce = debounce_ms if debounce_ms is not None else self.debounce_ms
+                current_time = time.time() * 1000  # Convert to milliseconds
+                key = (symbol, *_conflate_key(message))
+                # Debouncing: Skip if last update was too recent
+                if current_time - self.last_updates.get(key, 0.0) < effective_debounce:
+                    self.metrics["debounced"] += 1
                     return
+                self.last_updates[key] = current_time
             
-            self.last_updates[symbol] = current_time
-            
-            # Add message to batch queue
-            if symbol not in self.message_queues:
-                self.message_queues[symbol] = []
-            
-            self.message_queues[symbol].append(message)
+            # Add message to batch
+            batch = self.message_queues.get(symbol)
+            if batch is None:
+                batch = self.message_queues[symbol] = _SymbolBatch()
+            batch.add(message)
             self.metrics["messages_queued"] += 1
+            self.policy_metrics[policy]["messages"] += 1
+            
+            # Size cap: flush a full trade batch now instead of waiting for the tick
+            if len(batch.trades) >= self.max_batch_items:
+                self.metrics["size_flushes"] += 1
+                self._flush_symbol(symbol, batch, time.perf_counter())
             
         except Exception as e:
             logger.error(f"Error broadcasting to {symbol}: {e}")
             traceback.print_exc()
             self.metrics["errors_count"] += 1
     
+    async def _writer(self, client: _Client):
+        """Sends the client's queued frames in order; evicts it after repeated timeouts or a failed send"""
+        timeout = self.send_timeout_ms / 1000.0
+        tick = None
+        try:
+            while True:
+                entry = client.next()
+                if entry is None:
+                    client.ready.clear()
+                    await client.ready.wait()
+                    continue
+                _, payload, tick = entry
+                # no wait_for here: it costs a task per send; stuck sends are caught by _watchdog()
+                client.send_started = time.monotonic()
+                self._sending.add(client)
+                try:
+                    if isinstance(payload, bytes):
+                        await client.websocket.send_bytes(payload)
+                    else:
+                        await client.websocket.send_text(payload)
+                except Exception as e:
+                    logger.warning(f"Error sending to client {client.name}: {e}")
+                    self.metrics["errors_count"] += 1
+                    await self._evict(client)
+                    return
+                finally:
+                    self._sending.discard(client)
+                    if tick is not None:
+                        tick.done()
+                    tick = None
+                client.sent += 1
+                self.metrics["messages_sent"] += 1
+                if time.monotonic() - client.send_started <= timeout:
+                    client.timeouts = 0
+                    continue
+                client.timeouts += 1
+                self.metrics["send_timeouts"] += 1
+                if client.timeouts >= self.max_send_timeouts:
+                    logger.warning(f"Evicting slow client {client.name} ({client.timeouts} send timeouts in a row)")
+                    await self._evict(client, code=1013, reason="slow consumer")
+                    return
+        except asyncio.CancelledError:
+            if tick is not None:
+                tick.done()
+
+    def _watchdog(self):
+        """Evicts clients whose current send has been stuck for max_send_timeouts * send_timeout_ms"""
+        if not self._sending:
+            return
+        limit = time.monotonic() - self.send_timeout_ms * self.max_send_timeouts / 1000.0
+        for client in [c for c in self._sending if c.send_started < limit]:
+            self._sending.discard(client)
+            self.metrics["send_timeouts"] += 1
+            logger.warning(f"Evicting slow client {client.name} (send stuck > "
+                           f"{self.send_timeout_ms * self.max_send_timeouts}ms)")
+            if client.task is not None:
+                client.task.cancel()
+            asyncio.create_task(self._evict(client, code=1013, reason="slow consumer"))
+
+    async def _evict(self, client: _Client, code: int = 1011, reason: str = ""):
+        self._remove(client.websocket)
+        self.metrics["evicted"] += 1
+        try:
+            await asyncio.wait_for(client.websocket.close(code=code, reason=reason), self.send_timeout_ms / 1000.0)
+        except Exception:
+            pass
+
+    def _record_fanout(self, ms: float):
+        self._fanout_ms.append(ms)
+
+    def _flush_symbol(self, symbol: str, batch: _SymbolBatch, started: float) -> Tuple[int, int]:
+        """
+        Encodes the symbol's frames once each (per protocol) and queues them for the clients of
+        their channel plus those pinned to ALL (O(1) per client and frame, no awaits).
+        Returns (frames, payload bytes).
+        """
+        index = self.channels.get(symbol)
+        frames = batch.frames(symbol, self.max_batch_items)
+        if not index:
+            return 0, 0
+        pinned = index.get(ALL)
+        tick = _Tick(self, started)
+        tick.remaining += 1  # guard: completes only after the hand-off loop
+        payload_bytes = 0
+        overflow = []
+        for policy, key, frame in frames:
+            channel = channel_of(frame)
+            subscribed = index.get(channel)
+            if not subscribed and not pinned:
+                continue
+            seq = self.channel_seq[(symbol, channel)] = self.channel_seq.get((symbol, channel), 0) + 1
+            frame["cseq"] = seq
+            text = binary = None
+            columnar = frame.get("type") == "trades"
+            slot = (symbol, *key) if key is not None else None  # one client queue serves many symbols
+            self.metrics["frames"] += 1
+            self.policy_metrics[policy]["frames"] += 1
+            for clients in (subscribed, pinned):
+                if not clients:
+                    continue
+                for websocket, client in clients.items():
+                    if clients is pinned and subscribed and websocket in subscribed:
+                        continue  # already got it through the channel
+                    if columnar and client.protocol == wire.COLUMNAR and binary is None:
+                        symbol_id = self.symbol_ids.id(frame["symbol"], frame["market"] or "spot")
+                        if symbol_id is None:
+                            # u16 dictionary exhausted: this symbol goes out as JSON to everyone
+                            columnar = False
+                            self.metrics["columnar_fallbacks"] += 1
+                        else:
+                            binary = wire.encode_trades(frame["data"], symbol_id, seq)
+                            self._count_encode(wire.COLUMNAR, len(binary))
+                            payload_bytes += len(binary)
+                    if columnar and client.protocol == wire.COLUMNAR:
+                        if symbol_id not in client.known_symbols:
+                            client.known_symbols.add(symbol_id)
+                            client.offer(None, self.symbol_ids.text(symbol_id))
+                        payload = binary
+                    else:
+                        if text is None:
+                            text = orjson.dumps(frame).decode()
+                            self._count_encode(wire.JSON, len(text))
+                            payload_bytes += len(text)
+                        payload = text
+                    if client.offer(slot, payload, tick):
+                        self.metrics["superseded"] += 1
+                    elif len(client.queue) > self.max_pending_frames:
+                        overflow.append(client)
+            if policy == CONFLATE and text is not None:
+                self.snapshots.setdefault(symbol, {})[channel] = text
+        tick.done()
+        for client in set(overflow):
+            # lossless frames cannot be dropped: a client this far behind has to reconnect
+            logger.warning(f"Evicting slow client {client.name} ({len(client.queue)} frames pending)")
+            self._remove(client.websocket)
+            if client.task is not None:
+                client.task.cancel()
+            asyncio.get_running_loop().create_task(self._evict(client, code=1013, reason="slow consumer"))
+        return len(frames), payload_bytes
+
+    def _count_encode(self, protocol: str, size: int):
+        self.metrics["encodes"] += 1
+        self.protocol_metrics[protocol]["encodes"] += 1
+        self.protocol_metrics[protocol]["bytes"] += size
+
+    def broadcast_tick(self) -> int:
+        """
+        Flushes every symbol's batch to its clients. Returns the number of clients reached.
+        """
+        started = time.perf_counter()
+        symbols = clients_reached = frames = payload_bytes = 0
+        for symbol, batch in list(self.message_queues.items()):
+            if not batch or not self.connections.get(symbol):
+                continue
+            clients_reached += len(self.connections[symbol])
+            n, size = self._flush_symbol(symbol, batch, started)
+            frames += n
+            payload_bytes += size
+            symbols += 1
+        if symbols:
+            self.metrics["ticks"] += 1
+            self._last_tick = {"symbols": symbols, "clients": clients_reached, "frames": frames, "bytes": payload_bytes,
+                               "handoff_ms": round((time.perf_counter() - started) * 1000, 3)}
+        return clients_reached
+
     async def _process_message_batches(self):
         """
         Process message batches with configurable interval for optimal performance
@@ -147,42 +690,14 @@ class PerformantWebSocketManager:
         
         while self._running:
             try:
-                batch_start = time.time()
-                messages_processed = 0
+                self._watchdog()
+                reached = self.broadcast_tick()
                 
-                # Process all queued messages
-                for symbol, messages in list(self.message_queues.items()):
-                    if not messages or symbol not in self.connections:
-                        continue
-                    
-                    # Get the latest message (most recent data) - FLAT STRUCTURE
-                    latest_message = messages[-1]
-                    
-                    # Clear the queue
-                    self.message_queues[symbol] = []
-                    
-                    # Broadcast to all connections for this symbol
-                    disconnected = set()
-                    for websocket in self.connections[symbol].copy():
-                        try:
-                            await websocket.send_text(json.dumps(latest_message))
-                            self.metrics["messages_sent"] += 1
-                            messages_processed += 1
-                        except Exception as e:
-                            logger.warning(f"Error sending to client on {symbol}: {e}")
-                            disconnected.add(websocket)
-                            self.metrics["errors_count"] += 1
-                    
-                    # Remove disconnected clients
-                    for ws in disconnected:
-                        self.connections[symbol].discard(ws)
-                        if disconnected:
-                            logger.info(f"Removed {len(disconnected)} disconnected clients from {symbol}")
-                
-                # Performance logging every 1000 batches
-                if self.metrics["messages_sent"] % 1000 == 0 and messages_processed > 0:
-                    batch_time = (time.time() - batch_start) * 1000
-                    logger.info(f"Batch processed: {messages_processed} messages in {batch_time:.2f}ms. Total sent: {self.metrics['messages_sent']}")
+                # Performance logging every 1000 ticks
+                if reached and self.metrics["ticks"] % 1000 == 0:
+                    fanout = self.get_fanout_latency()
+                    logger.info(f"Tick: {reached} clients, hand-off {self._last_tick['handoff_ms']:.2f}ms, "
+                                f"fan-out p50 {fanout['p50_ms']}ms p99 {fanout['p99_ms']}ms. Total sent: {self.metrics['messages_sent']}")
                 
                 # Wait for next batch (configurable interval)
                 await asyncio.sleep(self.batch_interval_ms / 1000.0)
@@ -196,36 +711,84 @@ class PerformantWebSocketManager:
     def get_connection_count(self, symbol: str = None) -> int:
         """Get total connection count or for specific symbol"""
         if symbol:
-            return len(self.connections.get(symbol, set()))
-        return sum(len(conns) for conns in self.connections.values())
+            return len(self.connections.get(symbol, {}))
+        return len(self.clients)
     
+    def get_fanout_latency(self) -> dict:
+        """Fan-out latency per symbol tick (hand-off until the last client has sent) over recent ticks"""
+        samples = sorted(self._fanout_ms)
+        if not samples:
+            return {"samples": 0, "p50_ms": None, "p99_ms": None, "max_ms": None}
+        return {
+            "samples": len(samples),
+            "p50_ms": round(samples[len(samples) // 2], 2),
+            "p99_ms": round(samples[min(len(samples) - 1, int(len(samples) * 0.99))], 2),
+            "max_ms": round(samples[-1], 2),
+        }
+
     def get_metrics(self) -> dict:
         """Get performance metrics for monitoring"""
         return {
             **self.metrics,
             "active_symbols": len(self.connections),
             "total_connections": self.get_connection_count(),
+            "subscriptions": sum(c.subscription_count() for c in self.clients.values()),
+            "channels": sum(len(index) for index in self.channels.values()),
             "batch_interval_ms": self.batch_interval_ms,
-            "debounce_ms": self.debounce_ms
+            "debounce_ms": self.debounce_ms,
+            "send_timeout_ms": self.send_timeout_ms,
+            "last_tick": self._last_tick,
+            "fanout": self.get_fanout_latency(),
+            "policies": self.policy_metrics,
+            "protocols": {
+                protocol: {"clients": sum(1 for c in self.clients.values() if c.protocol == protocol), **counters}
+                for protocol, counters in self.protocol_metrics.items()
+            },
         }
 
 # Global WebSocket manager instance
-ws_manager = PerformantWebSocketManager()
+ws_manager = PerformantWebSocketManager(
+    send_timeout_ms=settings.WS_SEND_TIMEOUT_MS,
+    max_send_timeouts=settings.WS_MAX_SEND_TIMEOUTS,
+    max_batch_items=settings.WS_BATCH_MAX_ITEMS,
+    max_pending_frames=settings.WS_MAX_PENDING_FRAMES,
+    max_subscriptions=settings.WS_MAX_SUBSCRIPTIONS,
+)
 
-async def handle_websocket_connection(websocket: WebSocket, symbol: str):
+def _subscription_pairs(data: dict) -> list:
     """
-    Handle individual WebSocket connection with comprehensive error handling
+    (symbol, channel) pairs of a subscribe/unsubscribe request: either explicit
+    {"subscriptions": [["BTCUSDT", "trades"], ...]} or the cross product of
+    {"symbols": [...], "channels": [...]} (a single "symbol" works too)
+    """
+    pairs = [tuple(pair) for pair in data.get("subscriptions") or () if isinstance(pair, (list, tuple)) and len(pair) == 2]
+    symbols = data.get("symbols") or ([data["symbol"]] if data.get("symbol") else [])
+    channels = data.get("channels") or ([data["channel"]] if data.get("channel") else [])
+    if isinstance(symbols, list) and isinstance(channels, list):
+        pairs += [(symbol, channel) for symbol in symbols for channel in channels]
+    return pairs
+
+
+async def handle_websocket_connection(websocket: WebSocket, symbol: Optional[str] = None):
+    """
+    Handle individual WebSocket connection with comprehensive error handling.
+    With a symbol the socket is pinned to it (legacy); without one the client subscribes with
+    {"type": "subscribe", "symbols": [...], "channels": ["trades", "candles:1m", "book"]}
+    and gets a "subscribed" ack per request (unsubscribe works the same way).
     """
     client_id = f"{websocket.client.host}:{websocket.client.port}" if websocket.client else "unknown"
     
     try:
-        await ws_manager.connect(websocket, symbol)
+        # Wire protocol: Sec-WebSocket-Protocol or ?proto=, JSON if nothing supported was offered
+        protocol, subprotocol = wire.negotiate(websocket)
+        await ws_manager.connect(websocket, symbol, protocol, subprotocol)
         
         # Send initial connection confirmation - FLAT STRUCTURE
         await websocket.send_text(json.dumps({
             "type": "connection",
             "status": "connected",
             "symbol": symbol,
+            "protocol": protocol,
             "timestamp": datetime.utcnow().isoformat(),
             "server_time": int(time.time() * 1000)
         }))
@@ -250,8 +813,11 @@ async def handle_websocket_connection(websocket: WebSocket, symbol: str):
                             "server_time": int(time.time() * 1000)
                         }))
                     elif data.get("type") == "subscribe":
-                        # Handle additional subscriptions
-                        logger.info(f"Client {client_id} subscription request: {data}")
+                        ack = ws_manager.subscribe(websocket, _subscription_pairs(data), data.get("id"))
+                        logger.info(f"Client {client_id} subscribed to {len(ack['acks'])} channels "
+                                    f"({len(ack['rejected'])} rejected)")
+                    elif data.get("type") == "unsubscribe":
+                        ws_manager.unsubscribe(websocket, _subscription_pairs(data), data.get("id"))
                         
                 except json.JSONDecodeError as e:
                     logger.warning(f"Invalid JSON from client {client_id}: {e}")
@@ -268,6 +834,8 @@ async def handle_websocket_connection(websocket: WebSocket, symbol: str):
                     logger.error(f"Failed to send ping to {client_id}: {ping_error}")
                     break
                     
+            except WebSocketDisconnect:
+                break
             except Exception as e:
                 logger.error(f"Connection error for {client_id} on {symbol}: {e}")
                 traceback.print_exc()
@@ -1,40 +1,26 @@
-import clickhouse_connect
-import os
+import asyncio
+import base64
+import functools
+import json
 import logging
 import traceback
-from typing import List, Dict, Any, Optional
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Optional, Callable, Tuple
+
+from core.config import settings
+from core.utils.time import parse_resolution
+from db.pool import get_client
 
 # Structured logging
 logging.basicConfig(level=logging.INFO, format='[%(asctime)s] [%(levelname)s] %(message)s')
 logger = logging.getLogger(__name__)
 
-CLICKHOUSE_HOST = os.getenv("CLICKHOUSE_HOST", "localhost")
-CLICKHOUSE_PORT = int(os.getenv("CLICKHOUSE_PORT", "8123"))
-CLICKHOUSE_USER = "default"
-CLICKHOUSE_PASSWORD = ""
-CLICKHOUSE_DB = "bitget"
-
-def get_client():
-    """Get ClickHouse client with error handling"""
-    try:
-        return clickhouse_connect.get_client(
-            host=CLICKHOUSE_HOST,
-            port=CLICKHOUSE_PORT,
-            username=CLICKHOUSE_USER,
-            password=CLICKHOUSE_PASSWORD,
-            database=CLICKHOUSE_DB,
-        )
-    except Exception as e:
-        logger.error(f"Failed to create ClickHouse client: {e}")
-        traceback.print_exc()
-        raise
-
 # --- Ping für Health-Checks ---
 def ping() -> bool:
     """Health check for ClickHouse connection"""
     try:
-        client = get_client()
-        result = client.query('SELECT 1')
+        with get_client() as client:
+            result = client.query('SELECT 1')
         return result.result_set[0][0] == 1
     except Exception as e:
         logger.error(f"ClickHouse ping failed: {e}")
@@ -54,26 +40,26 @@ def upsert_coin_setting(
 ):
     """Insert or update coin settings with error handling"""
     try:
-        client = get_client()
         sql = """
         INSERT INTO coin_settings
         (symbol, market, store_live, load_history, history_until, favorite, db_resolution, chart_resolution, updated_at)
         VALUES
         (%(symbol)s, %(market)s, %(store_live)s, %(load_history)s, %(history_until)s, %(favorite)s, %(db_resolution)s, %(chart_resolution)s, now())
         """
-        client.command(
-            sql,
-            {
-                "symbol": symbol,
-                "market": market,
-                "store_live": store_live,
-                "load_history": load_history,
-                "history_until": history_until,
-                "favorite": favorite,
-                "db_resolution": db_resolution,
-                "chart_resolution": chart_resolution,
-            }
-        )
+        with get_client() as client:
+            client.command(
+                sql,
+                {
+                    "symbol": symbol,
+                    "market": market,
+                    "store_live": store_live,
+                    "load_history": load_history,
+                    "history_until": history_until,
+                    "favorite": favorite,
+                    "db_resolution": db_resolution,
+                    "chart_resolution": chart_resolution,
+                }
+            )
         logger.info(f"Upserted coin setting: {symbol}/{market}")
     except Exception as e:
         logger.error(f"Error upserting coin setting {symbol}/{market}: {e}")
@@ -84,7 +70,6 @@ def upsert_coin_setting(
 def fetch_coin_settings(symbol: Optional[str] = None, market: Optional[str] = None) -> List[Dict[str, Any]]:
     """Fetch coin settings with error handling"""
     try:
-        client = get_client()
         sql = "SELECT symbol, market, store_live, load_history, history_until, favorite, db_resolution, chart_resolution, updated_at FROM coin_settings"
         conditions = []
         params = {}
@@ -98,7 +83,8 @@ def fetch_coin_settings(symbol: Optional[str] = None, market: Optional[str] = No
             sql += " WHERE " + " AND ".join(conditions)
         sql += " ORDER BY symbol, market"
         
-        result = client.query(sql, params)
+        with get_client() as client:
+            result = client.query(sql, params)
         settings = [dict(zip(result.column_names, row)) for row in result.result_rows]
         logger.info(f"Fetched {len(settings)} coin settings")
         return settings
@@ -111,13 +97,13 @@ def fetch_coin_settings(symbol: Optional[str] = None, market: Optional[str] = No
 def fetch_symbols() -> List[Dict[str, Any]]:
     """Fetch available symbols with error handling"""
     try:
-        client = get_client()
         sql = """
         SELECT DISTINCT symbol, market
         FROM coin_settings
         ORDER BY symbol, market
         """
-        result = client.query(sql)
+        with get_client() as client:
+            result = client.query(sql)
         symbols = [dict(zip(result.column_names, row)) for row in result.result_rows]
         logger.info(f"Fetched {len(symbols)} symbols")
         return symbols
@@ -126,47 +112,91 @@ def fetch_symbols() -> List[Dict[str, Any]]:
         traceback.print_exc()
         return []
 
-# --- Trades: Insert ---
-def insert_trade(
-    symbol: str,
-    market: str,
-    price: float,
-    size: float,
-    side: str,
-    ts: str,
-):
-    """Insert trade with error handling"""
+# --- Schema-Erkennung (Startup) ---
+# Optionale Spalten aus späteren Migrationen; detect_schema() prüft system.columns,
+# bis dahin (oder wenn ClickHouse nicht erreichbar war) gilt das alte Layout.
+# Ohne v3-Spalten würde LIMIT 1 BY trade_id/version jede Lese-Query scheitern lassen.
+schema_features = {
+    "tick_dedup": settings.TICK_DEDUP == "1",   # Tick-Schema v3 (migrations/20250707_tick_schema_v3_dedup.sql)
+    "bar_granularity": False,                   # bars.granularity (migrations/20250708_bars_granularity.sql)
+    "trade_id": False,                          # trades.trade_id (v3), vom Writer befüllt
+}
+
+def detect_schema() -> Dict[str, bool]:
+    """Check system.columns for optional columns and update schema_features"""
     try:
-        client = get_client()
-        sql = """
-        INSERT INTO trades (symbol, market, price, size, side, ts)
-        VALUES (%(symbol)s, %(market)s, %(price)s, %(size)s, %(side)s, %(ts)s)
-        """
-        client.command(
-            sql,
-            {
-                "symbol": symbol,
-                "market": market,
-                "price": price,
-                "size": size,
-                "side": side,
-                "ts": ts,
-            }
-        )
-        # Log every 100th trade to avoid spam
-        if hasattr(insert_trade, 'counter'):
-            insert_trade.counter += 1
-        else:
-            insert_trade.counter = 1
-            
-        if insert_trade.counter % 100 == 0:
-            logger.info(f"Inserted {insert_trade.counter} trades (latest: {symbol}/{market} {price} {side})")
-            
+        with get_client() as client:
+            result = client.query(
+                "SELECT table, name FROM system.columns "
+                "WHERE database = currentDatabase() AND table IN ('trades', 'bars')"
+            )
+    except Exception as e:
+        logger.error(f"Schema detection failed, assuming the old layout: {e}")
+        return dict(schema_features)
+    columns = {(table, name) for table, name in result.result_rows}
+    v3 = {("trades", "trade_id"), ("trades", "version"), ("bars", "version")} <= columns
+    if settings.TICK_DEDUP == "auto":
+        schema_features["tick_dedup"] = v3
+    elif schema_features["tick_dedup"] and not v3:
+        logger.warning("TICK_DEDUP=1 but trades/bars are not on tick schema v3 (python -m db.migrate_tick_schema --schema v3)")
+    schema_features["bar_granularity"] = ("bars", "granularity") in columns
+    schema_features["trade_id"] = ("trades", "trade_id") in columns
+    logger.info(f"Detected schema features: {schema_features}")
+    return dict(schema_features)
+
+# --- Trades/Bars: Batch-Insert (spaltenweise, siehe db/writer.py) ---
+TRADE_COLUMNS = ["symbol", "market", "price", "size", "side", "ts"]
+# Der Writer puffert trades immer mit Ingest-ID (trade_id) und lässt sie ohne die Spalte weg
+TRADE_INSERT_COLUMNS = TRADE_COLUMNS + ["trade_id"]
+BAR_COLUMNS = ["symbol", "market", "open", "high", "low", "close", "volume", "ts"]
+# Der Writer puffert bars immer mit Auflösung und lässt sie ohne die Spalte weg
+BAR_INSERT_COLUMNS = BAR_COLUMNS + ["granularity"]
+CANDLE_COLUMNS = ["symbol", "market", "resolution", "ts", "open", "high", "low", "close", "volume", "trade_count"]
+
+def insert_columns(table: str, column_names: List[str], columns: List[list]) -> int:
+    """Insert a columnar batch with a single client.insert"""
+    try:
+        with get_client() as client:
+            client.insert(table, columns, column_names=column_names, column_oriented=True)
+        return len(columns[0]) if columns else 0
     except Exception as e:
-        logger.error(f"Error inserting trade {symbol}/{market}: {e}")
+        logger.error(f"Error inserting batch into {table}: {e}")
         traceback.print_exc()
         raise
 
+def insert_rows(table: str, column_names: List[str], rows: List[tuple]) -> int:
+    """Insert small row-wise state batches (backfill jobs/slices, bar coverage; ReplacingMergeTree keeps the newest)"""
+    if not rows:
+        return 0
+    try:
+        with get_client() as client:
+            client.insert(table, rows, column_names=column_names)
+        return len(rows)
+    except Exception as e:
+        logger.error(f"Error saving {len(rows)} rows into {table}: {e}")
+        traceback.print_exc()
+        raise
+
+# --- Deduplizierung beim Lesen (Tick-Schema v3, migrations/20250707_tick_schema_v3_dedup.sql) ---
+# Bis zum nächsten Merge können Duplikate in verschiedenen Parts liegen. Statt FINAL
+# (merged beim Lesen alle Parts des Bereichs) sortieren die Lese-Queries zusätzlich nach
+# version DESC und behalten per LIMIT 1 BY nur die neueste Zeile je Schlüssel.
+# trade_id ist die Ingest-ID des Writers: nur wiederholte Inserts derselben Zeile fallen weg,
+# nicht identische Prints in derselben ms.
+TRADE_KEY = ["ts", "trade_id"]
+BAR_KEY = ["ts"]
+
+def _bar_key() -> List[str]:
+    """bars-Schlüssel je Zeile; mit bars.granularity gehört die Auflösung dazu"""
+    return BAR_KEY + ["granularity"] if schema_features["bar_granularity"] else BAR_KEY
+
+def _newest_first(key: List[str], tiebreak: List[str]) -> str:
+    """ORDER BY ts DESC (+ LIMIT 1 BY key bei aktivem TICK_DEDUP); tiebreak ordnet Zeilen mit gleichem ts"""
+    if schema_features["tick_dedup"]:
+        order = ["ts DESC", *[c for c in key if c != "ts"], "version DESC"]
+        return f" ORDER BY {', '.join(order)} LIMIT 1 BY {', '.join(key)}"
+    return f" ORDER BY {', '.join(['ts DESC', *tiebreak])}"
+
 # --- Trades: Lesen ---
 def fetch_trades(
     symbol: str,
@@ -177,7 +207,6 @@ def fetch_trades(
 ) -> List[Dict[str, Any]]:
     """Fetch trades with error handling"""
     try:
-        client = get_client()
         sql = """
         SELECT symbol, market, price, size, side, ts
         FROM trades
@@ -190,10 +219,11 @@ def fetch_trades(
         if end:
             sql += " AND ts <= %(end)s"
             params["end"] = end
-        sql += " ORDER BY ts DESC LIMIT %(limit)s"
+        sql += _newest_first(TRADE_KEY, []) + " LIMIT %(limit)s"
         params["limit"] = limit
         
-        result = client.query(sql, params)
+        with get_client() as client:
+            result = client.query(sql, params)
         trades = [dict(zip(result.column_names, row)) for row in result.result_rows]
         logger.info(f"Fetched {len(trades)} trades for {symbol}/{market}")
         return trades
@@ -202,78 +232,65 @@ def fetch_trades(
         traceback.print_exc()
         return []
 
-# --- Bars: Insert ---
-def insert_bar(
-    symbol: str,
-    market: str,
-    open_: float,
-    high: float,
-    low: float,
-    close: float,
-    volume: float,
-    ts: str,
-):
-    """Insert bar/candle with error handling"""
-    try:
-        client = get_client()
-        sql = """
-        INSERT INTO bars (symbol, market, open, high, low, close, volume, ts)
-        VALUES (%(symbol)s, %(market)s, %(open)s, %(high)s, %(low)s, %(close)s, %(volume)s, %(ts)s)
-        """
-        client.command(
-            sql,
-            {
-                "symbol": symbol,
-                "market": market,
-                "open": open_,
-                "high": high,
-                "low": low,
-                "close": close,
-                "volume": volume,
-                "ts": ts,
-            }
-        )
-        # Log every 50th bar to avoid spam
-        if hasattr(insert_bar, 'counter'):
-            insert_bar.counter += 1
-        else:
-            insert_bar.counter = 1
-            
-        if insert_bar.counter % 50 == 0:
-            logger.info(f"Inserted {insert_bar.counter} bars (latest: {symbol}/{market} {close})")
-            
-    except Exception as e:
-        logger.error(f"Error inserting bar {symbol}/{market}: {e}")
-        traceback.print_exc()
-        raise
-
 # --- Bars: Lesen ---
+# OHLC-Rollups (Materialized Views auf trades, siehe migrations/20250702_create_ohlc_rollups.sql)
+# Sekunden -> Tabelle, grobste zuerst
+OHLC_ROLLUPS = [
+    (86400, "ohlc_1d"),
+    (3600, "ohlc_1h"),
+    (300, "ohlc_5m"),
+    (60, "ohlc_1m"),
+    (1, "ohlc_1s"),
+]
+
+def pick_rollup(resolution_s: int) -> Tuple[int, str]:
+    """Coarsest rollup whose interval evenly divides the requested resolution"""
+    for interval_s, table in OHLC_ROLLUPS:
+        if resolution_s % interval_s == 0:
+            return interval_s, table
+    raise ValueError(f"No OHLC rollup for resolution of {resolution_s}s")
+
 def fetch_bars(
     symbol: str,
     market: str,
     start: Optional[str] = None,
     end: Optional[str] = None,
     limit: int = 1000,
+    resolution: Optional[str] = None,
+    granularity: Optional[str] = None,
 ) -> List[Dict[str, Any]]:
-    """Fetch bars/candles with error handling"""
+    """
+    Fetch bars/candles with error handling.
+    Without resolution: raw rows from bars (exchange candles from backfill),
+    only those of `granularity` if given (needs bars.granularity).
+    With resolution: candles aggregated from the matching OHLC rollup.
+    """
+    if resolution:
+        bars, _ = _fetch_rollup_bars(symbol, market, parse_resolution(resolution), start, end, limit)
+        return bars
+    if granularity and not schema_features["bar_granularity"]:
+        return []
     try:
-        client = get_client()
         sql = """
         SELECT symbol, market, open, high, low, close, volume, ts
         FROM bars
         WHERE symbol = %(symbol)s AND market = %(market)s
         """
         params = {"symbol": symbol, "market": market}
+        if granularity:
+            sql += " AND granularity = %(granularity)s"
+            params["granularity"] = granularity
         if start:
             sql += " AND ts >= %(start)s"
             params["start"] = start
         if end:
             sql += " AND ts <= %(end)s"
             params["end"] = end
-        sql += " ORDER BY ts DESC LIMIT %(limit)s"
+        sql += _newest_first(_bar_key(), []) + " LIMIT %(limit)s"
         params["limit"] = limit
         
-        result = client.query(sql, params)
+        with get_client() as client:
+            result = client.query(sql, params)
         bars = [dict(zip(result.column_names, row)) for row in result.result_rows]
         logger.info(f"Fetched {len(bars)} bars for {symbol}/{market}")
         return bars
@@ -281,3 +298,292 @@ def fetch_bars(
         logger.error(f"Error fetching bars for {symbol}/{market}: {e}")
         traceback.print_exc()
         return []
+
+def _fetch_rollup_bars(
+    symbol: str,
+    market: str,
+    resolution_s: int,
+    start: Optional[str],
+    end: Optional[str],
+    limit: int,
+    before_ms: Optional[int] = None,
+) -> Tuple[List[Dict[str, Any]], List[int]]:
+    """
+    Read candles from the coarsest rollup and re-bucket to resolution_s if needed.
+    Returns the newest `limit` non-empty buckets (newest first) and their start in epoch ms
+    (for cursors). Empty buckets are skipped, so a page is only short when no older data exists.
+    """
+    try:
+        interval_s, table = pick_rollup(resolution_s)
+        params = {"symbol": symbol, "market": market, "res": resolution_s, "limit": limit}
+        sql = f"""
+        SELECT
+            toStartOfInterval(ts, INTERVAL %(res)s SECOND) AS bucket,
+            toUnixTimestamp(bucket) * 1000 AS bucket_ms,
+            argMinMerge(open) AS open,
+            max(high) AS high,
+            min(low) AS low,
+            argMaxMerge(close) AS close,
+            sum(volume) AS volume
+        FROM {table}
+        WHERE symbol = %(symbol)s AND market = %(market)s
+        """
+        if start:
+            sql += " AND ts >= %(start)s"
+            params["start"] = start
+        if end:
+            sql += " AND ts <= %(end)s"
+            params["end"] = end
+        if before_ms is not None:
+            # Keyset-Cursor: nur Buckets vor dem letzten gelieferten (Bucket-Grenzen fallen auf Rollup-Grenzen)
+            sql += " AND ts < fromUnixTimestamp64Milli(%(before_ms)s)"
+            params["before_ms"] = before_ms
+        sql += " GROUP BY bucket ORDER BY bucket DESC LIMIT %(limit)s"
+
+        with get_client() as client:
+            result = client.query(sql, params)
+        bars = [
+            {"symbol": symbol, "market": market, "open": o, "high": h, "low": l, "close": c, "volume": v, "ts": bucket}
+            for bucket, _, o, h, l, c, v in result.result_rows
+        ]
+        logger.info(f"Fetched {len(bars)} bars for {symbol}/{market} @ {resolution_s}s from {table}")
+        return bars, [row[1] for row in result.result_rows]
+    except Exception as e:
+        logger.error(f"Error fetching rollup bars for {symbol}/{market} @ {resolution_s}s: {e}")
+        traceback.print_exc()
+        return [], []
+
+# --- Keyset-Pagination (opaker Cursor über (symbol, market, ts)) ---
+# Ein Cursor merkt sich den ts (epoch ms) der letzten gelieferten Zeile und wie viele
+# Zeilen mit genau diesem ts schon geliefert wurden. Die Folgeseite liest dann ab
+# diesem ts rückwärts in Primärschlüssel-Reihenfolge – konstante Arbeit je Seite,
+# unabhängig davon, wie weit zurückgescrollt wurde.
+def encode_cursor(position: Dict[str, Any]) -> str:
+    raw = json.dumps(position, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> Dict[str, Any]:
+    """Decode an opaque cursor, ValueError if it was not produced by encode_cursor"""
+    try:
+        position = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        if not isinstance(position, dict) or not isinstance(position.get("ts"), int):
+            raise ValueError
+        return position
+    except Exception:
+        raise ValueError(f"Invalid cursor: {cursor!r}")
+
+def _fetch_keyset_page(
+    table: str,
+    columns: List[str],
+    key: List[str],
+    tiebreak: List[str],
+    symbol: str,
+    market: str,
+    limit: int,
+    position: Optional[Dict[str, Any]],
+    source: str,
+    filters: Optional[Dict[str, Any]] = None,
+) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    skip = position.get("skip", 0) if position else 0
+    params = {"symbol": symbol, "market": market, "limit": limit, "skip": skip}
+    sql = f"""
+    SELECT {", ".join(columns)}, toUnixTimestamp64Milli(toDateTime64(ts, 3)) AS ts_ms
+    FROM {table}
+    WHERE symbol = %(symbol)s AND market = %(market)s
+    """
+    for column, value in (filters or {}).items():
+        sql += f" AND {column} = %({column})s"
+        params[column] = value
+    if position:
+        sql += " AND ts <= fromUnixTimestamp64Milli(%(ts_ms)s)"
+        params["ts_ms"] = position["ts"]
+    sql += _newest_first(key, tiebreak) + " LIMIT %(limit)s OFFSET %(skip)s"
+
+    with get_client() as client:
+        result = client.query(sql, params)
+    rows = [dict(zip(columns, row[:-1])) for row in result.result_rows]
+    if len(rows) < limit:
+        return rows, None
+
+    last_ms = result.result_rows[-1][-1]
+    same_ts = sum(1 for row in result.result_rows if row[-1] == last_ms)
+    if position and position["ts"] == last_ms:
+        same_ts += skip
+    return rows, encode_cursor({"src": source, "ts": last_ms, "skip": same_ts})
+
+def fetch_trades_page(
+    symbol: str,
+    market: str,
+    limit: int = 1000,
+    cursor: Optional[str] = None,
+) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """Fetch one page of trades (newest first) plus the cursor for the next older page"""
+    position = decode_cursor(cursor) if cursor else None
+    try:
+        trades, next_cursor = _fetch_keyset_page(
+            "trades", TRADE_COLUMNS, TRADE_KEY, ["price", "size", "side"],
+            symbol, market, limit, position, "trades",
+        )
+        logger.info(f"Fetched page of {len(trades)} trades for {symbol}/{market}")
+        return trades, next_cursor
+    except Exception as e:
+        logger.error(f"Error fetching trade page for {symbol}/{market}: {e}")
+        traceback.print_exc()
+        return [], None
+
+def fetch_bars_page(
+    symbol: str,
+    market: str,
+    limit: int = 1000,
+    cursor: Optional[str] = None,
+    resolution: Optional[str] = None,
+) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """
+    Fetch one page of bars (newest first) plus the cursor for the next older page.
+    Reads the OHLC rollup for `resolution`; once it runs out, the page continues with the
+    older raw backfill candles in bars (the cursor switches its source to "bars").
+    The bars part only returns candles of that resolution (bars.granularity); without
+    the column it returns nothing rather than mixing spot/futures candles of all sizes.
+    """
+    position = decode_cursor(cursor) if cursor else None
+    try:
+        bars: List[Dict[str, Any]] = []
+        filters = None
+        if resolution:
+            if position is None or position.get("src") == "rollup":
+                bars, bucket_ms = _fetch_rollup_bars(
+                    symbol, market, parse_resolution(resolution), None, None, limit,
+                    before_ms=position["ts"] if position else None,
+                )
+                if len(bars) == limit:
+                    return bars, encode_cursor({"src": "rollup", "ts": bucket_ms[-1]})
+                # Rollup erschöpft: mit den älteren Backfill-Kerzen vor dem ältesten Bucket weiter
+                oldest_ms = bucket_ms[-1] if bucket_ms else (position["ts"] if position else None)
+                position = {"src": "bars", "ts": oldest_ms - 1, "skip": 0} if oldest_ms is not None else None
+            if not schema_features["bar_granularity"]:
+                return bars, None
+            filters = {"granularity": resolution}
+        older, next_cursor = _fetch_keyset_page(
+            "bars", BAR_COLUMNS, _bar_key(), ["open", "high", "low", "close", "volume"],
+            symbol, market, limit - len(bars), position, "bars", filters,
+        )
+        logger.info(f"Fetched page of {len(bars)} rollup + {len(older)} raw bars for {symbol}/{market}")
+        return bars + older, next_cursor
+    except Exception as e:
+        logger.error(f"Error fetching bar page for {symbol}/{market}: {e}")
+        traceback.print_exc()
+        return [], None
+
+# --- Backfill-Jobs & Checkpoints (exchanges/bitget/backfill_jobs.py) ---
+BACKFILL_JOB_COLUMNS = ["job_id", "symbol", "market", "granularity", "start_ts", "end_ts", "status",
+                        "slices_total", "rows", "error", "created_at", "updated_at"]
+BACKFILL_SLICE_COLUMNS = ["job_id", "slice_no", "lo", "hi", "cursor_ms", "rows", "pages", "status",
+                          "attempts", "error", "updated_at"]
+
+def fetch_backfill_jobs(statuses: Optional[List[str]] = None, limit: Optional[int] = 1000) -> List[Dict[str, Any]]:
+    """Fetch the latest state of backfill jobs (newest first); limit=None returns all of them"""
+    sql = f"SELECT {', '.join(BACKFILL_JOB_COLUMNS)} FROM backfill_jobs FINAL"
+    params: Dict[str, Any] = {}
+    if statuses:
+        sql += " WHERE status IN %(statuses)s"
+        params["statuses"] = tuple(statuses)
+    sql += " ORDER BY created_at DESC"
+    if limit is not None:
+        sql += " LIMIT %(limit)s"
+        params["limit"] = limit
+    with get_client() as client:
+        result = client.query(sql, params)
+    return [dict(zip(result.column_names, row)) for row in result.result_rows]
+
+def fetch_backfill_slices(job_ids: List[str]) -> List[Dict[str, Any]]:
+    """Fetch the latest checkpoint of every slice of the given jobs"""
+    if not job_ids:
+        return []
+    sql = (f"SELECT {', '.join(BACKFILL_SLICE_COLUMNS)} FROM backfill_slices FINAL "
+           "WHERE job_id IN %(job_ids)s ORDER BY job_id, slice_no")
+    with get_client() as client:
+        result = client.query(sql, {"job_ids": tuple(job_ids)})
+    return [dict(zip(result.column_names, row)) for row in result.result_rows]
+
+# --- Coverage-Index für bars (core/coverage.py) ---
+COVERAGE_COLUMNS = ["symbol", "market", "granularity", "starts", "ends", "updated_at"]
+
+def fetch_bar_coverage() -> List[Dict[str, Any]]:
+    """Fetch the latest interval list of every (symbol, market, granularity)"""
+    with get_client() as client:
+        result = client.query(f"SELECT {', '.join(COVERAGE_COLUMNS)} FROM bar_coverage FINAL")
+    return [dict(zip(result.column_names, row)) for row in result.result_rows]
+
+def fetch_bar_islands(symbol: str, market: str, granularity: str, step_s: int, max_gap_s: int) -> List[Tuple[int, int]]:
+    """
+    Contiguous runs of bars for symbol/market/granularity as [start_ms, end_ms) (gaps-and-islands).
+    Timestamps at most max_gap_s apart belong to the same run; the last bar covers step_s.
+    Needs bars.granularity: rows of other or unknown resolution must not count as coverage.
+    """
+    sql = """
+    SELECT min(t) AS lo, max(t) AS hi
+    FROM (
+        SELECT t, sum(brk) OVER (ORDER BY t ROWS BETWEEN UNBOUNDED PRECEDING AND CURRENT ROW) AS grp
+        FROM (
+            SELECT t, if(t - lagInFrame(t, 1, t) OVER (ORDER BY t ROWS BETWEEN 1 PRECEDING AND CURRENT ROW) > %(max_gap)s, 1, 0) AS brk
+            FROM (
+                SELECT DISTINCT toInt64(toUnixTimestamp(ts)) AS t
+                FROM bars
+                WHERE symbol = %(symbol)s AND market = %(market)s AND granularity = %(granularity)s
+            )
+        )
+    )
+    GROUP BY grp
+    ORDER BY lo
+    """
+    params = {"symbol": symbol, "market": market, "granularity": granularity, "max_gap": max_gap_s}
+    with get_client() as client:
+        result = client.query(sql, params)
+    return [(int(lo) * 1000, (int(hi) + step_s) * 1000) for lo, hi in result.result_rows]
+
+# --- Async-Zugriff für FastAPI-Routen & WS-Handler ---
+# clickhouse_connect ist synchron. Damit eine langsame Query nicht den Event-Loop
+# (und damit jeden WS-Fan-out) blockiert, laufen alle Queries aus async-Code in einem
+# eigenen, begrenzten Thread-Pool. Zusätzlich begrenzt ein Semaphor je Query-Funktion,
+# wie viele Aufrufe derselben Art gleichzeitig laufen dürfen.
+_executor = ThreadPoolExecutor(max_workers=settings.CH_EXECUTOR_WORKERS, thread_name_prefix="clickhouse")
+_query_semaphores: Dict[str, asyncio.Semaphore] = {}
+
+def _query_semaphore(name: str) -> asyncio.Semaphore:
+    if name not in _query_semaphores:
+        _query_semaphores[name] = asyncio.Semaphore(settings.CH_MAX_CONCURRENT_PER_QUERY)
+    return _query_semaphores[name]
+
+async def run_db(fn: Callable, *args, **kwargs):
+    """Run a blocking DB function in the dedicated ClickHouse executor"""
+    async with _query_semaphore(fn.__name__):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_executor, functools.partial(fn, *args, **kwargs))
+
+def shutdown_executor():
+    """Stop the ClickHouse executor (FastAPI shutdown)"""
+    _executor.shutdown(wait=False, cancel_futures=True)
+
+async def ping_async() -> bool:
+    return await run_db(ping)
+
+async def upsert_coin_setting_async(*args, **kwargs):
+    return await run_db(upsert_coin_setting, *args, **kwargs)
+
+async def fetch_coin_settings_async(*args, **kwargs) -> List[Dict[str, Any]]:
+    return await run_db(fetch_coin_settings, *args, **kwargs)
+
+async def fetch_symbols_async() -> List[Dict[str, Any]]:
+    return await run_db(fetch_symbols)
+
+async def fetch_trades_async(*args, **kwargs) -> List[Dict[str, Any]]:
+    return await run_db(fetch_trades, *args, **kwargs)
+
+async def fetch_bars_async(*args, **kwargs) -> List[Dict[str, Any]]:
+    return await run_db(fetch_bars, *args, **kwargs)
+
+async def fetch_trades_page_async(*args, **kwargs) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    return await run_db(fetch_trades_page, *args, **kwargs)
+
+async def fetch_bars_page_async(*args, **kwargs) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    return await run_db(fetch_bars_page, *args, **kwargs)
@@ -0,0 +1,280 @@
+"""
+Compaction für die ReplacingMergeTree-Tabellen trades und bars (Tick-Schema v3).
+
+ClickHouse entfernt Duplikate nur beim Merge, und wann/ob Parts gemergt werden,
+entscheidet der Server. Dieser Scheduler prüft alle COMPACTION_INTERVAL s die
+Partitionen mit mehr als einem aktiven Part (nur dort können Duplikate liegen),
+schätzt den Duplikatanteil (count() vs. uniqCombined64 über den Schlüssel) und
+führt Partitionen über COMPACTION_DUP_RATIO per OPTIMIZE ... FINAL zusammen –
+höchstens COMPACTION_MAX_PARTITIONS je Lauf, nacheinander.
+
+Die OHLC-Rollups (ohlc_*) werden von Materialized Views beim Insert geschrieben und
+zählen Duplikate bei volume/trade_count mit; das Mergen von trades ändert daran nichts.
+Für abgeschlossene Zeiträume baut rebuild_rollups die Buckets deshalb aus den deduplizierten
+Trades neu auf: in eine Staging-Tabelle, die dann per REPLACE PARTITION atomar getauscht wird
+(Leser sehen nie einen leeren Monat). Neu aufgebaut wird je Rollup-Partition – Monate für
+ohlc_1s/1m/5m, Jahre für ohlc_1h/1d (PARTITION BY toYear) – nach jeder Compaction einer
+trades-Partition eines vergangenen Monats und einmal für den zuletzt abgeschlossenen Monat bzw.
+das zuletzt abgeschlossene Jahr. Laufende Zeiträume bleiben außen vor: Live-Inserts zwischen
+Staging und Tausch gingen verloren. Erledigte Partitionen stehen in rollup_rebuilds
+(migrations/20250710_create_rollup_rebuilds.sql) und überleben so Neustarts. Alle Grenzen in UTC.
+"""
+import asyncio
+import logging
+import re
+import time
+import traceback
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+from core.config import settings
+from db.clickhouse import run_db, schema_features
+from db.pool import get_client
+
+logger = logging.getLogger(__name__)
+
+# Tabelle -> Deduplizierungs-Schlüssel (= ORDER BY der v3-Tabellen); trades.trade_id ist die
+# Ingest-ID des Writers, Duplikate sind also nur wiederholte Inserts
+DEDUP_TABLES = {
+    "trades": "symbol, market, ts, trade_id",
+    "bars": "symbol, market, ts",
+}
+NO_TIMEOUT = {"max_execution_time": 0}
+_PARTITION_ID = re.compile(r"^[0-9A-Za-z_-]+$")
+_MONTH = re.compile(r"^\d{6}$")
+_YEAR = re.compile(r"^\d{4}$")
+
+# Rollup-Tabelle -> Bucket-Ausdruck (wie in migrations/20250702_create_ohlc_rollups.sql)
+ROLLUP_BUCKETS = {
+    "ohlc_1s": "toDateTime(ts)",
+    "ohlc_1m": "toStartOfMinute(ts)",
+    "ohlc_5m": "toStartOfFiveMinutes(ts)",
+    "ohlc_1h": "toStartOfHour(ts)",
+    "ohlc_1d": "toDateTime(toStartOfDay(ts))",
+}
+# Rollups mit PARTITION BY toYear(ts); die übrigen sind nach toYYYYMM(ts) partitioniert
+YEARLY_ROLLUPS = ("ohlc_1h", "ohlc_1d")
+
+
+def fetch_partitions_with_parts(table: str) -> List[Tuple[str, int, int]]:
+    """(partition_id, aktive Parts, Zeilen) aller Partitionen mit mehr als einem Part, zuletzt geänderte zuerst"""
+    with get_client() as client:
+        result = client.query(
+            """
+            SELECT partition_id, count() AS parts, sum(rows) AS rows
+            FROM system.parts
+            WHERE database = currentDatabase() AND table = %(table)s AND active
+            GROUP BY partition_id
+            HAVING parts > 1
+            ORDER BY max(modification_time) DESC
+            """,
+            {"table": table},
+        )
+    return [(pid, int(parts), int(rows)) for pid, parts, rows in result.result_rows]
+
+
+def fetch_duplicate_ratio(table: str, partition_id: str) -> float:
+    """Geschätzter Anteil doppelter Zeilen einer Partition (HLL mit 2^20 Registern, ~0,1 % Fehler)"""
+    key = DEDUP_TABLES[table]
+    if table == "bars" and schema_features["bar_granularity"]:
+        # Sortierschlüssel seit migrations/20250708_bars_granularity.sql
+        key += ", granularity"
+    with get_client() as client:
+        result = client.query(
+            f"SELECT count(), uniqCombined64(20)({key}) FROM {table} WHERE _partition_id = %(pid)s",
+            {"pid": partition_id},
+            settings=NO_TIMEOUT,
+        )
+    rows, unique = result.result_rows[0]
+    return max(0.0, 1 - unique / rows) if rows else 0.0
+
+
+def optimize_partition(table: str, partition_id: str):
+    if table not in DEDUP_TABLES or not _PARTITION_ID.match(partition_id):
+        raise ValueError(f"Invalid partition {table}/{partition_id}")
+    with get_client() as client:
+        client.command(f"OPTIMIZE TABLE {table} PARTITION ID '{partition_id}' FINAL", settings=NO_TIMEOUT)
+
+
+def _utc_now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def closed_month(partition_id: str) -> bool:
+    """trades-Partition (YYYYMM) eines vergangenen Monats (UTC)?"""
+    return bool(_MONTH.match(partition_id)) and partition_id < _utc_now().strftime("%Y%m")
+
+
+def closed_year(partition_id: str) -> bool:
+    """Jahr (YYYY) vor dem laufenden (UTC)?"""
+    return bool(_YEAR.match(partition_id)) and partition_id < _utc_now().strftime("%Y")
+
+
+def last_closed_month() -> str:
+    now = _utc_now()
+    return f"{now.year - 1}12" if now.month == 1 else f"{now.year}{now.month - 1:02d}"
+
+
+def last_closed_year() -> str:
+    return str(_utc_now().year - 1)
+
+
+def _as_utc(dt: datetime) -> datetime:
+    return dt.replace(tzinfo=timezone.utc) if dt.tzinfo is None else dt
+
+
+def fetch_rebuilt_partitions() -> Dict[str, float]:
+    """Schon neu aufgebaute Rollup-Partitionen (YYYYMM/YYYY) -> Zeitpunkt des letzten Neuaufbaus"""
+    with get_client() as client:
+        result = client.query("SELECT partition, max(rebuilt_at) FROM rollup_rebuilds GROUP BY partition")
+    return {partition: _as_utc(rebuilt_at).timestamp() for partition, rebuilt_at in result.result_rows}
+
+
+def rebuild_rollups(partition_id: str) -> int:
+    """
+    Rollup-Buckets eines abgeschlossenen Monats (YYYYMM: ohlc_1s/1m/5m) oder Jahres (YYYY: ohlc_1h/1d)
+    aus trades FINAL neu berechnen: je Rollup in <rollup>_rebuild aufbauen und per REPLACE PARTITION
+    tauschen. Liefert die Zahl der geschriebenen Buckets und vermerkt die Partition in rollup_rebuilds.
+    """
+    if closed_month(partition_id):
+        tables = [t for t in ROLLUP_BUCKETS if t not in YEARLY_ROLLUPS]
+        trades_filter = f"_partition_id = '{partition_id}'"
+    elif closed_year(partition_id):
+        tables = list(YEARLY_ROLLUPS)
+        trades_filter = f"_partition_id BETWEEN '{partition_id}01' AND '{partition_id}12'"
+    else:
+        raise ValueError(f"Refusing to rebuild rollups for open or invalid period {partition_id}")
+    written = 0
+    with get_client() as client:
+        trades = client.query(f"SELECT count() FROM trades WHERE {trades_filter}").result_rows[0][0]
+        if not trades:
+            # trades schon gelöscht (TTL)? Dann sind die Rollups die einzige Historie – nicht leeren
+            logger.warning(f"No trades for {partition_id}, keeping its rollups as they are")
+            return 0
+        for table in tables:
+            staging = f"{table}_rebuild"
+            client.command(f"CREATE TABLE IF NOT EXISTS {staging} AS {table}")
+            client.command(f"TRUNCATE TABLE {staging}")
+            summary = client.command(
+                f"""
+                INSERT INTO {staging} (symbol, market, ts, open, high, low, close, volume, trade_count)
+                SELECT symbol, market, {ROLLUP_BUCKETS[table]} AS bucket,
+                       argMinState(price, toDateTime64(ts, 3)), max(price), min(price),
+                       argMaxState(price, toDateTime64(ts, 3)), sum(size), count()
+                FROM trades FINAL
+                WHERE {trades_filter}
+                GROUP BY symbol, market, bucket
+                """,
+                settings=NO_TIMEOUT,
+            )
+            client.command(f"ALTER TABLE {table} REPLACE PARTITION ID '{partition_id}' FROM {staging}",
+                           settings=NO_TIMEOUT)
+            client.command(f"TRUNCATE TABLE {staging}")
+            written += int(getattr(summary, "written_rows", 0) or 0)
+        client.insert("rollup_rebuilds", [(partition_id, written, _utc_now())],
+                      column_names=["partition", "buckets", "rebuilt_at"])
+    return written
+
+
+class CompactionScheduler:
+    def __init__(self, interval_s: float = 3600.0, dup_ratio: float = 0.01, max_partitions: int = 4):
+        self.interval_s = interval_s
+        self.dup_ratio = dup_ratio
+        self.max_partitions = max_partitions
+        self._task: Optional[asyncio.Task] = None
+        self.running = False
+        self.last_run: Dict[str, dict] = {}
+        self.rollups_rebuilt: Dict[str, float] = {}   # Monat/Jahr -> Zeitpunkt des letzten Neuaufbaus (rollup_rebuilds)
+        self.metrics = {"runs": 0, "optimizes": 0, "optimize_ms_total": 0.0, "errors": 0,
+                        "rollup_rebuilds": 0, "rollup_rebuild_ms_total": 0.0}
+
+    async def start(self):
+        # nur auf Tick-Schema v3 (TICK_DEDUP, von detect_schema beim Start aufgelöst)
+        if self.running or not schema_features["tick_dedup"] or self.interval_s <= 0:
+            return
+        self.running = True
+        if settings.COMPACTION_REBUILD_ROLLUPS:
+            try:
+                self.rollups_rebuilt.update(await run_db(fetch_rebuilt_partitions))
+            except Exception as e:
+                logger.error(f"Could not load rebuilt rollup partitions (migration 20250710 missing?): {e}")
+        self._task = asyncio.create_task(self._loop())
+        logger.info(f"Compaction scheduler started (every {self.interval_s:.0f}s, threshold {self.dup_ratio:.1%})")
+
+    async def stop(self):
+        if not self.running:
+            return
+        self.running = False
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    async def _loop(self):
+        while self.running:
+            try:
+                await self.run_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.metrics["errors"] += 1
+                logger.error(f"Compaction run failed: {e}")
+                traceback.print_exc()
+            await asyncio.sleep(self.interval_s)
+
+    async def run_once(self) -> Dict[str, dict]:
+        """Ein Durchlauf über alle Tabellen; liefert je Tabelle geprüfte und kompaktierte Partitionen"""
+        budget = self.max_partitions
+        for table in DEDUP_TABLES:
+            report = {"checked": {}, "optimized": [], "ts": time.time()}
+            for partition_id, parts, rows in await run_db(fetch_partitions_with_parts, table):
+                ratio = await run_db(fetch_duplicate_ratio, table, partition_id)
+                report["checked"][partition_id] = {"parts": parts, "rows": rows, "dup_ratio": round(ratio, 4)}
+                if ratio < self.dup_ratio or budget <= 0:
+                    continue
+                started = time.perf_counter()
+                # OPTIMIZE kann Minuten dauern -> eigener Thread statt ClickHouse-Executor
+                await asyncio.to_thread(optimize_partition, table, partition_id)
+                elapsed_ms = (time.perf_counter() - started) * 1000
+                budget -= 1
+                self.metrics["optimizes"] += 1
+                self.metrics["optimize_ms_total"] += elapsed_ms
+                report["optimized"].append(partition_id)
+                logger.info(f"Compacted {table} partition {partition_id}: {ratio:.2%} duplicates, "
+                            f"{parts} parts, {elapsed_ms:.0f}ms")
+            self.last_run[table] = report
+        if settings.COMPACTION_REBUILD_ROLLUPS:
+            months = [p for p in self.last_run.get("trades", {}).get("optimized", []) if closed_month(p)]
+            if last_closed_month() not in self.rollups_rebuilt:
+                months.append(last_closed_month())
+            # Jahres-Rollups: erst wenn das Jahr vorbei ist, dann für jeden kompaktierten Monat darin
+            years = [p[:4] for p in months if closed_year(p[:4])]
+            if last_closed_year() not in self.rollups_rebuilt:
+                years.append(last_closed_year())
+            for partition in dict.fromkeys(months + years):
+                await self._rebuild_rollups(partition)
+        self.metrics["runs"] += 1
+        return self.last_run
+
+    async def _rebuild_rollups(self, partition: str):
+        started = time.perf_counter()
+        buckets = await asyncio.to_thread(rebuild_rollups, partition)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        self.rollups_rebuilt[partition] = time.time()
+        self.metrics["rollup_rebuilds"] += 1
+        self.metrics["rollup_rebuild_ms_total"] += elapsed_ms
+        logger.info(f"Rebuilt OHLC rollups for {partition} from deduplicated trades: {buckets} buckets, {elapsed_ms:.0f}ms")
+
+    def get_metrics(self) -> dict:
+        return {"running": self.running, "dup_ratio_threshold": self.dup_ratio, **self.metrics, "tables": self.last_run,
+                "rollups_rebuilt": self.rollups_rebuilt}
+
+
+# Globale Instanz (Start/Stop über FastAPI-Lifecycle in core/main.py)
+compaction_scheduler = CompactionScheduler(
+    settings.COMPACTION_INTERVAL,
+    settings.COMPACTION_DUP_RATIO,
+    settings.COMPACTION_MAX_PARTITIONS,
+)
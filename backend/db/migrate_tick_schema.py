@@ -0,0 +1,172 @@
+"""
+Online-Migration von trades/bars auf ein neues Tick-Schema:
+  v2 (migrations/20250703_tick_schema_v2.sql): DateTime64, LowCardinality, Codecs
+  v3 (migrations/20250707_tick_schema_v3_dedup.sql): ReplacingMergeTree, idempotente Inserts
+
+Ablauf je Tabelle, während Collector/Writer weiterlaufen:
+ 1. Zieltabelle <table>_<schema> anlegen (falls nicht vorhanden)
+ 2. Historie bis zum Beginn der aktuellen Stunde (cutoff) in Zeitscheiben
+    per INSERT ... SELECT kopieren – jede Scheibe ist ein eigener, kurzer Insert
+ 3. Rollup-Materialized-Views auf trades kurz entfernen, EXCHANGE TABLES
+    (atomar: ab jetzt schreibt der Writer ins neue Layout)
+ 4. Rest ab cutoff aus der alten Tabelle nachkopieren, Views wieder anlegen
+    (Trades, die genau in diesen Sekunden eintreffen, fehlen in den Rollups)
+ 5. Alte Tabelle bleibt als <table>_<vorheriges Schema>_backup erhalten
+
+Nutzung:
+    python -m db.migrate_tick_schema --tables trades bars --slice-hours 24
+    python -m db.migrate_tick_schema --schema v3
+"""
+import argparse
+import logging
+import os
+import time
+import traceback
+from typing import List
+
+from db.pool import get_client
+
+logging.basicConfig(level=logging.INFO, format='[%(asctime)s] [%(levelname)s] %(message)s')
+logger = logging.getLogger(__name__)
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(__file__), "migrations")
+# Schema -> (Migrationsdatei, Vorgänger für den Backup-Namen)
+SCHEMAS = {
+    "v2": (os.path.join(MIGRATIONS_DIR, "20250703_tick_schema_v2.sql"), "v1"),
+    "v3": (os.path.join(MIGRATIONS_DIR, "20250707_tick_schema_v3_dedup.sql"), "v2"),
+}
+ROLLUPS_SQL = os.path.join(MIGRATIONS_DIR, "20250702_create_ohlc_rollups.sql")
+# trades schon auf v3 (erste Fassung mit Inhalts-Hash): nur trade_id auf die Ingest-ID umstellen
+TRADE_ID_SQL = os.path.join(MIGRATIONS_DIR, "20250709_trades_ingest_trade_id.sql")
+# bars.granularity muss in der Quelltabelle existieren, bevor sie kopiert wird
+BARS_GRANULARITY_SQL = os.path.join(MIGRATIONS_DIR, "20250708_bars_granularity.sql")
+
+# Materialized Views, die auf trades lauschen (werden beim Umschalten neu angelegt)
+ROLLUP_VIEWS = ["ohlc_1s_mv", "ohlc_1m_mv", "ohlc_5m_mv", "ohlc_1h_mv", "ohlc_1d_mv"]
+
+# Spaltenliste und SELECT-Ausdrücke alt -> neu (v3: trade_id/version setzt ClickHouse per DEFAULT)
+COPY_COLUMNS = {
+    "trades": (
+        ["symbol", "market", "price", "size", "side", "ts"],
+        "symbol, market, price, size, side, toDateTime64(ts, 3)",
+    ),
+    "bars": (
+        ["symbol", "market", "granularity", "open", "high", "low", "close", "volume", "ts"],
+        "symbol, market, granularity, open, high, low, close, volume, toDateTime64(ts, 3)",
+    ),
+}
+
+# Lange INSERT ... SELECT nicht am Per-Query-Timeout des Pools scheitern lassen
+NO_TIMEOUT = {"max_execution_time": 0}
+
+
+def run_sql_file(path: str):
+    """Führt alle Statements einer Migrationsdatei aus (Kommentarzeilen werden ignoriert)"""
+    with open(path, encoding="utf-8") as f:
+        lines = [line for line in f if not line.lstrip().startswith("--")]
+    statements = [stmt.strip() for stmt in "".join(lines).split(";") if stmt.strip()]
+    with get_client() as client:
+        for stmt in statements:
+            client.command(stmt, settings=NO_TIMEOUT)
+    logger.info(f"Applied {len(statements)} statements from {os.path.basename(path)}")
+
+
+def _has_column(table: str, column: str) -> bool:
+    with get_client() as client:
+        result = client.query(
+            "SELECT count() FROM system.columns WHERE database = currentDatabase() "
+            "AND table = %(table)s AND name = %(column)s",
+            {"table": table, "column": column},
+        )
+    return bool(result.result_rows[0][0])
+
+
+def _time_bounds(table: str):
+    with get_client() as client:
+        result = client.query(f"SELECT toUnixTimestamp(min(ts)), toUnixTimestamp(max(ts)), count() FROM {table}")
+    return result.result_rows[0]
+
+
+def copy_slices(src: str, dst: str, start_s: int, end_s: int, slice_s: int, columns: List[str], select_expr: str) -> int:
+    """Kopiert [start_s, end_s) in Zeitscheiben von src nach dst, gibt die Zeilenzahl zurück"""
+    copied = 0
+    lo = start_s
+    while lo < end_s:
+        hi = min(lo + slice_s, end_s)
+        started = time.perf_counter()
+        with get_client() as client:
+            summary = client.command(
+                f"INSERT INTO {dst} ({', '.join(columns)}) "
+                f"SELECT {select_expr} FROM {src} "
+                f"WHERE ts >= toDateTime(%(lo)s) AND ts < toDateTime(%(hi)s)",
+                {"lo": lo, "hi": hi},
+                settings=NO_TIMEOUT,
+            )
+        rows = int(getattr(summary, "written_rows", 0) or 0)
+        copied += rows
+        logger.info(f"[{src} -> {dst}] {lo}..{hi}: {rows} rows in {time.perf_counter() - started:.1f}s")
+        lo = hi
+    return copied
+
+
+def migrate_table(table: str, slice_hours: int, schema: str = "v2"):
+    new_table = f"{table}_{schema}"
+    backup_table = f"{table}_{SCHEMAS[schema][1]}_backup"
+    columns, select_expr = COPY_COLUMNS[table]
+    slice_s = slice_hours * 3600
+
+    cutoff = int(time.time()) // 3600 * 3600
+    min_s, _, total = _time_bounds(table)
+    if not total:
+        logger.info(f"{table} is empty, swapping without copy")
+        min_s = cutoff
+
+    # 2. Historie bis cutoff kopieren (alte Tabelle bekommt parallel weiter Live-Daten)
+    copied = copy_slices(table, new_table, min_s, cutoff, slice_s, columns, select_expr)
+    logger.info(f"{table}: copied {copied}/{total} historical rows before swap")
+
+    # 3. Umschalten
+    with get_client() as client:
+        if table == "trades":
+            for view in ROLLUP_VIEWS:
+                client.command(f"DROP VIEW IF EXISTS {view}")
+        client.command(f"EXCHANGE TABLES {table} AND {new_table}")
+    logger.info(f"Swapped {table} <-> {new_table}")
+
+    # 4. Rest ab cutoff aus der alten Tabelle (heißt jetzt {new_table}) nachziehen
+    _, old_max_s, _ = _time_bounds(new_table)
+    copied += copy_slices(new_table, table, cutoff, old_max_s + 1, slice_s, columns, select_expr)
+    if table == "trades" and os.path.exists(ROLLUPS_SQL):
+        run_sql_file(ROLLUPS_SQL)
+
+    # 5. Alte Daten als Backup behalten
+    with get_client() as client:
+        client.command(f"RENAME TABLE {new_table} TO {backup_table}")
+    logger.info(f"{table}: migration done, {copied} rows copied, old layout kept as {backup_table}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Online-Migration trades/bars -> neues Tick-Schema")
+    parser.add_argument("--schema", default="v2", choices=list(SCHEMAS))
+    parser.add_argument("--tables", nargs="+", default=["trades", "bars"], choices=list(COPY_COLUMNS))
+    parser.add_argument("--slice-hours", type=int, default=24)
+    args = parser.parse_args()
+
+    run_sql_file(SCHEMAS[args.schema][0])
+    if "bars" in args.tables:
+        run_sql_file(BARS_GRANULARITY_SQL)
+    tables = list(args.tables)
+    if args.schema == "v3" and "trades" in tables and _has_column("trades", "trade_id"):
+        run_sql_file(TRADE_ID_SQL)
+        tables.remove("trades")
+    for table in tables:
+        try:
+            migrate_table(table, args.slice_hours, args.schema)
+        except Exception as e:
+            logger.error(f"Migration of {table} failed: {e}")
+            traceback.print_exc()
+            raise
+
+
+if __name__ == "__main__":
+    main()
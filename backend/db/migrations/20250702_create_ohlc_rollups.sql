@@ -0,0 +1,171 @@
+-- OHLC-Rollups aus der trades-Tabelle (1s, 1m, 5m, 1h, 1d)
+-- Jede Rollup-Tabelle ist eine AggregatingMergeTree, die von einer Materialized View
+-- bei jedem INSERT in trades fortgeschrieben wird. Gelesen wird immer mit
+-- argMinMerge/argMaxMerge + GROUP BY (siehe db/clickhouse.py: fetch_bars).
+-- open/close tragen den Trade-Zeitstempel als DateTime64(3). Solange trades.ts noch
+-- DateTime ist (Schema v1), hat er nur Sekundenauflösung: bei mehreren Trades in der
+-- Sekunde, in der ein Bucket beginnt/endet, ist open/close dann ein beliebiger davon.
+-- Exakt (ms) wird es erst mit Tick-Schema v2 (20250703_tick_schema_v2.sql); die
+-- Migration legt die Views danach neu an, bereits aggregierte Buckets bleiben wie sie sind.
+-- Unter Schema v3 (ReplacingMergeTree) zählen die Views doppelt eingefügte Trades bei
+-- volume/trade_count doppelt; db/compaction.py baut abgeschlossene Monate deshalb aus den
+-- deduplizierten Trades neu auf (rebuild_rollups).
+
+-- Table: ohlc_1s
+CREATE TABLE IF NOT EXISTS ohlc_1s (
+    symbol       String,
+    market       String,
+    ts           DateTime,
+    open         AggregateFunction(argMin, Float64, DateTime64(3)),
+    high         SimpleAggregateFunction(max, Float64),
+    low          SimpleAggregateFunction(min, Float64),
+    close        AggregateFunction(argMax, Float64, DateTime64(3)),
+    volume       SimpleAggregateFunction(sum, Float64),
+    trade_count  SimpleAggregateFunction(sum, UInt64)
+)
+ENGINE = AggregatingMergeTree()
+PARTITION BY toYYYYMM(ts)
+ORDER BY (symbol, market, ts);
+
+CREATE MATERIALIZED VIEW IF NOT EXISTS ohlc_1s_mv TO ohlc_1s AS
+SELECT
+    symbol,
+    market,
+    toDateTime(trade_ts)                          AS ts,
+    argMinState(price, toDateTime64(trade_ts, 3)) AS open,
+    max(price)                                    AS high,
+    min(price)                                    AS low,
+    argMaxState(price, toDateTime64(trade_ts, 3)) AS close,
+    sum(size)                                     AS volume,
+    count()                                       AS trade_count
+FROM (SELECT symbol, market, price, size, ts AS trade_ts FROM trades)
+GROUP BY symbol, market, ts;
+
+-- Table: ohlc_1m
+CREATE TABLE IF NOT EXISTS ohlc_1m (
+    symbol       String,
+    market       String,
+    ts           DateTime,
+    open         AggregateFunction(argMin, Float64, DateTime64(3)),
+    high         SimpleAggregateFunction(max, Float64),
+    low          SimpleAggregateFunction(min, Float64),
+    close        AggregateFunction(argMax, Float64, DateTime64(3)),
+    volume       SimpleAggregateFunction(sum, Float64),
+    trade_count  SimpleAggregateFunction(sum, UInt64)
+)
+ENGINE = AggregatingMergeTree()
+PARTITION BY toYYYYMM(ts)
+ORDER BY (symbol, market, ts);
+
+CREATE MATERIALIZED VIEW IF NOT EXISTS ohlc_1m_mv TO ohlc_1m AS
+SELECT
+    symbol,
+    market,
+    toStartOfMinute(trade_ts)                     AS ts,
+    argMinState(price, toDateTime64(trade_ts, 3)) AS open,
+    max(price)                                    AS high,
+    min(price)                                    AS low,
+    argMaxState(price, toDateTime64(trade_ts, 3)) AS close,
+    sum(size)                                     AS volume,
+    count()                                       AS trade_count
+FROM (SELECT symbol, market, price, size, ts AS trade_ts FROM trades)
+GROUP BY symbol, market, ts;
+
+-- Table: ohlc_5m
+CREATE TABLE IF NOT EXISTS ohlc_5m (
+    symbol       String,
+    market       String,
+    ts           DateTime,
+    open         AggregateFunction(argMin, Float64, DateTime64(3)),
+    high         SimpleAggregateFunction(max, Float64),
+    low          SimpleAggregateFunction(min, Float64),
+    close        AggregateFunction(argMax, Float64, DateTime64(3)),
+    volume       SimpleAggregateFunction(sum, Float64),
+    trade_count  SimpleAggregateFunction(sum, UInt64)
+)
+ENGINE = AggregatingMergeTree()
+PARTITION BY toYYYYMM(ts)
+ORDER BY (symbol, market, ts);
+
+CREATE MATERIALIZED VIEW IF NOT EXISTS ohlc_5m_mv TO ohlc_5m AS
+SELECT
+    symbol,
+    market,
+    toStartOfFiveMinutes(trade_ts)                AS ts,
+    argMinState(price, toDateTime64(trade_ts, 3)) AS open,
+    max(price)                                    AS high,
+    min(price)                                    AS low,
+    argMaxState(price, toDateTime64(trade_ts, 3)) AS close,
+    sum(size)                                     AS volume,
+    count()                                       AS trade_count
+FROM (SELECT symbol, market, price, size, ts AS trade_ts FROM trades)
+GROUP BY symbol, market, ts;
+
+-- Table: ohlc_1h
+CREATE TABLE IF NOT EXISTS ohlc_1h (
+    symbol       String,
+    market       String,
+    ts           DateTime,
+    open         AggregateFunction(argMin, Float64, DateTime64(3)),
+    high         SimpleAggregateFunction(max, Float64),
+    low          SimpleAggregateFunction(min, Float64),
+    close        AggregateFunction(argMax, Float64, DateTime64(3)),
+    volume       SimpleAggregateFunction(sum, Float64),
+    trade_count  SimpleAggregateFunction(sum, UInt64)
+)
+ENGINE = AggregatingMergeTree()
+PARTITION BY toYear(ts)
+ORDER BY (symbol, market, ts);
+
+CREATE MATERIALIZED VIEW IF NOT EXISTS ohlc_1h_mv TO ohlc_1h AS
+SELECT
+    symbol,
+    market,
+    toStartOfHour(trade_ts)                       AS ts,
+    argMinState(price, toDateTime64(trade_ts, 3)) AS open,
+    max(price)                                    AS high,
+    min(price)                                    AS low,
+    argMaxState(price, toDateTime64(trade_ts, 3)) AS close,
+    sum(size)                                     AS volume,
+    count()                                       AS trade_count
+FROM (SELECT symbol, market, price, size, ts AS trade_ts FROM trades)
+GROUP BY symbol, market, ts;
+
+-- Table: ohlc_1d
+CREATE TABLE IF NOT EXISTS ohlc_1d (
+    symbol       String,
+    market       String,
+    ts           DateTime,
+    open         AggregateFunction(argMin, Float64, DateTime64(3)),
+    high         SimpleAggregateFunction(max, Float64),
+    low          SimpleAggregateFunction(min, Float64),
+    close        AggregateFunction(argMax, Float64, DateTime64(3)),
+    volume       SimpleAggregateFunction(sum, Float64),
+    trade_count  SimpleAggregateFunction(sum, UInt64)
+)
+ENGINE = AggregatingMergeTree()
+PARTITION BY toYear(ts)
+ORDER BY (symbol, market, ts);
+
+CREATE MATERIALIZED VIEW IF NOT EXISTS ohlc_1d_mv TO ohlc_1d AS
+SELECT
+    symbol,
+    market,
+    toDateTime(toStartOfDay(trade_ts))            AS ts,
+    argMinState(price, toDateTime64(trade_ts, 3)) AS open,
+    max(price)                                    AS high,
+    min(price)                                    AS low,
+    argMaxState(price, toDateTime64(trade_ts, 3)) AS close,
+    sum(size)                                     AS volume,
+    count()                                       AS trade_count
+FROM (SELECT symbol, market, price, size, ts AS trade_ts FROM trades)
+GROUP BY symbol, market, ts;
+
+-- Einmalig nach dem Anlegen: bereits vorhandene Trades in die Rollups übernehmen.
+-- (Die Materialized Views sehen nur neue INSERTs. NICHT mehrfach ausführen,
+--  sonst werden Volumen/Trade-Anzahl doppelt gezählt.)
+-- INSERT INTO ohlc_1s SELECT symbol, market, toDateTime(ts) AS bucket, argMinState(price, toDateTime64(ts, 3)), max(price), min(price), argMaxState(price, toDateTime64(ts, 3)), sum(size), count() FROM trades GROUP BY symbol, market, bucket;
+-- INSERT INTO ohlc_1m SELECT symbol, market, toStartOfMinute(ts) AS bucket, argMinState(price, toDateTime64(ts, 3)), max(price), min(price), argMaxState(price, toDateTime64(ts, 3)), sum(size), count() FROM trades GROUP BY symbol, market, bucket;
+-- INSERT INTO ohlc_5m SELECT symbol, market, toStartOfFiveMinutes(ts) AS bucket, argMinState(price, toDateTime64(ts, 3)), max(price), min(price), argMaxState(price, toDateTime64(ts, 3)), sum(size), count() FROM trades GROUP BY symbol, market, bucket;
+-- INSERT INTO ohlc_1h SELECT symbol, market, toStartOfHour(ts) AS bucket, argMinState(price, toDateTime64(ts, 3)), max(price), min(price), argMaxState(price, toDateTime64(ts, 3)), sum(size), count() FROM trades GROUP BY symbol, market, bucket;
+-- INSERT INTO ohlc_1d SELECT symbol, market, toDateTime(toStartOfDay(ts)) AS bucket, argMinState(price, toDateTime64(ts, 3)), max(price), min(price), argMaxState(price, toDateTime64(ts, 3)), sum(size), count() FROM trades GROUP BY symbol, market, bucket;
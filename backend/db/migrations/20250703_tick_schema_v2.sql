@@ -0,0 +1,37 @@
+-- Tick-Schema v2 für trades und bars
+-- - Millisekunden-Zeitstempel (DateTime64(3)) statt DateTime
+-- - LowCardinality(String) für symbol, market, side
+-- - Spalten-Codecs: DoubleDelta für Zeitstempel, Gorilla für Preise, ZSTD überall
+-- - Monatspartitionen, damit alte Daten günstig verschoben/gelöscht werden können
+--
+-- Die v2-Tabellen werden neben den alten angelegt. Kopieren und Umschalten
+-- übernimmt db/migrate_tick_schema.py (online, in Zeitscheiben, danach EXCHANGE TABLES).
+
+-- Table: trades_v2
+CREATE TABLE IF NOT EXISTS trades_v2 (
+    symbol   LowCardinality(String),
+    market   LowCardinality(String),
+    price    Float64                 CODEC(Gorilla, ZSTD(1)),
+    size     Float64                 CODEC(ZSTD(1)),
+    side     LowCardinality(String),
+    ts       DateTime64(3)           CODEC(DoubleDelta, ZSTD(1))
+)
+ENGINE = MergeTree()
+PARTITION BY toYYYYMM(ts)
+ORDER BY (symbol, market, ts);
+
+-- Table: bars_v2 (granularity siehe 20250708_bars_granularity.sql)
+CREATE TABLE IF NOT EXISTS bars_v2 (
+    symbol   LowCardinality(String),
+    market   LowCardinality(String),
+    granularity LowCardinality(String) DEFAULT '',
+    open     Float64                 CODEC(Gorilla, ZSTD(1)),
+    high     Float64                 CODEC(Gorilla, ZSTD(1)),
+    low      Float64                 CODEC(Gorilla, ZSTD(1)),
+    close    Float64                 CODEC(Gorilla, ZSTD(1)),
+    volume   Float64                 CODEC(ZSTD(1)),
+    ts       DateTime64(3)           CODEC(DoubleDelta, ZSTD(1))
+)
+ENGINE = MergeTree()
+PARTITION BY toYYYYMM(ts)
+ORDER BY (symbol, market, ts, granularity);
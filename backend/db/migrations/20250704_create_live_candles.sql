@@ -0,0 +1,21 @@
+-- Live-Kerzen aus dem Trade-Stream (core/candles.py: LiveCandleService)
+-- Eine Zeile je abgeschlossener Kerze und Auflösung (1s/1m/5m/1h), geschrieben
+-- genau einmal beim Schließen über den Batch-Writer. ReplacingMergeTree fängt
+-- Wiederholungen nach einem fehlgeschlagenen Flush ab.
+
+-- Table: candles
+CREATE TABLE IF NOT EXISTS candles (
+    symbol       LowCardinality(String),
+    market       LowCardinality(String),
+    resolution   UInt32,
+    ts           DateTime                CODEC(DoubleDelta, ZSTD(1)),
+    open         Float64                 CODEC(Gorilla, ZSTD(1)),
+    high         Float64                 CODEC(Gorilla, ZSTD(1)),
+    low          Float64                 CODEC(Gorilla, ZSTD(1)),
+    close        Float64                 CODEC(Gorilla, ZSTD(1)),
+    volume       Float64                 CODEC(ZSTD(1)),
+    trade_count  UInt32                  CODEC(ZSTD(1))
+)
+ENGINE = ReplacingMergeTree()
+PARTITION BY toYYYYMM(ts)
+ORDER BY (symbol, market, resolution, ts);
@@ -0,0 +1,40 @@
+-- Backfill-Jobs (exchanges/bitget/backfill_jobs.py: BackfillScheduler)
+-- Ein Job lädt [start_ts, end_ts) für ein Symbol; er ist in Zeitscheiben zerlegt,
+-- deren Fortschritt (cursor_ms = ältester bereits geschriebener Zeitpunkt - 1) als
+-- Checkpoint gespeichert wird. Nach einem Neustart läuft jede Scheibe ab ihrem Cursor weiter.
+-- Status-Updates sind neue Zeilen; ReplacingMergeTree(updated_at) behält die neueste.
+
+-- Table: backfill_jobs
+CREATE TABLE IF NOT EXISTS backfill_jobs (
+    job_id        String,
+    symbol        LowCardinality(String),
+    market        LowCardinality(String),
+    granularity   LowCardinality(String),
+    start_ts      DateTime,
+    end_ts        DateTime,
+    status        LowCardinality(String),   -- queued | running | done | failed | cancelled
+    slices_total  UInt32,
+    rows          UInt64,
+    error         String,
+    created_at    DateTime64(3),
+    updated_at    DateTime64(3)
+)
+ENGINE = ReplacingMergeTree(updated_at)
+ORDER BY job_id;
+
+-- Table: backfill_slices
+CREATE TABLE IF NOT EXISTS backfill_slices (
+    job_id        String,
+    slice_no      UInt32,
+    lo            DateTime,
+    hi            DateTime,
+    cursor_ms     Int64,                    -- nächstes endTime für die Bitget-API
+    rows          UInt64,
+    pages         UInt32,
+    status        LowCardinality(String),   -- pending | done | failed
+    attempts      UInt16,
+    error         String,
+    updated_at    DateTime64(3)
+)
+ENGINE = ReplacingMergeTree(updated_at)
+ORDER BY (job_id, slice_no);
@@ -0,0 +1,18 @@
+-- Coverage-Index für bars (core/coverage.py: CoverageIndex)
+-- Eine Zeile je (symbol, market, granularity) mit allen abgedeckten, verschmolzenen
+-- [start, end)-Intervallen in ms. Jede Änderung schreibt die komplette Liste neu;
+-- ReplacingMergeTree(updated_at) behält die neueste.
+-- Abgedeckt heißt: Bitget wurde für diesen Zeitraum gefragt und alle gelieferten
+-- Kerzen liegen in bars (auch Zeiträume ohne Kerzen, z.B. vor dem Listing).
+
+-- Table: bar_coverage
+CREATE TABLE IF NOT EXISTS bar_coverage (
+    symbol       LowCardinality(String),
+    market       LowCardinality(String),
+    granularity  LowCardinality(String),
+    starts       Array(Int64),
+    ends         Array(Int64),
+    updated_at   DateTime64(3)
+)
+ENGINE = ReplacingMergeTree(updated_at)
+ORDER BY (symbol, market, granularity);
@@ -0,0 +1,53 @@
+-- Tick-Schema v3: idempotente Ingestion für trades und bars
+-- - ReplacingMergeTree(version): wiederholte Inserts (zweiter Backfill, Gap-Recovery,
+--   erneuter Flush nach Fehler) fallen beim Merge auf eine Zeile je Schlüssel zusammen
+-- - trades: Schlüssel (symbol, market, ts, trade_id). Der v1-WS-Feed von Bitget liefert
+--   keine Trade-ID; trade_id ist die Ingest-ID, die der Writer beim Puffern vergibt
+--   (db/writer.py: next_ingest_id, oberstes Bit gesetzt). Ein wiederholter Insert desselben
+--   Batches (erneuter Flush, Dead-Letter-Replay) trägt dieselben IDs und fällt zusammen,
+--   identische Prints in derselben ms bleiben getrennt. Inserts ohne trade_id (Kopie aus v2)
+--   bekommen eine zufällige ID aus demselben Bereich. Überlappungen zwischen Live-Feed und
+--   REST-Gap-Recovery entdoppelt der Collector (exchanges/bitget/collector.py: RecentTrades)
+-- - bars: Schlüssel (symbol, market, ts, granularity); bei gleicher Kerze gewinnt der neueste Insert
+--   (z.B. die beim ersten Backfill noch offene, jetzt fertige Kerze)
+-- - version wird von ClickHouse beim Insert gesetzt (Insert-Zeitpunkt in ms)
+--
+-- Gelesen wird ohne FINAL: ORDER BY ..., version DESC LIMIT 1 BY <Schlüssel>
+-- (db/clickhouse.py). Den Duplikatanteil hält db/compaction.py niedrig.
+-- Die Rollup-Views auf trades zählen doppelt eingefügte Trades doppelt (volume,
+-- trade_count). Wiederholte Inserts sind selten; abgeschlossene Monate baut
+-- db/compaction.py aus den deduplizierten Trades neu auf (rebuild_rollups).
+--
+-- Umschalten wie bei v2: python -m db.migrate_tick_schema --schema v3
+
+-- Table: trades_v3
+CREATE TABLE IF NOT EXISTS trades_v3 (
+    symbol    LowCardinality(String),
+    market    LowCardinality(String),
+    price     Float64                 CODEC(Gorilla, ZSTD(1)),
+    size      Float64                 CODEC(ZSTD(1)),
+    side      LowCardinality(String),
+    ts        DateTime64(3)           CODEC(DoubleDelta, ZSTD(1)),
+    trade_id  UInt64 DEFAULT bitOr(rand64(), 9223372036854775808) CODEC(ZSTD(1)),
+    version   UInt64 DEFAULT toUnixTimestamp64Milli(now64(3)) CODEC(DoubleDelta, ZSTD(1))
+)
+ENGINE = ReplacingMergeTree(version)
+PARTITION BY toYYYYMM(ts)
+ORDER BY (symbol, market, ts, trade_id);
+
+-- Table: bars_v3 (granularity siehe 20250708_bars_granularity.sql)
+CREATE TABLE IF NOT EXISTS bars_v3 (
+    symbol    LowCardinality(String),
+    market    LowCardinality(String),
+    granularity LowCardinality(String) DEFAULT '',
+    open      Float64                 CODEC(Gorilla, ZSTD(1)),
+    high      Float64                 CODEC(Gorilla, ZSTD(1)),
+    low       Float64                 CODEC(Gorilla, ZSTD(1)),
+    close     Float64                 CODEC(Gorilla, ZSTD(1)),
+    volume    Float64                 CODEC(ZSTD(1)),
+    ts        DateTime64(3)           CODEC(DoubleDelta, ZSTD(1)),
+    version   UInt64 DEFAULT toUnixTimestamp64Milli(now64(3)) CODEC(DoubleDelta, ZSTD(1))
+)
+ENGINE = ReplacingMergeTree(version)
+PARTITION BY toYYYYMM(ts)
+ORDER BY (symbol, market, ts, granularity);
@@ -0,0 +1,16 @@
+-- bars.granularity: Auflösung der Backfill-Kerze ('1m', '1h', ...), gleicher Schlüssel
+-- wie in backfill_jobs und bar_coverage
+-- - bisher landeten Spot- und Futures-Kerzen aller Auflösungen ununterscheidbar in bars;
+--   Coverage-Index (core/coverage.py) und /ohlc-Fallback filtern jetzt darauf
+-- - Teil des Sortierschlüssels: unter v3 (ReplacingMergeTree) fielen 1m- und 1h-Kerze mit
+--   gleichem ts sonst zu einer Zeile zusammen. ClickHouse erlaubt nur das Anhängen einer
+--   im selben ALTER angelegten Spalte, daher (symbol, market, ts, granularity)
+-- - Altbestand bekommt '' (unbekannt): zählt nicht als abgedeckt und wird vom
+--   /ohlc-Fallback nicht ausgeliefert, ein erneuter Backfill schreibt ihn mit Auflösung
+--
+-- Die App erkennt die Spalte beim Start (db/clickhouse.py: detect_schema); ohne sie
+-- schreibt der Writer bars wie bisher.
+
+ALTER TABLE bars
+    ADD COLUMN IF NOT EXISTS granularity LowCardinality(String) DEFAULT '' AFTER market,
+    MODIFY ORDER BY (symbol, market, ts, granularity);
@@ -0,0 +1,9 @@
+-- trades.trade_id: Ingest-ID des Writers statt Inhalts-Hash (siehe 20250707_tick_schema_v3_dedup.sql)
+-- Nur für Datenbanken, deren trades mit der ersten Fassung von 20250707 auf v3 umgestellt wurden
+-- (trade_id MATERIALIZED cityHash64(ts, price, size, side)): der Hash ließ identische Prints in
+-- derselben ms beim Merge zusammenfallen. Bestehende Zeilen behalten ihren Hash, schon
+-- zusammengeführte Prints lassen sich nicht wiederherstellen; neue Inserts liefern trade_id selbst.
+--
+-- python -m db.migrate_tick_schema --schema v3 wendet die Datei an, wenn trades schon v3 ist
+
+ALTER TABLE trades MODIFY COLUMN trade_id UInt64 DEFAULT bitOr(rand64(), 9223372036854775808) CODEC(ZSTD(1));
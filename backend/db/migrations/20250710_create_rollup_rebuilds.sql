@@ -0,0 +1,14 @@
+-- Neu aufgebaute Rollup-Partitionen (db/compaction.py: rebuild_rollups)
+-- Eine Zeile je Partition: YYYYMM für ohlc_1s/1m/5m, YYYY für ohlc_1h/1d (PARTITION BY toYear).
+-- Der Compaction-Scheduler lädt sie beim Start, damit ein Neustart abgeschlossene Monate
+-- nicht erneut aufbaut; ReplacingMergeTree(rebuilt_at) behält den neuesten Lauf.
+-- Die Staging-Tabellen ohlc_*_rebuild legt rebuild_rollups selbst an (CREATE TABLE ... AS ohlc_*).
+
+-- Table: rollup_rebuilds
+CREATE TABLE IF NOT EXISTS rollup_rebuilds (
+    partition    String,
+    buckets      UInt64,
+    rebuilt_at   DateTime64(3)
+)
+ENGINE = ReplacingMergeTree(rebuilt_at)
+ORDER BY partition;
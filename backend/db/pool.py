@@ -0,0 +1,193 @@
+import logging
+import queue
+import threading
+import time
+from contextlib import contextmanager
+from typing import Optional
+
+import clickhouse_connect
+from clickhouse_connect.driver import httputil
+from clickhouse_connect.driver.exceptions import OperationalError
+
+from core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class PoolTimeout(Exception):
+    """Kein ClickHouse-Client innerhalb von CH_POOL_TIMEOUT frei geworden"""
+
+
+class _PooledClient:
+    __slots__ = ("client", "last_used", "last_checked")
+
+    def __init__(self, client):
+        self.client = client
+        self.last_used = time.monotonic()
+        self.last_checked = self.last_used
+
+
+class ClickHousePool:
+    """
+    Prozessweiter Pool langlebiger clickhouse_connect-Clients.
+    - feste Maximalgröße (CH_POOL_SIZE), Clients werden lazy erzeugt
+    - Keep-Alive über einen gemeinsamen urllib3-PoolManager
+    - Health-Check (ping) vor Wiederverwendung, wenn ein Client länger idle war
+    - Per-Query-Timeout über max_execution_time + send_receive_timeout
+    Thread-safe, damit er auch aus Executor-Threads genutzt werden kann.
+    """
+    def __init__(
+        self,
+        size: int = settings.CH_POOL_SIZE,
+        checkout_timeout: float = settings.CH_POOL_TIMEOUT,
+        healthcheck_interval: float = settings.CH_HEALTHCHECK_INTERVAL,
+    ):
+        self.size = size
+        self.checkout_timeout = checkout_timeout
+        self.healthcheck_interval = healthcheck_interval
+        self._idle: "queue.LifoQueue[_PooledClient]" = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._created = 0
+        self._pool_mgr = None
+        # Metriken
+        self.metrics = {
+            "checkouts": 0,
+            "checkout_timeouts": 0,
+            "clients_created": 0,
+            "clients_discarded": 0,
+            "healthchecks": 0,
+            "wait_ms_total": 0.0,
+            "wait_ms_max": 0.0,
+        }
+
+    def _create_client(self):
+        if self._pool_mgr is None:
+            self._pool_mgr = httputil.get_pool_manager(
+                keep_interval=settings.CH_KEEPALIVE,
+                maxsize=self.size,
+                num_pools=1,
+            )
+        client = clickhouse_connect.get_client(
+            host=settings.CH_HOST,
+            port=settings.CH_PORT,
+            username=settings.CH_USER,
+            password=settings.CH_PASSWORD,
+            database=settings.CH_DATABASE,
+            connect_timeout=settings.CH_CONNECT_TIMEOUT,
+            send_receive_timeout=settings.CH_QUERY_TIMEOUT + settings.CH_CONNECT_TIMEOUT,
+            settings={"max_execution_time": settings.CH_QUERY_TIMEOUT},
+            pool_mgr=self._pool_mgr,
+        )
+        self.metrics["clients_created"] += 1
+        return _PooledClient(client)
+
+    def _checkout(self) -> _PooledClient:
+        start = time.monotonic()
+        pooled: Optional[_PooledClient] = None
+        try:
+            pooled = self._idle.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                can_create = self._created < self.size
+                if can_create:
+                    self._created += 1
+            if can_create:
+                try:
+                    pooled = self._create_client()
+                except Exception:
+                    with self._lock:
+                        self._created -= 1
+                    raise
+            else:
+                try:
+                    pooled = self._idle.get(timeout=self.checkout_timeout)
+                except queue.Empty:
+                    self.metrics["checkout_timeouts"] += 1
+                    raise PoolTimeout(f"No ClickHouse client available after {self.checkout_timeout}s (size={self.size})")
+
+        waited_ms = (time.monotonic() - start) * 1000
+        self.metrics["checkouts"] += 1
+        self.metrics["wait_ms_total"] += waited_ms
+        self.metrics["wait_ms_max"] = max(self.metrics["wait_ms_max"], waited_ms)
+
+        # Health-Check nur, wenn der Client länger ungenutzt war
+        if time.monotonic() - pooled.last_checked > self.healthcheck_interval:
+            self.metrics["healthchecks"] += 1
+            if not pooled.client.ping():
+                logger.warning("Discarding unhealthy ClickHouse client")
+                self._discard(pooled)
+                with self._lock:
+                    self._created += 1
+                try:
+                    pooled = self._create_client()
+                except Exception:
+                    with self._lock:
+                        self._created -= 1
+                    raise
+            pooled.last_checked = time.monotonic()
+        return pooled
+
+    def _checkin(self, pooled: _PooledClient):
+        pooled.last_used = time.monotonic()
+        self._idle.put(pooled)
+
+    def _discard(self, pooled: _PooledClient):
+        with self._lock:
+            self._created -= 1
+        self.metrics["clients_discarded"] += 1
+        try:
+            pooled.client.close()
+        except Exception:
+            pass
+
+    @contextmanager
+    def connection(self):
+        """
+        Leiht einen Client aus dem Pool: `with pool.connection() as client: ...`
+        Bei Verbindungsfehlern wird der Client verworfen statt zurückgegeben.
+        """
+        pooled = self._checkout()
+        try:
+            yield pooled.client
+        except Exception as e:
+            if isinstance(e, OperationalError):
+                self._discard(pooled)
+            else:
+                self._checkin(pooled)
+            raise
+        else:
+            self._checkin(pooled)
+
+    def close(self):
+        """Schließt alle freien Clients (z. B. beim Shutdown)"""
+        while True:
+            try:
+                pooled = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._discard(pooled)
+
+    def get_metrics(self) -> dict:
+        """Checkout-Zähler und Wartezeiten für Monitoring"""
+        checkouts = self.metrics["checkouts"]
+        idle = self._idle.qsize()
+        return {
+            **self.metrics,
+            "wait_ms_avg": self.metrics["wait_ms_total"] / checkouts if checkouts else 0.0,
+            "size": self.size,
+            "open": self._created,
+            "idle": idle,
+            "in_use": self._created - idle,
+        }
+
+
+# Globale Pool-Instanz für alle Module
+clickhouse_pool = ClickHousePool()
+
+
+def get_client():
+    """
+    Client aus dem prozessweiten Pool leihen.
+    Nutzung: `with get_client() as client: client.query(...)`
+    """
+    return clickhouse_pool.connection()
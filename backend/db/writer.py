@@ -0,0 +1,367 @@
+import asyncio
+import itertools
+import logging
+import os
+import random
+import re
+import struct
+import time
+import traceback
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional, Union
+
+import orjson
+from clickhouse_connect.driver.exceptions import DatabaseError, DataError, OperationalError, ProgrammingError
+
+from core.config import settings
+from db.clickhouse import insert_columns, schema_features, TRADE_INSERT_COLUMNS, BAR_INSERT_COLUMNS, CANDLE_COLUMNS
+
+logger = logging.getLogger(__name__)
+
+# ClickHouse-Fehlercodes, die sich von selbst erledigen (Last, Netzwerk, Timeouts, Merges)
+_TRANSIENT_CODES = {3, 32, 159, 202, 209, 210, 241, 242, 252, 394, 425, 999}
+_CODE = re.compile(r"Code: (\d+)")
+
+# Ingest-IDs für trades.trade_id (Tick-Schema v3): oberstes Bit, Zufallskennung je Prozess, Zähler.
+# Vergeben beim Puffern, damit ein wiederholter Insert desselben Batches dieselben IDs trägt.
+_INGEST_PREFIX = (1 << 63) | (random.getrandbits(31) << 32)
+_ingest_seq = itertools.count()
+
+
+def next_ingest_id() -> int:
+    return _INGEST_PREFIX | (next(_ingest_seq) & 0xFFFFFFFF)
+
+
+def _to_datetime(ts: Union[str, datetime]) -> datetime:
+    """ISO-String oder datetime -> tz-aware UTC datetime"""
+    if isinstance(ts, str):
+        ts = datetime.fromisoformat(ts.rstrip("Z"))
+    if ts.tzinfo is None:
+        ts = ts.replace(tzinfo=timezone.utc)
+    return ts
+
+
+def _is_permanent(e: Exception) -> bool:
+    """Fehler, die kein erneuter Versuch behebt (Poison-Batch: Typ, Konvertierung, Schema)"""
+    if isinstance(e, (TypeError, ValueError, OverflowError, struct.error)):
+        return True
+    if isinstance(e, OperationalError):
+        return False  # Verbindung/Timeout
+    if isinstance(e, (DataError, ProgrammingError)):
+        return True
+    if isinstance(e, DatabaseError):
+        code = _CODE.search(str(e))
+        return code is not None and int(code.group(1)) not in _TRANSIENT_CODES
+    return False
+
+
+class _FailedBatch:
+    """Fehlgeschlagener Batch, der nach retry_at (monotonic) erneut geschrieben wird"""
+    __slots__ = ("columns", "rows", "attempts", "retry_at")
+
+    def __init__(self, columns: List[list], rows: int, attempts: int, retry_at: float):
+        self.columns = columns
+        self.rows = rows
+        self.attempts = attempts
+        self.retry_at = retry_at
+
+
+class _ColumnBuffer:
+    """
+    Spaltenweiser Puffer für eine Tabelle (eine Python-Liste pro Spalte).
+    """
+    def __init__(self, table: str, column_names: List[str]):
+        self.table = table
+        self.column_names = column_names
+        self.columns: List[list] = [[] for _ in column_names]
+        self.rows = 0
+        self.failed: Optional[_FailedBatch] = None  # wird vor den neuen Zeilen geschrieben
+
+    def append(self, row: tuple):
+        for column, value in zip(self.columns, row):
+            column.append(value)
+        self.rows += 1
+
+    def drain(self):
+        """Gibt die gepufferten Spalten zurück und leert den Puffer"""
+        columns, rows = self.columns, self.rows
+        self.columns = [[] for _ in self.column_names]
+        self.rows = 0
+        return columns, rows
+
+    @property
+    def pending(self) -> int:
+        return self.rows + (self.failed.rows if self.failed else 0)
+
+
+class ClickHouseBatchWriter:
+    """
+    Asynchroner, gepufferter Writer für trades, bars und candles.
+    Sammelt Zeilen spaltenweise je Tabelle und schreibt sie mit einem einzigen
+    client.insert, sobald max_rows oder flush_interval_ms erreicht ist.
+    Liegen mehr als max_pending_rows Zeilen unverarbeitet vor, warten die
+    Produzenten (Backpressure), bis ClickHouse wieder aufgeholt hat.
+    Flush-Listener (add_flush_listener) sehen jeden erfolgreich geschriebenen Batch.
+    Fehlgeschlagene Batches wartet je Tabelle ein Backoff ab (die anderen Tabellen laufen weiter);
+    dauerhafte Fehler, zu viele Versuche oder ein Fehler beim Stoppen schreiben den Batch ins
+    Dead-Letter-Verzeichnis statt ihn endlos zu wiederholen oder zu verlieren.
+    """
+    def __init__(
+        self,
+        max_rows: int = 10000,
+        flush_interval_ms: int = 1000,
+        max_pending_rows: int = 200000,
+        max_retries: int = settings.WRITER_MAX_RETRIES,
+        retry_backoff_max: float = settings.WRITER_RETRY_BACKOFF_MAX,
+        dead_letter_dir: str = settings.WRITER_DEAD_LETTER_DIR,
+    ):
+        self.max_rows = max_rows
+        self.flush_interval_ms = flush_interval_ms
+        self.max_pending_rows = max_pending_rows
+        self.max_retries = max(1, max_retries)
+        self.retry_backoff_max = retry_backoff_max
+        self.dead_letter_dir = dead_letter_dir
+        self._buffers: Dict[str, _ColumnBuffer] = {
+            "trades": _ColumnBuffer("trades", TRADE_INSERT_COLUMNS),
+            "bars": _ColumnBuffer("bars", BAR_INSERT_COLUMNS),
+            "candles": _ColumnBuffer("candles", CANDLE_COLUMNS),
+        }
+        self._listeners: Dict[str, List[Callable]] = {}
+        self._in_flight = 0
+        self._flush_lock = asyncio.Lock()
+        self._flush_event: Optional[asyncio.Event] = None
+        self._space: Optional[asyncio.Condition] = None
+        self._flush_task: Optional[asyncio.Task] = None
+        self._running = False
+        self._started_at = time.time()
+        # Metriken
+        self.metrics = {
+            "rows_buffered": 0,
+            "rows_written": 0,
+            "flushes": 0,
+            "flush_errors": 0,
+            "flush_retries": 0,
+            "batches_dead_lettered": 0,
+            "rows_dead_lettered": 0,
+            "rows_dropped": 0,
+            "backpressure_waits": 0,
+            "last_flush_ms": 0.0,
+            "max_flush_ms": 0.0,
+            "total_flush_ms": 0.0,
+        }
+
+    async def start(self):
+        """Startet den Flush-Task"""
+        if self._running:
+            return
+        self._flush_event = asyncio.Event()
+        self._space = asyncio.Condition()
+        self._running = True
+        self._started_at = time.time()
+        self._flush_task = asyncio.create_task(self._flush_loop())
+        logger.info(f"Batch writer started (max_rows={self.max_rows}, flush_interval={self.flush_interval_ms}ms, max_pending={self.max_pending_rows})")
+
+    async def stop(self):
+        """Stoppt den Flush-Task und schreibt alle Restdaten (was nicht mehr geht, ins Dead-Letter-Verzeichnis)"""
+        if not self._running:
+            return
+        self._running = False
+        self._flush_event.set()
+        if self._flush_task:
+            await self._flush_task
+        await self.flush()
+        logger.info(f"Batch writer stopped. Total rows written: {self.metrics['rows_written']}")
+
+    def add_flush_listener(self, table: str, listener: Callable[[List[str], List[list]], None]):
+        """listener(column_names, columns) nach jedem erfolgreichen Insert in table"""
+        self._listeners.setdefault(table, []).append(listener)
+
+    def pending_rows(self) -> int:
+        return sum(b.pending for b in self._buffers.values()) + self._in_flight
+
+    # --- Produzenten-API ---
+    async def add_trade(
+        self,
+        symbol: str,
+        market: str,
+        price: float,
+        size: float,
+        side: str,
+        ts: Union[str, datetime],
+    ):
+        await self._add("trades", (symbol, market, float(price), float(size), side, _to_datetime(ts), next_ingest_id()))
+
+    async def add_bar(
+        self,
+        symbol: str,
+        market: str,
+        open_: float,
+        high: float,
+        low: float,
+        close: float,
+        volume: float,
+        ts: Union[str, datetime],
+        granularity: str = "",
+    ):
+        await self._add("bars", (symbol, market, float(open_), float(high), float(low), float(close), float(volume),
+                                 _to_datetime(ts), granularity))
+
+    async def add_candle(
+        self,
+        symbol: str,
+        market: str,
+        resolution: int,
+        ts: Union[str, datetime],
+        open_: float,
+        high: float,
+        low: float,
+        close: float,
+        volume: float,
+        trade_count: int,
+    ):
+        await self._add("candles", (symbol, market, int(resolution), _to_datetime(ts), float(open_), float(high),
+                                    float(low), float(close), float(volume), int(trade_count)))
+
+    async def _add(self, table: str, row: tuple):
+        if not self._running:
+            await self.start()
+        # Backpressure: warten, bis der Flush-Task Platz geschaffen hat
+        if self.pending_rows() >= self.max_pending_rows:
+            self.metrics["backpressure_waits"] += 1
+            async with self._space:
+                await self._space.wait_for(lambda: self.pending_rows() < self.max_pending_rows or not self._running)
+        buffer = self._buffers[table]
+        buffer.append(row)
+        self.metrics["rows_buffered"] += 1
+        if buffer.rows >= self.max_rows:
+            self._flush_event.set()
+
+    # --- Flush ---
+    async def _flush_loop(self):
+        while self._running:
+            try:
+                try:
+                    await asyncio.wait_for(self._flush_event.wait(), timeout=self.flush_interval_ms / 1000.0)
+                except asyncio.TimeoutError:
+                    pass
+                self._flush_event.clear()
+                async with self._flush_lock:
+                    await self._flush_buffers(respect_backoff=True)
+            except Exception as e:
+                logger.error(f"Error in batch writer loop: {e}")
+                traceback.print_exc()
+                await asyncio.sleep(1)
+
+    async def flush(self):
+        """
+        Schreibt alle Puffer mit je einem client.insert nach ClickHouse.
+        Serialisiert: kehrt flush() zurück, ist alles vor dem Aufruf Gepufferte geschrieben
+        (oder flush_errors wurde erhöht) – darauf bauen die Backfill-Checkpoints auf.
+        Wiederholt fehlgeschlagene Batches sofort, ohne ihr Backoff abzuwarten.
+        """
+        async with self._flush_lock:
+            await self._flush_buffers()
+
+    async def _flush_buffers(self, respect_backoff: bool = False):
+        now = time.monotonic()
+        for buffer in self._buffers.values():
+            failed = buffer.failed
+            if failed is not None:
+                if respect_backoff and failed.retry_at > now:
+                    continue
+                buffer.failed = None
+                self.metrics["flush_retries"] += 1
+                if not await self._write(buffer, failed.columns, failed.rows, failed.attempts):
+                    continue  # neue Zeilen warten hinter dem fehlgeschlagenen Batch
+            if buffer.rows:
+                columns, rows = buffer.drain()
+                await self._write(buffer, columns, rows, 0)
+
+    async def _write(self, buffer: _ColumnBuffer, columns: List[list], rows: int, attempts: int) -> bool:
+        column_names, values = buffer.column_names, columns
+        if (buffer.table == "bars" and not schema_features["bar_granularity"]
+                or buffer.table == "trades" and not schema_features["trade_id"]):
+            # ohne granularity- bzw. trade_id-Spalte (Migration 20250708 bzw. v3 fehlt): wie bisher schreiben
+            column_names, values = column_names[:-1], columns[:-1]
+        self._in_flight += rows
+        start = time.perf_counter()
+        try:
+            await asyncio.to_thread(insert_columns, buffer.table, column_names, values)
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            self.metrics["rows_written"] += rows
+            self.metrics["flushes"] += 1
+            self.metrics["last_flush_ms"] = elapsed_ms
+            self.metrics["max_flush_ms"] = max(self.metrics["max_flush_ms"], elapsed_ms)
+            self.metrics["total_flush_ms"] += elapsed_ms
+            self._notify(buffer.table, buffer.column_names, columns)
+            return True
+        except Exception as e:
+            attempts += 1
+            self.metrics["flush_errors"] += 1
+            permanent = _is_permanent(e)
+            logger.error(f"Flush of {rows} rows into {buffer.table} failed "
+                         f"({'permanent' if permanent else f'attempt {attempts}/{self.max_retries}'}): {e}")
+            if permanent or attempts >= self.max_retries or not self._running:
+                await self._dead_letter(buffer.table, buffer.column_names, columns, rows, attempts, e)
+            else:
+                # Backoff nur für diese Tabelle; der Flush-Loop versucht es nach retry_at erneut
+                delay = min(self.retry_backoff_max, self.flush_interval_ms / 1000.0 * 2 ** (attempts - 1))
+                buffer.failed = _FailedBatch(columns, rows, attempts, time.monotonic() + delay)
+            return False
+        finally:
+            self._in_flight -= rows
+            async with self._space:
+                self._space.notify_all()
+
+    async def _dead_letter(self, table: str, column_names: List[str], columns: List[list], rows: int,
+                           attempts: int, error: Exception):
+        """Batch als JSON ablegen (zum späteren Nachladen); ohne Verzeichnis nur verwerfen"""
+        if self.dead_letter_dir:
+            stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S%f")
+            path = os.path.join(self.dead_letter_dir, f"{table}-{stamp}.json")
+            payload = {"table": table, "columns": column_names, "error": str(error), "attempts": attempts,
+                       "rows": [list(row) for row in zip(*columns)]}
+            try:
+                await asyncio.to_thread(_write_json, path, payload)
+                self.metrics["batches_dead_lettered"] += 1
+                self.metrics["rows_dead_lettered"] += rows
+                logger.error(f"Dead-lettered {rows} rows for {table} to {path}")
+                return
+            except Exception as e:
+                logger.error(f"Dead-lettering {rows} rows for {table} failed: {e}")
+        self.metrics["rows_dropped"] += rows
+        logger.error(f"Dropped {rows} rows for {table} after {attempts} attempts: {error}")
+
+    def _notify(self, table: str, column_names: List[str], columns: List[list]):
+        for listener in self._listeners.get(table, ()):
+            try:
+                listener(column_names, columns)
+            except Exception as e:
+                logger.error(f"Flush listener for {table} failed: {e}")
+                traceback.print_exc()
+
+    def get_metrics(self) -> dict:
+        """Flush-Latenz, Durchsatz und Pufferfüllstand für Monitoring"""
+        uptime = max(time.time() - self._started_at, 1e-9)
+        flushes = self.metrics["flushes"]
+        return {
+            **self.metrics,
+            "avg_flush_ms": self.metrics["total_flush_ms"] / flushes if flushes else 0.0,
+            "rows_per_sec": self.metrics["rows_written"] / uptime,
+            "buffer_depth": {name: b.pending for name, b in self._buffers.items()},
+            "retrying": {name: b.failed.attempts for name, b in self._buffers.items() if b.failed},
+            "pending_rows": self.pending_rows(),
+            "max_rows": self.max_rows,
+            "flush_interval_ms": self.flush_interval_ms,
+            "max_pending_rows": self.max_pending_rows,
+        }
+
+
+def _write_json(path: str, payload: dict):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(orjson.dumps(payload))
+
+
+# Globale Writer-Instanz (Start/Stop über FastAPI-Lifecycle in core/main.py)
+batch_writer = ClickHouseBatchWriter()
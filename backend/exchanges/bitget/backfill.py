@@ -1,10 +1,14 @@
 import asyncio
-import httpx
 import logging
-from datetime import datetime, timezone
-from typing import List
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, List, Optional, Tuple
 
-from db.clickhouse import insert_bar  # Import der zentralen DB-Funktion
+from core.config import settings
+from core.utils.time import parse_resolution
+from db.writer import batch_writer  # Gepufferter, spaltenweiser DB-Writer
+from exchanges.bitget.rest_client import bitget_rest
+from exchanges.bitget.rest_utils import FUTURES_MARKETS, MIX_HISTORY_CANDLES, futures_candles_params
 
 logger = logging.getLogger("bitget-backfill")
 
@@ -12,84 +16,158 @@ class BitgetBackfill:
     """
     Stellt rückwirkenden Datenimport (Backfill) für Kerzen sicher,
     strikt nach Rate‐Limit und Paging für Bitget V2-API.
+    Spot über HISTORY_ENDPOINT, Futures (usdtm, coinm, usdcm) über MIX_HISTORY_CANDLES.
+    Requests laufen über den gemeinsamen REST-Client (exchanges/bitget/rest_client.py:
+    Verbindungspool, Token-Bucket je Endpoint, Retries inkl. 429), eine Instanz kann von
+    vielen Tasks parallel genutzt werden.
     """
-    BASE_URL = "https://api.bitget.com"
     HISTORY_ENDPOINT = "/api/v2/spot/public/candles"
-    MAX_REQS_PER_SEC = 15
 
     def __init__(self):
-        self.client = httpx.AsyncClient(base_url=self.BASE_URL)
-        self._sem = asyncio.Semaphore(self.MAX_REQS_PER_SEC)
-        self._delay = 1.0 / self.MAX_REQS_PER_SEC
+        self.pages = 0
+        self.bars = 0
 
     async def history(
         self,
         symbol: str,
         until: datetime,
         granularity: str = "1m",
-        limit: int = 200
-    ):
+        limit: int = 200,
+        end: Optional[datetime] = None,
+        cursor_ms: Optional[int] = None,
+        on_page: Optional[Callable[[int, int], None]] = None,
+        market: str = "spot",
+        on_exhausted: Optional[Callable[[int], None]] = None,
+    ) -> int:
         """
-        Lädt rückwirkend Kerzen von jetzt bis `until` und persistiert sie in ClickHouse.
+        Lädt rückwirkend Kerzen von `end` (Default: jetzt) bis `until` und persistiert sie in ClickHouse.
         Paging anhand Timestamp, Abbruch, wenn keine Daten mehr.
+        cursor_ms setzt eine unterbrochene Scheibe fort (endTime der nächsten Seite);
+        on_page(cursor_ms, rows) wird nach jeder an den Writer übergebenen Seite aufgerufen.
+        Endet das Paging mit einer leeren Seite vor `until`, bekommt on_exhausted(cursor_ms) das
+        endTime dieser Seite: ob davor wirklich nichts existiert, ist damit nicht gesagt.
+        Gibt die Zahl der geschriebenen Kerzen zurück; bars.market/bars.granularity sind die übergebenen Werte.
         """
+        if market != "spot" and market not in FUTURES_MARKETS:
+            raise ValueError(f"Unbekannter market: {market!r}")
         now_ms   = int(datetime.now(timezone.utc).timestamp() * 1000)
         until_ms = int(until.timestamp() * 1000)
-        end_ts   = now_ms
+        # `end` ist exklusiv (gehört zur nächstneueren Zeitscheibe)
+        end_ts   = int(end.timestamp() * 1000) - 1 if end else now_ms
+        if cursor_ms is not None:
+            end_ts = min(end_ts, cursor_ms)
+        written = 0
 
         while end_ts > until_ms:
-            # V2-API: symbol muss in 'btc_usdt' Form, period statt granularity
-            api_symbol = symbol.replace("USDT", "_usdt").lower()
-            params = {
-                "symbol":  api_symbol,
-                "period":  granularity,
-                "endTime": end_ts,
-                "limit":   limit,
-            }
-
-            async with self._sem:
-                resp = await self.client.get(self.HISTORY_ENDPOINT, params=params)
-
-            if resp.status_code == 429:
-                logger.warning(f"[BitgetBackfill] Rate-Limit für {symbol} erreicht, warte 1s...")
-                await asyncio.sleep(1)
-                continue
-
-            resp.raise_for_status()
+            if market == "spot":
+                # V2-API: symbol muss in 'btc_usdt' Form, period statt granularity
+                api_symbol = symbol.replace("USDT", "_usdt").lower()
+                endpoint = self.HISTORY_ENDPOINT
+                params = {
+                    "symbol":  api_symbol,
+                    "period":  granularity,
+                    "endTime": end_ts,
+                    "limit":   limit,
+                }
+            else:
+                endpoint = MIX_HISTORY_CANDLES
+                params = futures_candles_params(symbol, market, granularity, end_ts, limit)
+
+            resp = await bitget_rest.get(endpoint, params=params)
             data = resp.json().get("data", [])
+            self.pages += 1
             if not data:
-                logger.info(f"[BitgetBackfill] Keine Daten mehr für {symbol}. Beende.")
+                logger.info(f"[BitgetBackfill] Keine Daten mehr für {symbol}/{market} vor {end_ts}. Beende.")
+                if on_exhausted:
+                    on_exhausted(end_ts)
                 break
 
-            # Persistiere jede Kerze
-            for ts_ms, o, h, l, c, v in data:
-                dt_obj = datetime.fromtimestamp(ts_ms / 1000, tz=timezone.utc)
-                insert_bar(symbol, "spot", float(o), float(h), float(l), float(c), float(v), dt_obj)
+            # Kerzen an den Batch-Writer übergeben (gebündelter Insert); Zeilen vor `until`
+            # gehören zur nächsten Zeitscheibe und werden dort geschrieben
+            rows = 0
+            for row in data:
+                ts_ms, o, h, l, c, v = row[:6]
+                if int(ts_ms) < until_ms:
+                    continue
+                dt_obj = datetime.fromtimestamp(int(ts_ms) / 1000, tz=timezone.utc)
+                await batch_writer.add_bar(symbol, market, float(o), float(h), float(l), float(c), float(v), dt_obj,
+                                           granularity=granularity)
+                rows += 1
+            self.bars += rows
+            written += rows
 
             # Setze neues Ende auf den kleinsten Timestamp minus 1 ms
-            end_ts = min(item[0] for item in data) - 1
-            logger.info(f"[BitgetBackfill] {symbol}: bis {end_ts} weiter gefüllt")
-            await asyncio.sleep(self._delay)
+            end_ts = min(int(item[0]) for item in data) - 1
+            if on_page:
+                on_page(end_ts, rows)
+            logger.debug(f"[BitgetBackfill] {symbol}/{market}: bis {end_ts} weiter gefüllt")
+
+        logger.debug(f"[BitgetBackfill] Fertig mit {symbol}/{market} bis {until.isoformat()}")
+        return written
+
 
-        logger.info(f"[BitgetBackfill] Fertig mit {symbol} bis {until.isoformat()}")
+def time_slices(until: datetime, end: datetime, slice_span: Optional[timedelta]) -> List[Tuple[datetime, datetime]]:
+    """Zerlegt [until, end) in Scheiben (neueste zuerst); ohne slice_span eine einzige Scheibe"""
+    if not slice_span or slice_span.total_seconds() <= 0:
+        return [(until, end)]
+    slices = []
+    hi = end
+    while hi > until:
+        lo = max(until, hi - slice_span)
+        slices.append((lo, hi))
+        hi = lo
+    return slices
 
-    async def close(self):
-        await self.client.aclose()
 
 async def backfill_symbols(
     symbols: List[str],
     until: datetime,
     granularity: str = "1m",
-    limit: int = 200
-):
+    limit: int = 200,
+    concurrency: Optional[int] = None,
+    pages_per_slice: Optional[int] = None,
+    market: str = "spot",
+) -> Dict[str, dict]:
     """
-    Führt den Backfill für eine Liste von Symbolen aus.
+    Führt den Backfill für eine Liste von Symbolen parallel aus.
+    Jeder Zeitraum wird in Scheiben zu pages_per_slice Seiten zerlegt; ein Pool aus
+    `concurrency` Workern arbeitet alle (Symbol, Scheibe)-Paare ab. Wie schnell das geht,
+    bestimmt allein der Token-Bucket des Endpoints – nicht die Zahl der Symbole.
     """
-    manager = BitgetBackfill()
+    concurrency = concurrency or settings.BACKFILL_CONCURRENCY
+    pages_per_slice = pages_per_slice or settings.BACKFILL_PAGES_PER_SLICE
+    end = datetime.now(timezone.utc)
+    try:
+        slice_span = timedelta(seconds=parse_resolution(granularity) * limit * pages_per_slice)
+    except ValueError:
+        slice_span = None  # unbekanntes Format -> Symbol am Stück pagen
+
+    work: asyncio.Queue = asyncio.Queue()
     for symbol in symbols:
-        logger.info(f"[BitgetBackfill] Starte für {symbol} bis {until.isoformat()}")
-        try:
-            await manager.history(symbol, until, granularity, limit)
-        except Exception as e:
-            logger.error(f"[BitgetBackfill] Fehler beim Backfill von {symbol}: {e}")
-    await manager.close()
+        for lo, hi in time_slices(until, end, slice_span):
+            work.put_nowait((symbol, lo, hi))
+    results: Dict[str, dict] = {s: {"slices": 0, "errors": 0} for s in symbols}
+    total = work.qsize()
+    started = time.perf_counter()
+    logger.info(f"[BitgetBackfill] {len(symbols)} Symbole, {total} Zeitscheiben bis {until.isoformat()}, {concurrency} Worker")
+
+    manager = BitgetBackfill()
+
+    async def worker():
+        while True:
+            try:
+                symbol, lo, hi = work.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            try:
+                await manager.history(symbol, lo, granularity, limit, end=hi, market=market)
+                results[symbol]["slices"] += 1
+            except Exception as e:
+                results[symbol]["errors"] += 1
+                logger.error(f"[BitgetBackfill] Fehler beim Backfill von {symbol} ({lo.isoformat()}..{hi.isoformat()}): {e}")
+
+    await asyncio.gather(*(worker() for _ in range(min(concurrency, total) or 1)))
+    elapsed = time.perf_counter() - started
+    logger.info(f"[BitgetBackfill] Fertig: {total} Scheiben, {manager.pages} Seiten, {manager.bars} Kerzen "
+                f"in {elapsed:.1f}s ({manager.pages / max(elapsed, 1e-9):.1f} req/s)")
+    return results
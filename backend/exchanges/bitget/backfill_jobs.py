@@ -0,0 +1,513 @@
+"""
+Backfill-Jobs: persistente, fortsetzbare Kerzen-Backfills mit begrenztem Scheduler.
+
+- Ein Job lädt [start, end) für (symbol, market, granularity) und ist in Zeitscheiben
+  zerlegt (BACKFILL_PAGES_PER_SLICE Seiten je Scheibe, siehe backfill.py).
+- Überlappende Anfragen werden dedupliziert: angelegt wird nur, was weder ein
+  laufender, wartender oder fertiger Job noch der Coverage-Index (core/coverage.py) abdeckt.
+- Ein Pool aus BACKFILL_CONCURRENCY Workern arbeitet die Scheiben aller Jobs ab,
+  gedrosselt vom gemeinsamen Token-Bucket des Endpoints.
+- Jobs und Scheiben-Checkpoints liegen in ClickHouse (backfill_jobs/backfill_slices).
+  Ein Checkpoint wird erst geschrieben, nachdem der Batch-Writer alle bis dahin
+  gepufferten Kerzen geflusht hat; nach einem Neustart läuft jede Scheibe ab der
+  letzten gesicherten Seite weiter. Gesicherte Seitenbereiche gehen in den Coverage-Index.
+"""
+import asyncio
+import logging
+import random
+import time
+import traceback
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+
+from core.config import settings
+from core.coverage import coverage_index, step_ms
+from core.utils.time import parse_resolution
+from db.clickhouse import (
+    run_db, insert_rows, fetch_backfill_jobs, fetch_backfill_slices,
+    BACKFILL_JOB_COLUMNS, BACKFILL_SLICE_COLUMNS,
+)
+from db.writer import batch_writer
+from exchanges.bitget.backfill import BitgetBackfill, time_slices
+from exchanges.bitget.rest_utils import FUTURES_MARKETS, fetch_listing_ms
+
+logger = logging.getLogger("bitget-backfill")
+
+ACTIVE = ("queued", "running")
+FINISHED = ("done", "failed", "cancelled")
+COVERING = ("queued", "running", "done")  # diese Jobs decken ihren Zeitraum ab
+
+
+def _ms(dt: datetime) -> int:
+    return int(dt.timestamp() * 1000)
+
+
+def _dt(ms: int) -> datetime:
+    return datetime.fromtimestamp(ms / 1000, tz=timezone.utc)
+
+
+def _utc(dt: datetime) -> datetime:
+    """ClickHouse liefert DateTime naiv (UTC) zurück"""
+    return dt.replace(tzinfo=timezone.utc) if dt.tzinfo is None else dt.astimezone(timezone.utc)
+
+
+def uncovered(start: datetime, end: datetime, covered: List[Tuple[datetime, datetime]]) -> List[Tuple[datetime, datetime]]:
+    """Teile von [start, end), die keines der Intervalle in covered abdeckt"""
+    gaps = []
+    cursor = start
+    for lo, hi in sorted(covered):
+        if hi <= cursor:
+            continue
+        if lo >= end:
+            break
+        if lo > cursor:
+            gaps.append((cursor, lo))
+        cursor = max(cursor, hi)
+        if cursor >= end:
+            break
+    if cursor < end:
+        gaps.append((cursor, end))
+    return gaps
+
+
+class BackfillSlice:
+    __slots__ = ("job_id", "slice_no", "lo", "hi", "cursor_ms", "rows", "pages", "status",
+                 "attempts", "error", "dirty")
+
+    def __init__(self, job_id: str, slice_no: int, lo: datetime, hi: datetime, cursor_ms: Optional[int] = None,
+                 rows: int = 0, pages: int = 0, status: str = "pending", attempts: int = 0, error: str = ""):
+        self.job_id = job_id
+        self.slice_no = slice_no
+        self.lo = lo
+        self.hi = hi
+        self.cursor_ms = _ms(hi) - 1 if cursor_ms is None else cursor_ms
+        self.rows = rows
+        self.pages = pages
+        self.status = status
+        self.attempts = attempts
+        self.error = error
+        self.dirty = True
+
+    def remaining_ms(self) -> int:
+        if self.status == "done":
+            return 0
+        return max(0, self.cursor_ms - _ms(self.lo) + 1)
+
+    def covered(self) -> Tuple[int, int]:
+        """
+        Belegter Teil [start, end) in ms: bis zur ältesten gelieferten Kerze; bis lo erst, wenn das
+        Paging lo erreicht hat oder vor dem Listing endete (_run_slice setzt dann cursor_ms = lo - 1)
+        """
+        return min(max(self.cursor_ms + 1, _ms(self.lo)), _ms(self.hi)), _ms(self.hi)
+
+    def row(self) -> tuple:
+        return (self.job_id, self.slice_no, self.lo, self.hi, self.cursor_ms, self.rows, self.pages,
+                self.status, self.attempts, self.error[:500], datetime.now(timezone.utc))
+
+
+class BackfillJob:
+    def __init__(self, job_id: str, symbol: str, market: str, granularity: str, start: datetime, end: datetime,
+                 status: str = "queued", created_at: Optional[datetime] = None, error: str = ""):
+        self.job_id = job_id
+        self.symbol = symbol
+        self.market = market
+        self.granularity = granularity
+        self.start = start
+        self.end = end
+        self.status = status
+        self.created_at = created_at or datetime.now(timezone.utc)
+        self.error = error
+        self.slices: List[BackfillSlice] = []
+        self.slices_total = 0
+        self.rows = 0  # aus backfill_jobs, solange die Scheiben nicht geladen sind
+        self.dirty = True
+        # Durchsatz seit dem (Wieder-)Start in diesem Prozess
+        self.run_started: Optional[float] = None
+        self.run_rows = 0
+        self.run_covered_ms = 0
+
+    @classmethod
+    def from_row(cls, row: dict) -> "BackfillJob":
+        job = cls(row["job_id"], row["symbol"], row["market"], row["granularity"], _utc(row["start_ts"]),
+                  _utc(row["end_ts"]), row["status"], _utc(row["created_at"]), row["error"])
+        job.slices_total = row["slices_total"]
+        job.rows = row["rows"]
+        job.dirty = False
+        return job
+
+    def key(self) -> Tuple[str, str, str]:
+        return self.symbol, self.market, self.granularity
+
+    def row(self) -> tuple:
+        return (self.job_id, self.symbol, self.market, self.granularity, self.start, self.end, self.status,
+                self.slices_total, self.total_rows(), self.error[:500], self.created_at, datetime.now(timezone.utc))
+
+    def total_rows(self) -> int:
+        return sum(s.rows for s in self.slices) if self.slices else self.rows
+
+    def progress(self) -> dict:
+        total_ms = max(_ms(self.end) - _ms(self.start), 1)
+        remaining_ms = sum(s.remaining_ms() for s in self.slices if s.status == "pending")
+        elapsed = time.monotonic() - self.run_started if self.run_started else 0.0
+        rows_per_s = self.run_rows / elapsed if elapsed > 0 else 0.0
+        eta_s = None
+        if self.status in ACTIVE and self.run_covered_ms > 0 and elapsed > 0:
+            eta_s = round(remaining_ms / (self.run_covered_ms / elapsed), 1)
+        return {
+            "job_id": self.job_id,
+            "symbol": self.symbol,
+            "market": self.market,
+            "granularity": self.granularity,
+            "start": self.start.isoformat(),
+            "end": self.end.isoformat(),
+            "status": self.status,
+            "created_at": self.created_at.isoformat(),
+            "slices_total": self.slices_total,
+            "slices_done": sum(1 for s in self.slices if s.status == "done"),
+            "slices_failed": sum(1 for s in self.slices if s.status == "failed"),
+            "rows": self.total_rows(),
+            "pages": sum(s.pages for s in self.slices),
+            "progress": round(1 - remaining_ms / total_ms, 4) if self.slices else (1.0 if self.status == "done" else 0.0),
+            "rows_per_s": round(rows_per_s, 1),
+            "eta_s": eta_s,
+            "failures": [{"slice": s.slice_no, "attempts": s.attempts, "error": s.error}
+                         for s in self.slices if s.error],
+            "error": self.error,
+        }
+
+
+class BackfillScheduler:
+    def __init__(self, workers: int, pages_per_slice: int, limit: int = 200,
+                 checkpoint_interval_s: float = 5.0, max_attempts: int = 3, retry_base_s: float = 2.0,
+                 max_finished_jobs: int = 500):
+        self.workers = max(workers, 1)
+        self.pages_per_slice = pages_per_slice
+        self.limit = limit
+        self._checkpoint_interval_s = checkpoint_interval_s
+        self._max_attempts = max_attempts
+        self._retry_base_s = retry_base_s
+        self._max_finished_jobs = max(max_finished_jobs, 0)
+        self._jobs: Dict[str, BackfillJob] = {}   # alle aktiven + die neuesten max_finished_jobs fertigen
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        self._backfill: Optional[BitgetBackfill] = None
+        self._lock = asyncio.Lock()
+        self._checkpoint_lock = asyncio.Lock()
+        self.running = False
+        self.metrics = {
+            "jobs_submitted": 0,
+            "gaps_planned": 0,
+            "requests_deduplicated": 0,
+            "jobs_resumed": 0,
+            "slices_done": 0,
+            "slices_exhausted": 0,       # leere Seite vor lo, Rest der Scheibe bleibt eine Lücke
+            "slices_before_listing": 0,  # leere Seite vor dem Listing: Rest der Scheibe gilt als belegt
+            "slices_failed": 0,
+            "slice_retries": 0,
+            "checkpoints": 0,
+            "checkpoint_errors": 0,
+            "jobs_evicted": 0,
+        }
+
+    async def start(self):
+        if self.running:
+            return
+        self.running = True
+        self._queue = asyncio.Queue()
+        self._backfill = BitgetBackfill()
+        try:
+            await self._resume()
+        except Exception as e:
+            logger.error(f"[BackfillScheduler] Could not load backfill jobs: {e}")
+            traceback.print_exc()
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        self._tasks.append(asyncio.create_task(self._checkpoint_loop()))
+        logger.info(f"[BackfillScheduler] Started with {self.workers} workers")
+
+    async def stop(self):
+        if not self.running:
+            return
+        self.running = False
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        await self._checkpoint()
+        logger.info("[BackfillScheduler] Stopped")
+
+    # --- Jobs anlegen / abbrechen ---
+
+    async def submit(self, symbol: str, start: datetime, end: Optional[datetime] = None,
+                     market: str = "spot", granularity: str = "1m") -> dict:
+        """
+        Legt Jobs für die noch nicht abgedeckten Teile von [start, end) an.
+        Liefert die neuen Jobs und die IDs der Jobs, die überlappende Teile schon laden.
+        """
+        start = _utc(start)
+        end = _utc(end) if end else datetime.now(timezone.utc)
+        if start >= end:
+            raise ValueError("start muss vor end liegen")
+        if market != "spot" and market not in FUTURES_MARKETS:
+            raise ValueError(f"Unbekannter market: {market!r}")
+        if not self.running:
+            await self.start()
+        key = (symbol, market, granularity)
+        try:
+            await coverage_index.ensure(symbol, market, granularity)
+        except Exception as e:
+            logger.error(f"[BackfillScheduler] Coverage for {symbol}/{market} unavailable, planning without it: {e}")
+        async with self._lock:
+            existing = [j for j in self._jobs.values()
+                        if j.key() == key and j.status in COVERING and j.start < end and j.end > start]
+            # Planer: nur die Lücken im Coverage-Index laden, die kein Job abdeckt
+            missing = [(_dt(lo), _dt(hi)) for lo, hi in coverage_index.gaps(symbol, market, granularity, _ms(start), _ms(end))]
+            covered = [(j.start, j.end) for j in existing]
+            min_gap = timedelta(milliseconds=step_ms(granularity))
+            gaps = [(lo, hi) for gap_lo, gap_hi in missing for lo, hi in uncovered(gap_lo, gap_hi, covered)
+                    if hi - lo >= min_gap]
+            created = [self._create_job(symbol, market, granularity, lo, hi) for lo, hi in gaps]
+        self.metrics["gaps_planned"] += len(gaps)
+        if gaps != [(start, end)]:
+            self.metrics["requests_deduplicated"] += 1
+        self.metrics["jobs_submitted"] += len(created)
+        for job in created:
+            logger.info(f"[BackfillScheduler] Job {job.job_id}: {symbol}/{market} {granularity} "
+                        f"{job.start.isoformat()}..{job.end.isoformat()} ({job.slices_total} slices)")
+        if created:
+            await self._checkpoint()
+            for job in created:
+                self._enqueue(job)
+        return {
+            "jobs": [job.progress() for job in created],
+            "deduplicated": [job.job_id for job in existing],
+        }
+
+    def _create_job(self, symbol: str, market: str, granularity: str, start: datetime, end: datetime) -> BackfillJob:
+        job = BackfillJob(uuid.uuid4().hex, symbol, market, granularity, start, end)
+        self._build_slices(job)
+        self._jobs[job.job_id] = job
+        return job
+
+    def _build_slices(self, job: BackfillJob):
+        try:
+            slice_span = timedelta(seconds=parse_resolution(job.granularity) * self.limit * self.pages_per_slice)
+        except ValueError:
+            slice_span = None  # unbekanntes Format -> eine Scheibe
+        job.slices = [BackfillSlice(job.job_id, i, lo, hi)
+                      for i, (lo, hi) in enumerate(time_slices(job.start, job.end, slice_span))]
+        job.slices_total = len(job.slices)
+        job.dirty = True
+
+    def _enqueue(self, job: BackfillJob):
+        for sl in job.slices:
+            if sl.status == "pending":
+                self._queue.put_nowait((job, sl))
+
+    async def cancel(self, job_id: str) -> Optional[dict]:
+        job = self._jobs.get(job_id)
+        if job is None:
+            return None
+        if job.status in ACTIVE:
+            job.status = "cancelled"
+            job.dirty = True
+            await self._checkpoint()
+        return job.progress()
+
+    # --- Abfragen ---
+
+    def get_job(self, job_id: str) -> Optional[BackfillJob]:
+        return self._jobs.get(job_id)
+
+    def list_jobs(self, status: Optional[str] = None, symbol: Optional[str] = None, limit: int = 100) -> List[dict]:
+        jobs = sorted(self._jobs.values(), key=lambda j: j.created_at, reverse=True)
+        return [j.progress() for j in jobs
+                if (status is None or j.status == status) and (symbol is None or j.symbol == symbol)][:limit]
+
+    # --- Neustart ---
+
+    async def _resume(self):
+        """
+        Jobs aus ClickHouse laden: alle unfertigen (ab ihren Checkpoints wieder eingereiht)
+        und die neuesten max_finished_jobs fertigen (Abfragen, Dedupe überlappender Anfragen)
+        """
+        active = {row["job_id"]: BackfillJob.from_row(row)
+                  for row in await run_db(fetch_backfill_jobs, list(ACTIVE), None)}
+        if self._max_finished_jobs:
+            for row in await run_db(fetch_backfill_jobs, list(FINISHED), self._max_finished_jobs):
+                self._jobs[row["job_id"]] = BackfillJob.from_row(row)
+        self._jobs.update(active)
+        for row in await run_db(fetch_backfill_slices, list(active)):
+            sl = BackfillSlice(row["job_id"], row["slice_no"], _utc(row["lo"]), _utc(row["hi"]), row["cursor_ms"],
+                               row["rows"], row["pages"], row["status"], row["attempts"], row["error"])
+            sl.dirty = False
+            active[row["job_id"]].slices.append(sl)
+        for job in active.values():
+            if not job.slices:
+                self._build_slices(job)  # Absturz zwischen Job- und Scheiben-Insert
+            for sl in job.slices:
+                if sl.status != "done":
+                    # neuer Prozess, neue Versuche
+                    sl.status, sl.attempts, sl.dirty = "pending", 0, True
+            self._enqueue(job)
+            self.metrics["jobs_resumed"] += 1
+            logger.info(f"[BackfillScheduler] Resuming job {job.job_id} ({job.symbol}/{job.market}): "
+                        f"{sum(1 for s in job.slices if s.status == 'pending')}/{job.slices_total} slices left")
+
+    # --- Worker ---
+
+    async def _worker(self):
+        while True:
+            job, sl = await self._queue.get()
+            try:
+                if job.status in ACTIVE and sl.status == "pending":
+                    await self._run_slice(job, sl)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"[BackfillScheduler] Worker error in job {job.job_id}: {e}")
+                traceback.print_exc()
+            finally:
+                self._queue.task_done()
+
+    async def _run_slice(self, job: BackfillJob, sl: BackfillSlice):
+        if job.status == "queued" or job.run_started is None:
+            job.status = "running"
+            job.run_started = time.monotonic()
+            job.dirty = True
+        lo_ms = _ms(sl.lo)
+
+        def on_page(cursor_ms: int, rows: int):
+            job.run_covered_ms += max(0, sl.cursor_ms - max(cursor_ms, lo_ms - 1))
+            job.run_rows += rows
+            sl.cursor_ms = cursor_ms
+            sl.rows += rows
+            sl.pages += 1
+            sl.dirty = True
+
+        sl.attempts += 1
+        exhausted: List[int] = []
+        try:
+            await self._backfill.history(job.symbol, sl.lo, job.granularity, self.limit, end=sl.hi,
+                                         cursor_ms=sl.cursor_ms, on_page=on_page, market=job.market,
+                                         on_exhausted=exhausted.append)
+            job.run_covered_ms += sl.remaining_ms()
+            if not exhausted or await self._before_listing(job, exhausted[0]):
+                sl.cursor_ms = min(sl.cursor_ms, lo_ms - 1)
+            else:
+                # leere Seite heißt nicht, dass es davor nichts gibt (Aufbewahrungsgrenze, API-Aussetzer)
+                self.metrics["slices_exhausted"] += 1
+                logger.info(f"[BackfillScheduler] Job {job.job_id} slice {sl.slice_no}: no candles before "
+                            f"{_dt(exhausted[0]).isoformat()}, coverage ends there")
+            sl.status = "done"
+            sl.error = ""
+            self.metrics["slices_done"] += 1
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            sl.error = str(e)
+            if sl.attempts < self._max_attempts and job.status in ACTIVE:
+                delay = self._retry_base_s * 2 ** (sl.attempts - 1) * random.uniform(0.8, 1.2)
+                logger.warning(f"[BackfillScheduler] Job {job.job_id} slice {sl.slice_no} failed "
+                               f"(attempt {sl.attempts}), retry in {delay:.1f}s: {e}")
+                asyncio.get_running_loop().call_later(delay, self._queue.put_nowait, (job, sl))
+                self.metrics["slice_retries"] += 1
+            else:
+                logger.error(f"[BackfillScheduler] Job {job.job_id} slice {sl.slice_no} gave up: {e}")
+                sl.status = "failed"
+                self.metrics["slices_failed"] += 1
+        sl.dirty = True
+
+        if job.status in ACTIVE and all(s.status != "pending" for s in job.slices):
+            failed = sum(1 for s in job.slices if s.status == "failed")
+            job.status = "failed" if failed else "done"
+            job.error = f"{failed} slices failed" if failed else ""
+            job.dirty = True
+            logger.info(f"[BackfillScheduler] Job {job.job_id} {job.status}: {job.total_rows()} bars")
+            await self._checkpoint()
+
+    async def _before_listing(self, job: BackfillJob, cursor_ms: int) -> bool:
+        """Liegt cursor_ms vor dem Listing, gibt es davor keine Kerzen – die leere Seite belegt den Rest"""
+        try:
+            listing_ms = await fetch_listing_ms(job.symbol, job.market)
+        except Exception as e:
+            logger.warning(f"[BackfillScheduler] Listing time of {job.symbol}/{job.market} unavailable: {e}")
+            return False
+        if listing_ms is None or cursor_ms >= listing_ms:
+            return False
+        self.metrics["slices_before_listing"] += 1
+        return True
+
+    # --- Checkpoints ---
+
+    async def _checkpoint_loop(self):
+        while True:
+            await asyncio.sleep(self._checkpoint_interval_s)
+            try:
+                await self._checkpoint()
+            except Exception as e:
+                logger.error(f"[BackfillScheduler] Checkpoint error: {e}")
+
+    async def _checkpoint(self):
+        """
+        Geänderte Jobs/Scheiben sichern. Der Stand wird vor dem Writer-Flush abgegriffen:
+        alles, was er behauptet, lag da schon im Writer-Puffer und ist nach flush() in ClickHouse.
+        """
+        async with self._checkpoint_lock:
+            jobs = [j for j in self._jobs.values() if j.dirty]
+            slices = [s for j in self._jobs.values() for s in j.slices if s.dirty]
+            if not jobs and not slices:
+                return
+            job_rows = [j.row() for j in jobs]
+            slice_rows = [s.row() for s in slices]
+            spans = [(self._jobs[s.job_id].key(), s.covered()) for s in slices]
+            for item in (*jobs, *slices):
+                item.dirty = False
+            errors = batch_writer.metrics["flush_errors"]
+            try:
+                await batch_writer.flush()
+                if batch_writer.metrics["flush_errors"] != errors:
+                    raise RuntimeError("batch writer flush failed")
+                await run_db(insert_rows, "backfill_slices", BACKFILL_SLICE_COLUMNS, slice_rows)
+                await run_db(insert_rows, "backfill_jobs", BACKFILL_JOB_COLUMNS, job_rows)
+                self.metrics["checkpoints"] += 1
+                for (symbol, market, granularity), (lo, hi) in spans:
+                    coverage_index.add(symbol, market, granularity, lo, hi)
+            except Exception as e:
+                for item in (*jobs, *slices):
+                    item.dirty = True
+                self.metrics["checkpoint_errors"] += 1
+                logger.error(f"[BackfillScheduler] Checkpoint of {len(job_rows)} jobs/{len(slice_rows)} slices failed: {e}")
+                return
+            self._evict_finished()
+            await coverage_index.persist()
+
+    def _evict_finished(self):
+        """Gesicherte fertige Jobs über max_finished_jobs hinaus vergessen (die ältesten zuerst)"""
+        finished = sorted((j for j in self._jobs.values() if j.status in FINISHED and not j.dirty),
+                          key=lambda j: j.created_at, reverse=True)
+        for job in finished[self._max_finished_jobs:]:
+            del self._jobs[job.job_id]
+            self.metrics["jobs_evicted"] += 1
+
+    def get_metrics(self) -> dict:
+        return {
+            "running": self.running,
+            "workers": self.workers,
+            "queued_slices": self._queue.qsize() if self._queue else 0,
+            "jobs": {status: sum(1 for j in self._jobs.values() if j.status == status)
+                     for status in ("queued", "running", "done", "failed", "cancelled")},
+            "pages": self._backfill.pages if self._backfill else 0,
+            "bars": self._backfill.bars if self._backfill else 0,
+            **self.metrics,
+        }
+
+
+# Globale Instanz (main.py startet sie, PUT /settings und /backfill legen Jobs an)
+backfill_scheduler = BackfillScheduler(
+    settings.BACKFILL_CONCURRENCY,
+    settings.BACKFILL_PAGES_PER_SLICE,
+    checkpoint_interval_s=settings.BACKFILL_CHECKPOINT_INTERVAL,
+    max_attempts=settings.BACKFILL_MAX_ATTEMPTS,
+    max_finished_jobs=settings.BACKFILL_FINISHED_JOBS,
+)
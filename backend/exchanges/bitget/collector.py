@@ -2,40 +2,149 @@ import asyncio
 import json
 import traceback
 import logging
+from collections import Counter
 from datetime import datetime, timezone
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
 import websockets
 
+from core.config import settings
+from db.writer import batch_writer
+from exchanges.bitget.rest_utils import fetch_recent_fills
+
 logger = logging.getLogger("bitget-collector")
 
+SPOT_WS_URL = "wss://ws.bitget.com/spot/v1/stream"
+MIX_WS_URL = "wss://ws.bitget.com/mix/v1/stream"
+
+# Bitget erlaubt max. 240 Subscriptions pro Verbindung, empfiehlt aber deutlich weniger
+MAX_SUBSCRIPTIONS_PER_CONNECTION = 240
+DEFAULT_SUBSCRIPTIONS_PER_CONNECTION = 50
+
+# Sink je Symbol: bekommt jeden geparsten Trade (z.B. queue.put)
+TradeSink = Callable[[dict], Awaitable[None]]
+
+
+def get_ws_url(market: str) -> str:
+    return SPOT_WS_URL if market == "spot" else MIX_WS_URL
+
+
+def get_inst_type(market: str) -> str:
+    return "SP" if market == "spot" else "MC"
+
+
+# market_type-Namen der REST-Endpunkte (/orderbook, /ohlc) -> Bitget-Produktkürzel
+MARKET_ALIASES = {"usdtm": "umcbl", "coinm": "dmcbl", "usdcm": "cmcbl"}
+
+
+def get_inst_id(symbol: str, market: str) -> str:
+    return symbol if market == "spot" else f"{symbol}_{MARKET_ALIASES.get(market, market).upper()}"
+
+
+def parse_trade(symbol: str, market: str, entry) -> dict:
+    """Bitget-Trade-Eintrag [ts_ms, price, size, side] -> Trade-Dict wie in der trades-Tabelle (+ ts_ms)"""
+    ts_ms, price, size, side = entry
+    ts_ms = int(ts_ms)
+    dt = datetime.fromtimestamp(ts_ms / 1000, tz=timezone.utc)
+    return {
+        "symbol": symbol,
+        "market": market,
+        "price": float(price),
+        "size": float(size),
+        "side": side,
+        "ts": dt.isoformat(),
+        "ts_ms": ts_ms
+    }
+
+
+def trade_key(ts_ms: int, price: float, size: float, side: str) -> tuple:
+    """Dedupe-Schlüssel: die v1-WS-Trades haben keine tradeId, also Inhalt + Zeitstempel"""
+    return (ts_ms, price, size, side)
+
+
+class RecentTrades:
+    """
+    Stand je Symbol für Gap-Recovery und Dedupe. Entdoppelt wird nur, wo sich Quellen überlappen:
+    - REST-Fills gegen die Live-Trades mit genau last_ts_ms (die Lücke beginnt bei since_ms inklusive)
+    - Live-Trades nach dem Reconnect gegen die per REST nachgeholten, bis der Live-Stream deren
+      jüngsten Zeitstempel überholt hat
+    Gezählt wird als Multimenge: identische Prints in derselben ms bleiben erhalten.
+    """
+    __slots__ = ("last_ts_ms", "_tail", "_prior", "_overlap", "_overlap_until")
+
+    def __init__(self):
+        self.last_ts_ms: Optional[int] = None
+        self._tail = Counter()      # zugestellte Trades mit ts == last_ts_ms
+        self._prior = Counter()     # _tail beim Beginn der Recovery
+        self._overlap = Counter()   # per REST nachgeholt, noch nicht live gesehen
+        self._overlap_until = -1
+
+    def _note(self, key: tuple):
+        if self.last_ts_ms is None or key[0] > self.last_ts_ms:
+            self.last_ts_ms = key[0]
+            self._tail = Counter()
+        if key[0] == self.last_ts_ms:
+            self._tail[key] += 1
+
+    @staticmethod
+    def _take(counter: Counter, key: tuple) -> bool:
+        if not counter[key]:
+            return False
+        counter[key] -= 1
+        if not counter[key]:
+            del counter[key]
+        return True
+
+    def begin_recovery(self) -> Optional[int]:
+        """Lücke beginnt: liefert since_ms, die Trades dieses Zeitstempels liefert REST noch einmal"""
+        self._prior = Counter(self._tail)
+        return self.last_ts_ms
+
+    def live(self, key: tuple) -> bool:
+        """Live-Trade: True, wenn er schon per REST nachgeholt wurde; sonst merken und False"""
+        if self._overlap:
+            if key[0] > self._overlap_until:
+                self._overlap.clear()
+            elif self._take(self._overlap, key):
+                return True
+        self._note(key)
+        return False
+
+    def recovered(self, key: tuple) -> bool:
+        """REST-Fill: True, wenn er vor der Lücke schon live kam; sonst merken und False"""
+        if self._take(self._prior, key):
+            return True
+        self._overlap[key] += 1
+        self._overlap_until = max(self._overlap_until, key[0])
+        self._note(key)
+        return False
+
+
+async def persist_trade(trade: dict):
+    await batch_writer.add_trade(trade["symbol"], trade["market"], trade["price"], trade["size"], trade["side"], trade["ts"])
+
+
 class BitgetCollector:
     """
-    Holt Live-Trades für ein Symbol & Markt (Spot/Futures) von Bitget per WebSocket
+    Holt Live-Trades für ein Symbol & Markt (Spot/Futures) von Bitget per WebSocket,
+    schreibt sie über den Batch-Writer nach ClickHouse (persist=True)
     und legt sie in eine asyncio.Queue für das Backend.
     """
-    def __init__(self, symbol: str, market: str, queue: asyncio.Queue):
+    def __init__(self, symbol: str, market: str, queue: asyncio.Queue, persist: bool = True):
         self.symbol = symbol
         self.market = market      # 'spot', 'umcbl', 'dmcbl', ...
         self._queue = queue
-        self._ws_url = self._get_ws_url(market)
-        self._instType = self._get_inst_type(market)
+        self._persist = persist
+        self._ws_url = get_ws_url(market)
+        self._instType = get_inst_type(market)
         self._channel = "trade"
         self._reconnect_delay = 5
         self._running = True
 
-    def _get_ws_url(self, market):
-        if market == "spot":
-            return "wss://ws.bitget.com/spot/v1/stream"
-        else:
-            return "wss://ws.bitget.com/mix/v1/stream"
-
-    def _get_inst_type(self, market):
-        return "SP" if market == "spot" else "MC"
-
     async def start(self):
         while self._running:
             try:
                 async with websockets.connect(self._ws_url, ping_interval=15, ping_timeout=10) as ws:
-                    inst_id = self.symbol if self.market == "spot" else f"{self.symbol}_{self.market.upper()}"
+                    inst_id = get_inst_id(self.symbol, self.market)
                     sub_msg = {
                         "op": "subscribe",
                         "args": [{
@@ -55,16 +164,9 @@ class BitgetCollector:
                             if msg.get("action") != "update":
                                 continue
                             for entry in msg.get("data", []):
-                                ts_ms, price, size, side = entry
-                                dt = datetime.fromtimestamp(int(ts_ms) / 1000, tz=timezone.utc)
-                                trade = {
-                                    "symbol": self.symbol,
-                                    "market": self.market,
-                                    "price": float(price),
-                                    "size": float(size),
-                                    "side": side,
-                                    "ts": dt.isoformat()
-                                }
+                                trade = parse_trade(self.symbol, self.market, entry)
+                                if self._persist:
+                                    await persist_trade(trade)
                                 await self._queue.put(trade)
                         except Exception:
                             logger.error(f"[{datetime.utcnow().isoformat()}] [Collector:{self.symbol}|{self.market}] Parse error:\n{traceback.format_exc()}")
@@ -75,3 +177,339 @@ class BitgetCollector:
 
     def stop(self):
         self._running = False
+
+
+class _MuxConnection:
+    """
+    Eine WS-Verbindung, über die mehrere instIds (gleiche URL & instType) laufen.
+    Subscriptions werden zur Laufzeit per subscribe/unsubscribe geändert,
+    nach einem Reconnect wird der aktuelle Stand komplett neu abonniert.
+    """
+    SUBSCRIBE_BATCH = 50
+
+    def __init__(self, conn_id: int, ws_url: str, inst_type: str, channel: str,
+                 on_update: Callable[["_MuxConnection", str, str, list], Awaitable[None]],
+                 on_connect: Optional[Callable[["_MuxConnection", bool], None]] = None,
+                 reconnect_delay: float = 5):
+        self.conn_id = conn_id
+        self.ws_url = ws_url
+        self.inst_type = inst_type
+        self.channel = channel
+        self.inst_ids = set()
+        self.messages = 0
+        self.reconnects = 0
+        self._on_update = on_update
+        self._on_connect = on_connect
+        self._connected_once = False
+        self._reconnect_delay = reconnect_delay
+        self._ws = None
+        self._task: Optional[asyncio.Task] = None
+        self._running = True
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        self._running = False
+        if self._ws is not None:
+            await self._ws.close()
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except (asyncio.CancelledError, Exception):
+                pass
+
+    def _args(self, inst_ids) -> List[dict]:
+        return [{"instType": self.inst_type, "channel": self.channel, "instId": inst_id} for inst_id in inst_ids]
+
+    async def _send_op(self, op: str, inst_ids: List[str]):
+        ws = self._ws
+        if ws is None:
+            return  # nicht verbunden: beim nächsten Connect wird self.inst_ids abonniert
+        try:
+            await ws.send(json.dumps({"op": op, "args": self._args(inst_ids)}))
+        except Exception as e:
+            logger.warning(f"[MuxCollector#{self.conn_id}] {op} {inst_ids} failed (resubscribe on reconnect): {e}")
+
+    async def subscribe(self, inst_id: str):
+        self.inst_ids.add(inst_id)
+        await self._send_op("subscribe", [inst_id])
+
+    async def unsubscribe(self, inst_id: str):
+        self.inst_ids.discard(inst_id)
+        await self._send_op("unsubscribe", [inst_id])
+
+    async def _run(self):
+        while self._running:
+            try:
+                async with websockets.connect(self.ws_url, ping_interval=15, ping_timeout=10) as ws:
+                    self._ws = ws
+                    inst_ids = sorted(self.inst_ids)
+                    for i in range(0, len(inst_ids), self.SUBSCRIBE_BATCH):
+                        await ws.send(json.dumps({"op": "subscribe", "args": self._args(inst_ids[i:i + self.SUBSCRIBE_BATCH])}))
+                    logger.info(f"[MuxCollector#{self.conn_id}] Connected {self.ws_url}, subscribed {len(inst_ids)} instIds")
+                    if self._on_connect is not None:
+                        self._on_connect(self, self._connected_once)
+                    self._connected_once = True
+
+                    async for message in ws:
+                        if not self._running:
+                            break
+                        if message == "pong":
+                            continue
+                        try:
+                            msg = json.loads(message)
+                            action = msg.get("action")
+                            if action not in ("snapshot", "update"):
+                                continue
+                            self.messages += 1
+                            await self._on_update(self, action, msg.get("arg", {}).get("instId"), msg.get("data", []))
+                        except Exception:
+                            logger.error(f"[MuxCollector#{self.conn_id}] Parse error:\n{traceback.format_exc()}")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"[MuxCollector#{self.conn_id}] Connection error: {e}\n{traceback.format_exc()}")
+            finally:
+                self._ws = None
+            if self._running:
+                self.reconnects += 1
+                await asyncio.sleep(self._reconnect_delay)
+
+
+class BitgetMuxCollector:
+    """
+    Live-Trades für beliebig viele (symbol, market) über wenige WS-Verbindungen.
+    Pro Verbindung höchstens max_per_connection instIds; neue Symbole landen auf der
+    am wenigsten belegten Verbindung mit freiem Platz, sonst wird eine neue geöffnet.
+    add()/remove() ändern Subscriptions ohne Reconnect, jedes Update geht an den
+    Sink des jeweiligen Symbols (und bei persist=True an den Batch-Writer).
+    """
+    MAX_HELD_UPDATES = 1000
+
+    def __init__(self, channel: str = "trade", max_per_connection: int = DEFAULT_SUBSCRIPTIONS_PER_CONNECTION,
+                 persist: bool = True, ws_url: Optional[str] = None):
+        self._channel = channel
+        self._max_per_connection = min(max_per_connection, MAX_SUBSCRIPTIONS_PER_CONNECTION)
+        self._persist = persist
+        self._ws_url_override = ws_url  # z.B. lokaler Test-/Benchmark-Server
+        self._sinks: Dict[Tuple[str, str], TradeSink] = {}
+        self._routes: Dict[Tuple[str, str], Tuple[str, str]] = {}   # (instType, instId) -> (symbol, market)
+        self._assignment: Dict[Tuple[str, str], _MuxConnection] = {}
+        self._connections: List[_MuxConnection] = []
+        self._next_conn_id = 0
+        self._lock = asyncio.Lock()
+        # Gap-Recovery nach Reconnects (nur Trade-Channel), höchstens eine je Symbol
+        self._recent: Dict[Tuple[str, str], RecentTrades] = {}
+        self._recovering: Dict[Tuple[str, str], asyncio.Task] = {}
+        # Live-Updates, die während einer laufenden Gap-Recovery eintreffen (danach in Reihenfolge nachgereicht);
+        # mehr als MAX_HELD_UPDATES brechen die Recovery ab, die Lücke bleibt dann dem Backfill
+        self._held: Dict[Tuple[str, str], List[list]] = {}
+        self.gap_metrics = {
+            "gaps": 0,              # Reconnects mit bekanntem letzten Trade
+            "recovered": 0,         # über REST nachgeholte Trades
+            "duplicates": 0,        # verworfene Doppel (WS oder REST)
+            "window_exceeded": 0,   # Lücke älter als das REST-Fenster -> Backfill nötig
+            "recovery_errors": 0,
+            "recovery_aborted": 0,  # zu viele zurückgehaltene Live-Updates -> Backfill nötig
+            "already_recovering": 0,
+        }
+
+    def _pick_connection(self, ws_url: str, inst_type: str) -> _MuxConnection:
+        candidates = [
+            c for c in self._connections
+            if c.ws_url == ws_url and c.inst_type == inst_type and len(c.inst_ids) < self._max_per_connection
+        ]
+        if candidates:
+            return min(candidates, key=lambda c: len(c.inst_ids))
+        self._next_conn_id += 1
+        conn = _MuxConnection(self._next_conn_id, ws_url, inst_type, self._channel, self._on_update, self._on_connect)
+        self._connections.append(conn)
+        conn.start()
+        return conn
+
+    async def add(self, symbol: str, market: str, sink: Optional[TradeSink] = None):
+        """Abonniert (symbol, market); ist es schon abonniert, wird nur der Sink ersetzt (None = nur persistieren)"""
+        key = (symbol, market)
+        async with self._lock:
+            self._sinks[key] = sink
+            if key in self._assignment:
+                return
+            inst_type = get_inst_type(market)
+            inst_id = get_inst_id(symbol, market)
+            conn = self._pick_connection(self._ws_url_override or get_ws_url(market), inst_type)
+            self._routes[(inst_type, inst_id)] = key
+            self._assignment[key] = conn
+            self._recent[key] = RecentTrades()
+            await conn.subscribe(inst_id)
+            logger.info(f"[MuxCollector#{conn.conn_id}] + {symbol}/{market} ({len(conn.inst_ids)} on connection)")
+
+    async def remove(self, symbol: str, market: str):
+        key = (symbol, market)
+        async with self._lock:
+            self._sinks.pop(key, None)
+            self._recent.pop(key, None)
+            self._held.pop(key, None)
+            conn = self._assignment.pop(key, None)
+            if conn is None:
+                return
+            inst_id = get_inst_id(symbol, market)
+            self._routes.pop((conn.inst_type, inst_id), None)
+            await conn.unsubscribe(inst_id)
+            logger.info(f"[MuxCollector#{conn.conn_id}] - {symbol}/{market} ({len(conn.inst_ids)} on connection)")
+            if not conn.inst_ids:
+                self._connections.remove(conn)
+                await conn.stop()
+
+    def is_subscribed(self, symbol: str, market: str) -> bool:
+        return (symbol, market) in self._assignment
+
+    async def resubscribe(self, symbol: str, market: str):
+        """unsubscribe + subscribe auf derselben Verbindung (Bitget schickt danach einen frischen Snapshot)"""
+        async with self._lock:
+            conn = self._assignment.get((symbol, market))
+            if conn is None:
+                return
+            inst_id = get_inst_id(symbol, market)
+            await conn.unsubscribe(inst_id)
+            await conn.subscribe(inst_id)
+
+    async def _on_update(self, conn: _MuxConnection, action: str, inst_id: str, data: list):
+        key = self._routes.get((conn.inst_type, inst_id))
+        if key is None:
+            return  # Update für bereits entferntes Symbol
+        await self._dispatch(key, action, data)
+
+    async def _dispatch(self, key: Tuple[str, str], action: str, data: list):
+        """Trade-Channel: Updates parsen, entdoppeln, persistieren, an den Sink geben (Snapshots werden ignoriert)"""
+        if action != "update":
+            return
+        held = self._held.get(key)
+        if held is not None:
+            held.append(data)  # Gap-Recovery läuft: erst die Lücke, dann diese Trades
+            task = self._recovering.get(key)
+            if len(held) > self.MAX_HELD_UPDATES and task is not None and not task.cancelling():
+                # REST hängt: Live-Daten nicht länger aufstauen, der Abbruch reicht sie nach
+                self.gap_metrics["recovery_aborted"] += 1
+                logger.warning(f"[MuxCollector] Gap recovery {key[0]}/{key[1]} aborted after {len(held)} held updates")
+                task.cancel()
+            return
+        await self._deliver(key, data)
+
+    async def _deliver(self, key: Tuple[str, str], data, recovered: bool = False) -> int:
+        """
+        Trade-Einträge entdoppeln, persistieren und an den Sink geben; liefert die Zahl neuer Trades.
+        recovered=True: REST-Fills der Gap-Recovery
+        """
+        sink = self._sinks.get(key)
+        recent = self._recent.get(key)
+        symbol, market = key
+        delivered = 0
+        for entry in data:
+            trade = parse_trade(symbol, market, entry)
+            if recent is not None:
+                tkey = trade_key(trade["ts_ms"], trade["price"], trade["size"], trade["side"])
+                if recent.recovered(tkey) if recovered else recent.live(tkey):
+                    self.gap_metrics["duplicates"] += 1
+                    continue
+            delivered += 1
+            if self._persist:
+                await persist_trade(trade)
+            if sink is not None:
+                try:
+                    await sink(trade)
+                except Exception:
+                    logger.error(f"[MuxCollector] Sink error {symbol}/{market}:\n{traceback.format_exc()}")
+        return delivered
+
+    def _on_connect(self, conn: _MuxConnection, reconnected: bool):
+        """
+        Nach einem Reconnect für jedes Symbol der Verbindung die Lücke seit dem letzten Trade
+        nachholen; Live-Updates des Symbols werden bis dahin zurückgehalten
+        """
+        if not reconnected or self._channel != "trade":
+            return
+        for key, assigned in list(self._assignment.items()):
+            recent = self._recent.get(key)
+            if assigned is not conn or recent is None or recent.last_ts_ms is None:
+                continue
+            if key in self._recovering:
+                # die laufende Recovery holt ab ihrem (älteren) since_ms nach
+                self.gap_metrics["already_recovering"] += 1
+                continue
+            if self._persist or self._sinks.get(key) is not None:
+                self.gap_metrics["gaps"] += 1
+                self._held.setdefault(key, [])
+                task = self._recovering[key] = asyncio.create_task(self._recover_gap(key, recent.begin_recovery()))
+                task.add_done_callback(lambda t, key=key: self._recovering.get(key) is t and self._recovering.pop(key))
+
+    async def _recover_gap(self, key: Tuple[str, str], since_ms: int):
+        """
+        Fills seit since_ms per REST holen und wie Live-Updates zustellen (entdoppelt, nach ts
+        sortiert, persistiert und an den Sink), danach die zurückgehaltenen Live-Updates
+        """
+        symbol, market = key
+        try:
+            try:
+                fills = await fetch_recent_fills(symbol, market)
+            except Exception as e:
+                self.gap_metrics["recovery_errors"] += 1
+                logger.error(f"[MuxCollector] Gap recovery {symbol}/{market} failed: {e}")
+                return
+            if not fills or key not in self._recent:
+                return  # nichts nachzuholen oder inzwischen abbestellt
+            fills = sorted(fills, key=lambda f: int(f["ts"]))  # Liste kommt aus dem geteilten REST-Cache
+            if int(fills[0]["ts"]) > since_ms:
+                self.gap_metrics["window_exceeded"] += 1
+                logger.warning(f"[MuxCollector] Gap {symbol}/{market} older than REST window "
+                               f"({since_ms} < {fills[0]['ts']}), backfill required for the rest")
+            entries = [(fill["ts"], fill["price"], fill["size"], fill["side"])
+                       for fill in fills if int(fill["ts"]) >= since_ms]
+            recovered = await self._deliver(key, entries, recovered=True)
+            self.gap_metrics["recovered"] += recovered
+            logger.info(f"[MuxCollector] Gap recovery {symbol}/{market}: {recovered} trades since {since_ms}")
+        finally:
+            # zurückgehaltene Live-Updates in Eingangsreihenfolge nachreichen (neue kommen dabei noch dazu)
+            held = self._held.get(key)
+            while held:
+                await self._deliver(key, held.pop(0))
+            self._held.pop(key, None)
+
+    async def stop(self):
+        for task in list(self._recovering.values()):
+            task.cancel()
+        async with self._lock:
+            connections, self._connections = self._connections, []
+            self._assignment.clear()
+            self._routes.clear()
+            self._sinks.clear()
+            self._recent.clear()
+            self._held.clear()
+        for conn in connections:
+            await conn.stop()
+
+    def get_metrics(self) -> dict:
+        return {
+            "connections": len(self._connections),
+            "subscriptions": len(self._assignment),
+            "max_per_connection": self._max_per_connection,
+            "gap_recovery": dict(self.gap_metrics),
+            "per_connection": [
+                {
+                    "id": c.conn_id,
+                    "url": c.ws_url,
+                    "inst_type": c.inst_type,
+                    "subscriptions": len(c.inst_ids),
+                    "connected": c._ws is not None,
+                    "messages": c.messages,
+                    "reconnects": c.reconnects,
+                }
+                for c in self._connections
+            ],
+        }
+
+
+# Globale Instanz für die API (Trades-Router). Laufen Collector-Worker (Supervisor),
+# persistieren diese die store_live-Symbole – die API verteilt dann nur noch live.
+mux_collector = BitgetMuxCollector(persist=settings.COLLECTOR_WORKERS <= 0)
@@ -0,0 +1,227 @@
+import asyncio
+import logging
+import time
+import traceback
+import zlib
+from itertools import islice
+from operator import neg
+from typing import Dict, List, Optional, Tuple
+
+from sortedcontainers import SortedDict
+
+from core.ws.bus import TradeBus, trade_bus
+from exchanges.bitget.collector import BitgetMuxCollector
+
+logger = logging.getLogger("bitget-orderbook")
+
+CHECKSUM_LEVELS = 25
+
+
+class BitgetBookCollector(BitgetMuxCollector):
+    """
+    Mux-Collector für den Bitget-Channel "books" (volle Tiefe, Snapshot + Deltas mit Checksumme).
+    Sinks bekommen (action, data) statt geparster Trades, persistiert wird nichts.
+    """
+    def __init__(self, **kwargs):
+        super().__init__(channel="books", persist=False, **kwargs)
+
+    async def _dispatch(self, key: Tuple[str, str], action: str, data: list):
+        sink = self._sinks.get(key)
+        if sink is not None:
+            await sink(action, data)
+
+
+class ChecksumMismatch(Exception):
+    """Lokales Buch weicht vom Bitget-Buch ab -> Resync nötig"""
+
+
+class LocalOrderBook:
+    """
+    L2-Orderbuch für ein (symbol, market).
+    Preisstufen liegen in SortedDicts (Bids absteigend, Asks aufsteigend): Einfügen,
+    Ändern und Löschen einer Stufe O(log n), Top-N lesen O(N).
+    Zu jeder Stufe werden die Original-Strings gehalten, weil Bitgets CRC32-Checksumme
+    über die Strings der ersten 25 Stufen gebildet wird.
+    """
+    def __init__(self, symbol: str, market: str):
+        self.symbol = symbol
+        self.market = market
+        self.bids: SortedDict = SortedDict(neg)  # price -> (price_str, size_str, size)
+        self.asks: SortedDict = SortedDict()
+        self.seq = 0
+        self.ts = 0
+        self.synced = False
+        self.updated_at = 0.0
+
+    @staticmethod
+    def _apply_side(side: SortedDict, levels: list):
+        for price_str, size_str, *_ in levels:
+            price = float(price_str)
+            size = float(size_str)
+            if size == 0.0:
+                side.pop(price, None)
+            else:
+                side[price] = (price_str, size_str, size)
+
+    def apply_snapshot(self, data: dict):
+        self.bids.clear()
+        self.asks.clear()
+        self._apply_side(self.bids, data.get("bids", []))
+        self._apply_side(self.asks, data.get("asks", []))
+        self._finish(data)
+        self.synced = True
+
+    def apply_update(self, data: dict):
+        if not self.synced:
+            return
+        self._apply_side(self.bids, data.get("bids", []))
+        self._apply_side(self.asks, data.get("asks", []))
+        self._finish(data)
+
+    def _finish(self, data: dict):
+        self.seq += 1
+        self.ts = int(data.get("ts") or 0)
+        self.updated_at = time.time()
+        expected = data.get("checksum")
+        if expected is not None and int(expected) != self.checksum():
+            self.synced = False
+            raise ChecksumMismatch(f"{self.symbol}/{self.market}: checksum {self.checksum()} != {expected}")
+
+    def checksum(self) -> int:
+        bids = list(islice(self.bids.values(), CHECKSUM_LEVELS))
+        asks = list(islice(self.asks.values(), CHECKSUM_LEVELS))
+        parts = []
+        for i in range(CHECKSUM_LEVELS):
+            if i < len(bids):
+                parts.append(f"{bids[i][0]}:{bids[i][1]}")
+            if i < len(asks):
+                parts.append(f"{asks[i][0]}:{asks[i][1]}")
+        crc = zlib.crc32(":".join(parts).encode())
+        return crc - (1 << 32) if crc >= (1 << 31) else crc
+
+    def top(self, limit: int = 10) -> dict:
+        return {
+            "asks": [{"price": p, "size": lvl[2]} for p, lvl in islice(self.asks.items(), limit)],
+            "bids": [{"price": p, "size": lvl[2]} for p, lvl in islice(self.bids.items(), limit)],
+            "seq": self.seq,
+            "ts": self.ts,
+        }
+
+    def levels(self) -> Tuple[List[list], List[list]]:
+        """Alle Stufen als [price, size] (für Snapshots an WS-Clients)"""
+        return ([[p, lvl[2]] for p, lvl in self.asks.items()],
+                [[p, lvl[2]] for p, lvl in self.bids.items()])
+
+
+class OrderBookService:
+    """
+    Hält lokale Orderbücher für alle gefragten Symbole und verteilt Deltas über den Bus
+    (Topic "book:{symbol}_{market}"). Bücher ohne WS-Subscriber und ohne /orderbook-Zugriff
+    seit idle_ttl_s Sekunden werden wieder abbestellt.
+    """
+    def __init__(self, bus: TradeBus, collector: BitgetBookCollector, idle_ttl_s: float = 60.0):
+        self._bus = bus
+        self._collector = collector
+        self._idle_ttl_s = idle_ttl_s
+        self._books: Dict[str, LocalOrderBook] = {}
+        self._last_read: Dict[str, float] = {}
+        self._janitor: Optional[asyncio.Task] = None
+        self.metrics = {"snapshots": 0, "updates": 0, "checksum_errors": 0, "resyncs": 0, "released": 0}
+
+    @staticmethod
+    def topic(symbol: str, market: str) -> str:
+        return f"book:{symbol}_{market}"
+
+    async def start(self):
+        if self._janitor is None:
+            self._janitor = asyncio.create_task(self._janitor_loop())
+
+    async def stop(self):
+        if self._janitor:
+            self._janitor.cancel()
+            try:
+                await self._janitor
+            except asyncio.CancelledError:
+                pass
+            self._janitor = None
+        await self._collector.stop()
+        self._books.clear()
+
+    async def ensure(self, symbol: str, market: str) -> LocalOrderBook:
+        """Liefert das lokale Buch und abonniert den books-Channel, falls noch nicht geschehen"""
+        key = f"{symbol}_{market}"
+        self._last_read[key] = time.time()
+        book = self._books.get(key)
+        if book is None:
+            book = self._books[key] = LocalOrderBook(symbol, market)
+
+            async def sink(action: str, data: list):
+                await self._on_book(book, action, data)
+
+            await self._collector.add(symbol, market, sink)
+            await self.start()
+        return book
+
+    async def wait_synced(self, book: LocalOrderBook, timeout: float) -> bool:
+        deadline = time.monotonic() + timeout
+        while not book.synced and time.monotonic() < deadline:
+            await asyncio.sleep(0.02)
+        return book.synced
+
+    async def _on_book(self, book: LocalOrderBook, action: str, data: list):
+        topic = self.topic(book.symbol, book.market)
+        for entry in data:
+            prev_seq = book.seq
+            try:
+                if action == "snapshot":
+                    book.apply_snapshot(entry)
+                    self.metrics["snapshots"] += 1
+                    if self._bus.subscriber_count(topic):
+                        asks, bids = book.levels()
+                        self._bus.publish(topic, {"type": "book_snapshot", "symbol": book.symbol, "market": book.market,
+                                                  "seq": book.seq, "ts": book.ts, "asks": asks, "bids": bids})
+                else:
+                    if not book.synced:
+                        continue  # warten auf den Snapshot nach dem Resync
+                    book.apply_update(entry)
+                    self.metrics["updates"] += 1
+                    self._bus.publish(topic, {"type": "book_delta", "symbol": book.symbol, "market": book.market,
+                                              "seq": book.seq, "prev_seq": prev_seq, "ts": book.ts,
+                                              "asks": entry.get("asks", []), "bids": entry.get("bids", [])})
+            except ChecksumMismatch as e:
+                self.metrics["checksum_errors"] += 1
+                self.metrics["resyncs"] += 1
+                logger.warning(f"[OrderBook] {e} -> resync")
+                await self._collector.resubscribe(book.symbol, book.market)
+                return
+            except Exception:
+                logger.error(f"[OrderBook] {book.symbol}/{book.market} apply error:\n{traceback.format_exc()}")
+
+    async def _janitor_loop(self):
+        while True:
+            await asyncio.sleep(self._idle_ttl_s / 4)
+            now = time.time()
+            for key, book in list(self._books.items()):
+                topic = self.topic(book.symbol, book.market)
+                if self._bus.subscriber_count(topic) or now - self._last_read.get(key, 0) < self._idle_ttl_s:
+                    continue
+                self._books.pop(key, None)
+                self._last_read.pop(key, None)
+                await self._collector.remove(book.symbol, book.market)
+                self.metrics["released"] += 1
+                logger.info(f"[OrderBook] Released idle book {book.symbol}/{book.market}")
+
+    def get_metrics(self) -> dict:
+        return {
+            **self.metrics,
+            "books": {
+                key: {"synced": b.synced, "seq": b.seq, "bids": len(b.bids), "asks": len(b.asks),
+                      "age_ms": round((time.time() - b.updated_at) * 1000) if b.updated_at else None}
+                for key, b in self._books.items()
+            },
+            "collector": self._collector.get_metrics(),
+        }
+
+
+# Globale Instanz (/orderbook, /ws/{symbol}/{market}/orderbook)
+book_service = OrderBookService(trade_bus, BitgetBookCollector())
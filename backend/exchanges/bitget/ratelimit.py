@@ -0,0 +1,102 @@
+import asyncio
+import logging
+import time
+from typing import Dict, Optional
+
+logger = logging.getLogger("bitget-ratelimit")
+
+# Bitget-Limits je Endpoint (Requests/s pro IP, laut API-Doku). Nicht gelistete Pfade: DEFAULT_RATE
+BITGET_RATE_LIMITS: Dict[str, float] = {
+    "/api/v2/spot/public/symbols": 20,
+    "/api/v2/spot/public/candles": 20,
+    "/api/v2/spot/market/candles": 20,
+    "/api/v2/spot/market/history-candles": 20,
+    "/api/v2/spot/market/fills": 10,
+    "/api/v2/spot/market/fills-history": 10,
+    "/api/v2/mix/market/contracts": 20,
+    "/api/v2/mix/market/candles": 20,
+    "/api/v2/mix/market/history-candles": 20,
+    "/api/v2/mix/market/fills": 20,
+    "/api/spot/v1/market/tickers": 20,
+    "/api/spot/v1/market/depth": 20,
+    "/api/mix/v1/market/tickers": 20,
+    "/api/mix/v1/market/depth": 20,
+    "/api/mix/v1/market/history-candles": 20,
+}
+DEFAULT_RATE = 10.0
+
+
+class TokenBucket:
+    """
+    Token-Bucket: rate Tokens/s, höchstens burst Tokens auf Vorrat.
+    acquire() wartet, bis genug Tokens da sind; die Wartenden werden über ein
+    asyncio.Lock in Ankunftsreihenfolge bedient. penalize() sperrt den Bucket
+    (z.B. nach HTTP 429) für eine Weile komplett.
+    """
+    def __init__(self, rate: float, burst: Optional[float] = None):
+        self.rate = float(rate)
+        self.capacity = float(burst or rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+        self._lock = asyncio.Lock()
+        self.metrics = {"acquired": 0, "waits": 0, "wait_ms_total": 0.0, "penalties": 0}
+
+    def _refill(self, now: float):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self, tokens: float = 1.0):
+        started = time.monotonic()
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self._blocked_until:
+                    await asyncio.sleep(self._blocked_until - now)
+                    continue
+                self._refill(now)
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    break
+                await asyncio.sleep((tokens - self._tokens) / self.rate)
+        waited_ms = (time.monotonic() - started) * 1000
+        self.metrics["acquired"] += 1
+        if waited_ms > 1:
+            self.metrics["waits"] += 1
+            self.metrics["wait_ms_total"] += waited_ms
+
+    def penalize(self, seconds: float):
+        self._blocked_until = max(self._blocked_until, time.monotonic() + seconds)
+        self._tokens = 0.0
+        self.metrics["penalties"] += 1
+
+    def get_metrics(self) -> dict:
+        return {"rate": self.rate, "tokens": round(self._tokens, 2), **self.metrics}
+
+
+class RateLimiter:
+    """Ein TokenBucket je Endpoint-Pfad (lazy angelegt)"""
+    def __init__(self, limits: Dict[str, float], default_rate: float = DEFAULT_RATE):
+        self._limits = limits
+        self._default_rate = default_rate
+        self._buckets: Dict[str, TokenBucket] = {}
+
+    def bucket(self, endpoint: str) -> TokenBucket:
+        bucket = self._buckets.get(endpoint)
+        if bucket is None:
+            bucket = self._buckets[endpoint] = TokenBucket(self._limits.get(endpoint, self._default_rate))
+        return bucket
+
+    async def acquire(self, endpoint: str):
+        await self.bucket(endpoint).acquire()
+
+    def penalize(self, endpoint: str, seconds: float):
+        logger.warning(f"[RateLimiter] {endpoint} throttled, pausing {seconds:.1f}s")
+        self.bucket(endpoint).penalize(seconds)
+
+    def get_metrics(self) -> dict:
+        return {endpoint: bucket.get_metrics() for endpoint, bucket in self._buckets.items()}
+
+
+# Gemeinsamer Limiter für alle Bitget-REST-Aufrufe dieses Prozesses
+bitget_limiter = RateLimiter(BITGET_RATE_LIMITS)
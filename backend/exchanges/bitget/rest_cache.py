@@ -0,0 +1,121 @@
+"""
+Single-Flight + LRU-Cache für die REST-Helper in rest_utils.py.
+
+Schlüssel ist (Pfad, sortierte Parameter). Gleichzeitige identische Aufrufe teilen sich
+einen laufenden Request (coalesced), fertige Antworten bleiben je Endpoint ENDPOINT_TTLS s
+im Cache (hit). Ohne TTL-Eintrag wird nur zusammengelegt, nicht gecacht. Fehler werden
+nie gecacht. Die Einträge sind geteilte Objekte – Aufrufer dürfen sie nicht verändern.
+"""
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from core.config import settings
+
+logger = logging.getLogger("bitget-rest-cache")
+
+# TTL je Endpoint (s)
+ENDPOINT_TTLS: Dict[str, float] = {
+    "/api/v2/spot/public/symbols": 60.0,
+    "/api/v2/mix/market/contracts": 60.0,
+    "/api/spot/v1/market/tickers": 1.0,
+    "/api/mix/v1/market/tickers": 1.0,
+    "/api/spot/v1/market/depth": 0.5,
+    "/api/mix/v1/market/depth": 0.5,
+    "/api/v2/spot/public/candles": 1.0,
+    "/api/v2/mix/market/history-candles": 1.0,
+}
+
+CacheKey = Tuple[str, tuple]
+
+
+def cache_key(path: str, params: Optional[Dict[str, Any]]) -> CacheKey:
+    return path, tuple(sorted((k, str(v)) for k, v in (params or {}).items()))
+
+
+def _retrieve(task: asyncio.Task):
+    """Fehler abholen, falls alle Aufrufer schon abgebrochen haben (sonst Warnung im Log)"""
+    if not task.cancelled():
+        task.exception()
+
+
+class _EndpointCounters:
+    __slots__ = ("hits", "misses", "coalesced", "errors")
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0       # = Requests an Bitget
+        self.coalesced = 0
+        self.errors = 0
+
+
+class RestCache:
+    def __init__(self, max_entries: int = 1024, ttls: Optional[Dict[str, float]] = None):
+        self.max_entries = max_entries
+        self.ttls = ENDPOINT_TTLS if ttls is None else ttls
+        self._entries: "OrderedDict[CacheKey, Tuple[float, Any]]" = OrderedDict()   # key -> (expires, value)
+        self._inflight: Dict[CacheKey, asyncio.Task] = {}
+        self._counters: Dict[str, _EndpointCounters] = {}
+        self.evictions = 0
+
+    async def get(self, path: str, params: Optional[Dict[str, Any]], fetch: Callable[[], Awaitable[Any]]) -> Any:
+        counters = self._counters.get(path)
+        if counters is None:
+            counters = self._counters[path] = _EndpointCounters()
+        key = cache_key(path, params)
+        entry = self._entries.get(key)
+        if entry is not None:
+            if entry[0] > time.monotonic():
+                self._entries.move_to_end(key)
+                counters.hits += 1
+                return entry[1]
+            del self._entries[key]
+        task = self._inflight.get(key)
+        if task is not None:
+            counters.coalesced += 1
+        else:
+            counters.misses += 1
+            task = self._inflight[key] = asyncio.create_task(self._load(key, path, fetch, counters))
+            task.add_done_callback(_retrieve)
+        # shield: bricht ein Aufrufer ab, läuft der Request für die übrigen weiter
+        return await asyncio.shield(task)
+
+    async def _load(self, key: CacheKey, path: str, fetch: Callable[[], Awaitable[Any]],
+                    counters: _EndpointCounters) -> Any:
+        try:
+            value = await fetch()
+        except BaseException:
+            counters.errors += 1
+            raise
+        finally:
+            self._inflight.pop(key, None)
+        ttl = self.ttls.get(path, 0.0)
+        if ttl > 0:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return value
+
+    def clear(self):
+        self._entries.clear()
+
+    def get_metrics(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "inflight": len(self._inflight),
+            "evictions": self.evictions,
+            "endpoints": {
+                path: {"hits": c.hits, "misses": c.misses, "coalesced": c.coalesced, "errors": c.errors,
+                       "ttl_s": self.ttls.get(path, 0.0)}
+                for path, c in self._counters.items()
+            },
+        }
+
+
+# Globaler Cache der REST-Helper (rest_utils._get)
+rest_cache = RestCache(max_entries=settings.BITGET_CACHE_MAX_ENTRIES)
@@ -0,0 +1,238 @@
+"""
+Gemeinsamer REST-Client für alle Bitget-Aufrufe (rest_utils, Backfill, Gap-Recovery).
+
+- Ein langlebiger httpx.AsyncClient je Prozess: Keep-Alive-Pool, HTTP/2 (Multiplexing
+  über wenige Verbindungen), falls h2 installiert ist, sonst HTTP/1.1.
+- Start/Stop über den FastAPI-Lifecycle (core/main.py); ohne start() (Collector-Worker,
+  Skripte) wird der Client beim ersten Request angelegt.
+- Timeout je Endpoint (ENDPOINT_TIMEOUTS), Rate-Limit über den gemeinsamen Token-Bucket.
+- Retries mit Exponential Backoff + Jitter bei Transportfehlern und 5xx; bei 429 wird der
+  Bucket für Retry-After Sekunden gesperrt.
+- Latenz-Histogramm, Status-Codes und Retries je Endpoint für /metrics.
+"""
+import asyncio
+import logging
+import random
+import time
+from email.utils import parsedate_to_datetime
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+from core.config import settings
+from exchanges.bitget.ratelimit import bitget_limiter
+
+try:
+    import h2  # noqa: F401  (httpx[http2])
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+logger = logging.getLogger("bitget-http")
+
+BASE_URL = "https://api.bitget.com"
+
+# Read-Timeout je Endpoint (s); Symbol-/Kontraktlisten sind groß, Orderbuch/Ticker sollen schnell scheitern
+ENDPOINT_TIMEOUTS: Dict[str, float] = {
+    "/api/v2/spot/public/symbols": 15.0,
+    "/api/v2/mix/market/contracts": 15.0,
+    "/api/spot/v1/market/tickers": 5.0,
+    "/api/mix/v1/market/tickers": 5.0,
+    "/api/spot/v1/market/depth": 3.0,
+    "/api/mix/v1/market/depth": 3.0,
+    "/api/v2/spot/market/fills": 5.0,
+    "/api/v2/mix/market/fills": 5.0,
+}
+DEFAULT_TIMEOUT = 10.0
+CONNECT_TIMEOUT = 5.0
+
+# Obergrenzen der Latenz-Buckets in ms (letzter Bucket: alles darüber)
+LATENCY_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+RETRY_STATUS = {500, 502, 503, 504}
+
+
+def retry_after_seconds(value: Optional[str], default: float = 1.0) -> float:
+    """Retry-After als Sekunden oder HTTP-Datum; fehlt/ungültig -> default"""
+    if not value:
+        return default
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return default
+
+
+class LatencyHistogram:
+    """Feste Buckets; Quantile werden als Bucket-Obergrenze geschätzt (höchstens max_ms)"""
+    __slots__ = ("counts", "count", "total_ms", "max_ms")
+
+    def __init__(self):
+        self.counts: List[int] = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def observe(self, ms: float):
+        i = 0
+        while i < len(LATENCY_BUCKETS_MS) and ms > LATENCY_BUCKETS_MS[i]:
+            i += 1
+        self.counts[i] += 1
+        self.count += 1
+        self.total_ms += ms
+        self.max_ms = max(self.max_ms, ms)
+
+    def quantile(self, q: float) -> Optional[float]:
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            seen += n
+            if seen >= rank:
+                if i < len(LATENCY_BUCKETS_MS):
+                    return round(min(float(LATENCY_BUCKETS_MS[i]), self.max_ms), 1)
+                return round(self.max_ms, 1)
+        return round(self.max_ms, 1)
+
+    def to_dict(self) -> dict:
+        labels = [f"le_{b}" for b in LATENCY_BUCKETS_MS] + ["inf"]
+        return {
+            "count": self.count,
+            "avg_ms": round(self.total_ms / self.count, 2) if self.count else None,
+            "p50_ms": self.quantile(0.5),
+            "p99_ms": self.quantile(0.99),
+            "max_ms": round(self.max_ms, 1),
+            "buckets": dict(zip(labels, self.counts)),
+        }
+
+
+class _EndpointStats:
+    __slots__ = ("latency", "status", "retries", "errors")
+
+    def __init__(self):
+        self.latency = LatencyHistogram()
+        self.status: Dict[str, int] = {}
+        self.retries = 0
+        self.errors = 0
+
+
+class BitgetRestClient:
+    def __init__(self, base_url: str = BASE_URL, http2: bool = True, max_connections: int = 32,
+                 keepalive_expiry: float = 30.0, retries: int = 3, retry_base_s: float = 0.25,
+                 retry_max_s: float = 10.0):
+        self.base_url = base_url
+        self.http2 = http2 and HTTP2_AVAILABLE
+        self.max_connections = max_connections
+        self.keepalive_expiry = keepalive_expiry
+        self.retries = retries
+        self.retry_base_s = retry_base_s
+        self.retry_max_s = retry_max_s
+        self._client: Optional[httpx.AsyncClient] = None
+        self._stats: Dict[str, _EndpointStats] = {}
+        self.http_versions: Dict[str, int] = {}
+        if http2 and not HTTP2_AVAILABLE:
+            logger.warning("h2 not installed, Bitget REST falls back to HTTP/1.1 (pip install h2)")
+
+    def _create(self) -> httpx.AsyncClient:
+        return httpx.AsyncClient(
+            base_url=self.base_url,
+            http2=self.http2,
+            timeout=httpx.Timeout(DEFAULT_TIMEOUT, connect=CONNECT_TIMEOUT),
+            limits=httpx.Limits(
+                max_connections=self.max_connections,
+                max_keepalive_connections=self.max_connections,
+                keepalive_expiry=self.keepalive_expiry,
+            ),
+        )
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            self._client = self._create()
+        return self._client
+
+    async def start(self):
+        self.client
+        logger.info(f"Bitget REST client ready ({'HTTP/2' if self.http2 else 'HTTP/1.1'}, "
+                    f"{self.max_connections} connections)")
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def _backoff(self, attempt: int) -> float:
+        """Full Jitter: gleichverteilt in [0, min(max, base * 2^attempt)]"""
+        return random.uniform(0, min(self.retry_max_s, self.retry_base_s * 2 ** attempt))
+
+    async def get(self, path: str, params: Optional[Dict[str, Any]] = None,
+                  timeout: Optional[float] = None) -> httpx.Response:
+        """
+        GET über den Token-Bucket des Endpoints. Transportfehler, 5xx und 429 werden bis zu
+        `retries` Mal wiederholt; danach (und bei anderen 4xx) wirft raise_for_status().
+        """
+        stats = self._stats.get(path)
+        if stats is None:
+            stats = self._stats[path] = _EndpointStats()
+        read_timeout = timeout or ENDPOINT_TIMEOUTS.get(path, DEFAULT_TIMEOUT)
+        request_timeout = httpx.Timeout(read_timeout, connect=min(CONNECT_TIMEOUT, read_timeout))
+        attempt = 0
+        while True:
+            await bitget_limiter.acquire(path)
+            started = time.perf_counter()
+            try:
+                r = await self.client.get(path, params=params, timeout=request_timeout)
+            except httpx.TransportError as e:
+                stats.errors += 1
+                if attempt >= self.retries:
+                    raise
+                delay = self._backoff(attempt)
+                logger.warning(f"[BitgetREST] {path}: {type(e).__name__}, retry in {delay:.2f}s")
+            else:
+                stats.latency.observe((time.perf_counter() - started) * 1000)
+                code = str(r.status_code)
+                stats.status[code] = stats.status.get(code, 0) + 1
+                self.http_versions[r.http_version] = self.http_versions.get(r.http_version, 0) + 1
+                if r.status_code == 429:
+                    # Wartezeit übernimmt der gesperrte Bucket beim nächsten acquire()
+                    bitget_limiter.penalize(path, retry_after_seconds(r.headers.get("Retry-After")))
+                    delay = 0.0
+                elif r.status_code in RETRY_STATUS:
+                    delay = self._backoff(attempt)
+                else:
+                    r.raise_for_status()
+                    return r
+                if attempt >= self.retries:
+                    r.raise_for_status()
+            attempt += 1
+            stats.retries += 1
+            if delay:
+                await asyncio.sleep(delay)
+
+    def get_metrics(self) -> dict:
+        return {
+            "http2": self.http2,
+            "open": self._client is not None and not self._client.is_closed,
+            "http_versions": self.http_versions,
+            "endpoints": {
+                path: {
+                    "latency": stats.latency.to_dict(),
+                    "status": stats.status,
+                    "retries": stats.retries,
+                    "transport_errors": stats.errors,
+                }
+                for path, stats in self._stats.items()
+            },
+        }
+
+
+# Globaler Client (Start/Stop über FastAPI-Lifecycle in core/main.py)
+bitget_rest = BitgetRestClient(
+    http2=settings.BITGET_HTTP2,
+    max_connections=settings.BITGET_HTTP_MAX_CONNECTIONS,
+    keepalive_expiry=settings.BITGET_HTTP_KEEPALIVE,
+    retries=settings.BITGET_HTTP_RETRIES,
+)
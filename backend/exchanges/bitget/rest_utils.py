@@ -2,44 +2,39 @@ import logging
 from datetime import datetime, timezone
 from typing import Optional, Dict, Any, List
 
-import httpx
+from exchanges.bitget.rest_cache import rest_cache
+from exchanges.bitget.rest_client import bitget_rest
 
-BASE_URL = "https://api.bitget.com"
 logger = logging.getLogger("bitget-rest-utils")
 
 
+async def _get(path: str, params: Optional[Dict[str, Any]] = None) -> Any:
+    """
+    GET über den gemeinsamen REST-Client (Pool, Token-Bucket, Retries); liefert das JSON.
+    Identische gleichzeitige Aufrufe teilen sich einen Request, Antworten werden je Endpoint
+    kurz gecacht (rest_cache.py) – das Ergebnis daher nicht verändern.
+    """
+    async def fetch():
+        r = await bitget_rest.get(path, params=params)
+        return r.json()
+
+    return await rest_cache.get(path, params, fetch)
+
+
 async def fetch_spot_symbols() -> List[Dict[str, Any]]:
-    async with httpx.AsyncClient(timeout=10.0) as client:
-        r = await client.get(f"{BASE_URL}/api/v2/spot/public/symbols")
-        r.raise_for_status()
-        return r.json().get("data", [])
+    return (await _get("/api/v2/spot/public/symbols")).get("data", [])
 
 
 async def fetch_futures_symbols(product_type: str) -> List[Dict[str, Any]]:
-    async with httpx.AsyncClient(timeout=10.0) as client:
-        r = await client.get(
-            f"{BASE_URL}/api/v2/mix/market/contracts",
-            params={"productType": product_type}
-        )
-        r.raise_for_status()
-        return r.json().get("data", [])
+    return (await _get("/api/v2/mix/market/contracts", params={"productType": product_type})).get("data", [])
 
 
 async def fetch_spot_tickers() -> List[Dict[str, Any]]:
-    async with httpx.AsyncClient(timeout=10.0) as client:
-        r = await client.get(f"{BASE_URL}/api/spot/v1/market/tickers")
-        r.raise_for_status()
-        return r.json().get("data", [])
+    return (await _get("/api/spot/v1/market/tickers")).get("data", [])
 
 
 async def fetch_futures_tickers(product_type: str) -> List[Dict[str, Any]]:
-    async with httpx.AsyncClient(timeout=10.0) as client:
-        r = await client.get(
-            f"{BASE_URL}/api/mix/v1/market/tickers",
-            params={"productType": product_type}
-        )
-        r.raise_for_status()
-        return r.json().get("data", [])
+    return (await _get("/api/mix/v1/market/tickers", params={"productType": product_type})).get("data", [])
 
 
 async def fetch_orderbook(
@@ -54,40 +49,120 @@ async def fetch_orderbook(
     - Coin-M: symbol_DMCBL, type=step0
     """
     symbol_up = symbol.replace("_", "").upper()
-    async with httpx.AsyncClient(timeout=10.0) as client:
-        if market_type == "spot":
-            url = f"{BASE_URL}/api/spot/v1/market/depth"
-            params = {
-                "symbol": f"{symbol_up}_SPBL",
-                "type": "step0",
-                "limit": limit
-            }
-
-        elif market_type == "usdtm":
-            url = f"{BASE_URL}/api/mix/v1/market/depth"
-            params = {
-                "symbol": f"{symbol_up}_UMCBL",
-                "type": "step0",
-                "limit": limit
-            }
-
-        elif market_type == "coinm":
-            url = f"{BASE_URL}/api/mix/v1/market/depth"
-            params = {
-                "symbol": f"{symbol_up}_DMCBL",
-                "type": "step0",
-                "limit": limit
-            }
-
-        else:
-            raise ValueError(f"Unbekannter market_type: {market_type!r}")
-
-        r = await client.get(url, params=params)
-        r.raise_for_status()
-        payload = r.json()
-        data = payload.get("data", {})
-        # data["asks"] und data["bids"] sind Listen von [price, size]
-        return {"asks": data.get("asks", []), "bids": data.get("bids", [])}
+    if market_type == "spot":
+        path = "/api/spot/v1/market/depth"
+        params = {
+            "symbol": f"{symbol_up}_SPBL",
+            "type": "step0",
+            "limit": limit
+        }
+
+    elif market_type == "usdtm":
+        path = "/api/mix/v1/market/depth"
+        params = {
+            "symbol": f"{symbol_up}_UMCBL",
+            "type": "step0",
+            "limit": limit
+        }
+
+    elif market_type == "coinm":
+        path = "/api/mix/v1/market/depth"
+        params = {
+            "symbol": f"{symbol_up}_DMCBL",
+            "type": "step0",
+            "limit": limit
+        }
+
+    else:
+        raise ValueError(f"Unbekannter market_type: {market_type!r}")
+
+    data = (await _get(path, params=params)).get("data", {})
+    # data["asks"] und data["bids"] sind Listen von [price, size]
+    return {"asks": data.get("asks", []), "bids": data.get("bids", [])}
+
+
+# market -> productType der v2-Futures-Endpunkte
+FUTURES_PRODUCT_TYPES = {
+    "usdtm": "USDT-FUTURES", "umcbl": "USDT-FUTURES",
+    "coinm": "COIN-FUTURES", "dmcbl": "COIN-FUTURES",
+    "usdcm": "USDC-FUTURES", "cmcbl": "USDC-FUTURES",
+}
+# Märkte, unter denen Futures in trades/bars gespeichert werden
+FUTURES_MARKETS = ("usdtm", "coinm", "usdcm")
+
+
+# Listing-Zeitpunkt in den Symbol-Metadaten (Futures: launchTime, Spot: openTime); fehlt er, gilt er als unbekannt
+LISTING_FIELDS = ("launchTime", "openTime")
+
+
+async def fetch_listing_ms(symbol: str, market: str = "spot") -> Optional[int]:
+    """Listing-Zeitpunkt (epoch ms) laut Bitget-Symbolliste, None wenn unbekannt"""
+    if market == "spot":
+        rows = await fetch_spot_symbols()
+    elif market in FUTURES_PRODUCT_TYPES:
+        rows = await fetch_futures_symbols(FUTURES_PRODUCT_TYPES[market])
+    else:
+        raise ValueError(f"Unbekannter market: {market!r}")
+    symbol_up = symbol.replace("_", "").upper()
+    for row in rows:
+        if row.get("symbol") != symbol_up:
+            continue
+        for field in LISTING_FIELDS:
+            try:
+                listing_ms = int(row.get(field) or 0)
+            except (TypeError, ValueError):
+                continue
+            if listing_ms > 0:
+                return listing_ms
+        return None
+    return None
+
+
+async def fetch_recent_fills(
+    symbol: str,
+    market: str = "spot",
+    limit: int = 500
+) -> List[Dict[str, Any]]:
+    """
+    Holt die letzten öffentlichen Trades (neueste zuerst):
+    - Spot über /api/v2/spot/market/fills (max. 500)
+    - Futures über /api/v2/mix/market/fills (max. 100)
+    Einträge: {"tradeId", "price", "size", "side", "ts"} (Strings, ts in ms)
+    """
+    symbol_up = symbol.replace("_", "").upper()
+    if market == "spot":
+        path = "/api/v2/spot/market/fills"
+        params = {"symbol": symbol_up, "limit": min(limit, 500)}
+    elif market in FUTURES_PRODUCT_TYPES:
+        path = "/api/v2/mix/market/fills"
+        params = {"symbol": symbol_up, "productType": FUTURES_PRODUCT_TYPES[market], "limit": min(limit, 100)}
+    else:
+        raise ValueError(f"Unbekannter market: {market!r}")
+
+    return (await _get(path, params=params)).get("data", [])
+
+
+# v2-Futures-Kerzen (auch für den Backfill, exchanges/bitget/backfill.py)
+MIX_HISTORY_CANDLES = "/api/v2/mix/market/history-candles"
+
+
+def mix_granularity(resolution: str) -> str:
+    """'1m' bleibt, Stunden/Tage/Wochen groß: '1h' -> '1H', '1d' -> '1D', '1w' -> '1W'"""
+    unit = resolution[-1:]
+    return resolution[:-1] + unit.upper() if unit in ("h", "d", "w") else resolution
+
+
+def futures_candles_params(symbol: str, market: str, resolution: str, end_ts: int, limit: int) -> Dict[str, Any]:
+    """Query-Parameter für MIX_HISTORY_CANDLES (max. 200 Kerzen je Seite, neueste vor endTime)"""
+    if market not in FUTURES_PRODUCT_TYPES:
+        raise ValueError(f"Unbekannter market: {market!r}")
+    return {
+        "symbol": symbol.replace("_", "").upper(),
+        "productType": FUTURES_PRODUCT_TYPES[market],
+        "granularity": mix_granularity(resolution),
+        "endTime": end_ts,
+        "limit": min(limit, 200),
+    }
 
 
 async def fetch_ohlc(
@@ -100,40 +175,25 @@ async def fetch_ohlc(
     """
     Holt OHLC-Candles:
     - Spot über /api/v2/spot/public/candles
-    - Futures (USDT-M & Coin-M) über /api/mix/v1/market/history-candles
+    - Futures (USDT-M, Coin-M, USDC-M) über /api/v2/mix/market/history-candles
     """
-    end_ts = int((end_time or datetime.now(timezone.utc)).timestamp() * 1000)
+    if end_time is None:
+        # auf die nächste volle Sekunde: gleiche Kerzen, aber ein gemeinsamer Cache-Schlüssel je Sekunde
+        end_ts = -(-int(datetime.now(timezone.utc).timestamp() * 1000) // 1000) * 1000
+    else:
+        end_ts = int(end_time.timestamp() * 1000)
     symbol_up = symbol.replace("_", "").upper()
 
-    async with httpx.AsyncClient(timeout=10.0) as client:
-        if market == "spot":
-            url = f"{BASE_URL}/api/v2/spot/public/candles"
-            params = {
-                "symbol": symbol_up,
-                "period": resolution,
-                "endTime": end_ts,
-                "limit": limit,
-            }
-        elif market in ("usdtm", "coinm"):
-            # Für beide FUTURES verwenden wir denselben Endpoint
-            url = f"{BASE_URL}/api/mix/v1/market/history-candles"
-            # Bitget erwartet hier eine numerische Granularität in Sekunden
-            # 1m -> 60, 1h -> 3600, 1d -> 86400, etc.
-            # Wir extrahieren nur die Zahl und die Einheit:
-            unit = resolution[-1]
-            qty = int(resolution[:-1])
-            factor = {"s": 1, "m": 60, "h": 3600, "d": 86400}[unit]
-            granularity = qty * factor
-
-            params = {
-                "symbol": symbol_up,
-                "granularity": granularity,
-                "endTime": end_ts,
-                "limit": limit,
-            }
-        else:
-            raise ValueError(f"Unbekannter market: {market!r}")
-
-        r = await client.get(url, params=params)
-        r.raise_for_status()
-        return r.json().get("data", [])
+    if market == "spot":
+        path = "/api/v2/spot/public/candles"
+        params = {
+            "symbol": symbol_up,
+            "period": resolution,
+            "endTime": end_ts,
+            "limit": limit,
+        }
+    else:
+        path = MIX_HISTORY_CANDLES
+        params = futures_candles_params(symbol, market, resolution, end_ts, limit)
+
+    return (await _get(path, params=params)).get("data", [])
@@ -0,0 +1,276 @@
+"""
+Collector-Supervisor: startet die Live-Ingestion für alle store_live-Symbole aus
+coin_settings, unabhängig davon, ob gerade jemand im Browser zuschaut.
+
+- Die Symbole werden per Consistent Hashing auf COLLECTOR_WORKERS Prozesse verteilt
+  (ändert sich die Worker-Zahl, wandert nur ein kleiner Teil der Symbole um).
+- Jeder Worker ist ein eigener Prozess mit eigenem BitgetMuxCollector, Batch-Writer und
+  ClickHouse-Pool – ein hängendes Symbol oder ein Parser-Fehler trifft nur diesen Shard,
+  und die Ingestion skaliert über mehrere Kerne.
+- Stirbt ein Worker, wird er mit exponentiellem Backoff (plus Jitter) neu gestartet.
+- PUT /settings ruft refresh() auf, zusätzlich wird alle COLLECTOR_REFRESH_INTERVAL s neu gelesen.
+"""
+import asyncio
+import bisect
+import hashlib
+import logging
+import multiprocessing as mp
+import queue
+import random
+import time
+import traceback
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from core.config import settings
+from db.clickhouse import fetch_coin_settings_async
+
+logger = logging.getLogger("collector-supervisor")
+
+SymbolKey = Tuple[str, str]  # (symbol, market)
+
+
+def _hash(value: str) -> int:
+    return int.from_bytes(hashlib.md5(value.encode()).digest()[:8], "big")
+
+
+class ConsistentHashRing:
+    """Hash-Ring mit virtuellen Knoten je Shard"""
+    def __init__(self, shards: Iterable[int], vnodes: int = 64):
+        points = sorted((_hash(f"shard-{shard}#{v}"), shard) for shard in shards for v in range(vnodes))
+        self._hashes = [h for h, _ in points]
+        self._shards = [s for _, s in points]
+
+    def shard_for(self, key: str) -> int:
+        i = bisect.bisect(self._hashes, _hash(key)) % len(self._hashes)
+        return self._shards[i]
+
+
+def desired_symbols(coin_settings: List[dict]) -> Set[SymbolKey]:
+    """coin_settings ist ein MergeTree mit Upserts als neuen Zeilen -> jeweils die neueste Zeile zählt"""
+    latest: Dict[SymbolKey, dict] = {}
+    for row in coin_settings:
+        key = (row["symbol"], row.get("market") or "spot")
+        current = latest.get(key)
+        if current is None or (row.get("updated_at") or datetime.min) >= (current.get("updated_at") or datetime.min):
+            latest[key] = row
+    return {key for key, row in latest.items() if int(row.get("store_live") or 0)}
+
+
+# ----- Worker-Prozess -----
+
+def run_worker(shard_id: int, commands: "mp.Queue", status: "mp.Queue", status_interval: float = 5.0):
+    """Einstiegspunkt des Worker-Prozesses (spawn): bekommt Symbol-Sets über commands"""
+    logging.basicConfig(level=logging.INFO, format=f"%(asctime)s %(levelname)s [shard {shard_id}] %(message)s")
+    asyncio.run(_worker_main(shard_id, commands, status, status_interval))
+
+
+async def _worker_main(shard_id: int, commands: "mp.Queue", status: "mp.Queue", status_interval: float):
+    from exchanges.bitget.collector import BitgetMuxCollector
+    from exchanges.bitget.rest_client import bitget_rest
+    from db.writer import batch_writer
+
+    collector = BitgetMuxCollector(persist=True)
+    await batch_writer.start()
+    current: Set[SymbolKey] = set()
+
+    async def report():
+        while True:
+            await asyncio.sleep(status_interval)
+            try:
+                status.put_nowait({
+                    "shard": shard_id,
+                    "ts": time.time(),
+                    "symbols": len(current),
+                    "collector": collector.get_metrics(),
+                    "writer": batch_writer.get_metrics(),
+                })
+            except queue.Full:
+                pass
+
+    reporter = asyncio.create_task(report())
+    try:
+        while True:
+            cmd = await asyncio.to_thread(commands.get)
+            if cmd is None:
+                break
+            desired = {tuple(k) for k in cmd}
+            for symbol, market in sorted(desired - current):
+                await collector.add(symbol, market)
+            for symbol, market in sorted(current - desired):
+                await collector.remove(symbol, market)
+            current = desired
+            logger.info(f"Shard {shard_id}: {len(current)} symbols")
+    finally:
+        reporter.cancel()
+        await collector.stop()
+        await bitget_rest.close()
+        await batch_writer.stop()
+
+
+# ----- Supervisor (API-Prozess) -----
+
+class _Shard:
+    def __init__(self, shard_id: int):
+        self.shard_id = shard_id
+        self.process: Optional[mp.Process] = None
+        self.commands: Optional[mp.Queue] = None
+        self.symbols: Set[SymbolKey] = set()
+        self.started_at = 0.0
+        self.next_start = 0.0
+        self.failures = 0
+        self.restarts = 0
+        self.last_status: Optional[dict] = None
+
+
+class CollectorSupervisor:
+    def __init__(self, workers: int, refresh_interval_s: float = 60.0, backoff_base_s: float = 1.0,
+                 backoff_max_s: float = 60.0, stable_after_s: float = 60.0):
+        self.workers = workers
+        self._refresh_interval_s = refresh_interval_s
+        self._backoff_base_s = backoff_base_s
+        self._backoff_max_s = backoff_max_s
+        self._stable_after_s = stable_after_s
+        self._ctx = mp.get_context("spawn")
+        self._ring = ConsistentHashRing(range(max(workers, 1)))
+        self._shards = [_Shard(i) for i in range(workers)]
+        self._status: Optional[mp.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._lock = asyncio.Lock()
+        self._last_refresh = 0.0
+        self.running = False
+
+    def shard_for(self, symbol: str, market: str) -> int:
+        return self._ring.shard_for(f"{symbol}_{market}")
+
+    async def start(self):
+        if self.running or self.workers <= 0:
+            return
+        self.running = True
+        self._status = self._ctx.Queue(maxsize=1000)
+        for shard in self._shards:
+            self._spawn(shard)
+        await self.refresh()
+        self._task = asyncio.create_task(self._monitor_loop())
+        logger.info(f"Collector supervisor started with {self.workers} workers")
+
+    async def stop(self):
+        if not self.running:
+            return
+        self.running = False
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        for shard in self._shards:
+            if shard.process is not None and shard.process.is_alive():
+                shard.commands.put(None)
+        for shard in self._shards:
+            if shard.process is not None:
+                await asyncio.to_thread(shard.process.join, 10)
+                if shard.process.is_alive():
+                    shard.process.terminate()
+        logger.info("Collector supervisor stopped")
+
+    def _spawn(self, shard: _Shard):
+        shard.commands = self._ctx.Queue()
+        shard.process = self._ctx.Process(
+            target=run_worker, args=(shard.shard_id, shard.commands, self._status),
+            name=f"collector-shard-{shard.shard_id}", daemon=True,
+        )
+        shard.process.start()
+        shard.started_at = time.time()
+        shard.commands.put(sorted(shard.symbols))
+        logger.info(f"Started collector shard {shard.shard_id} (pid {shard.process.pid}, {len(shard.symbols)} symbols)")
+
+    async def refresh(self):
+        """coin_settings neu lesen und store_live-Symbole auf die Shards (neu) verteilen"""
+        if not self.running:
+            return
+        async with self._lock:
+            rows = await fetch_coin_settings_async()
+            if not rows and any(s.symbols for s in self._shards):
+                # fetch_coin_settings liefert bei DB-Fehlern [] – dann lieber nichts abbauen
+                logger.warning("Collector rebalance skipped: no coin_settings rows")
+                return
+            desired = desired_symbols(rows)
+            assignment: Dict[int, Set[SymbolKey]] = {s.shard_id: set() for s in self._shards}
+            for symbol, market in desired:
+                assignment[self.shard_for(symbol, market)].add((symbol, market))
+            for shard in self._shards:
+                new = assignment[shard.shard_id]
+                if new != shard.symbols:
+                    shard.symbols = new
+                    if shard.process is not None and shard.process.is_alive():
+                        shard.commands.put(sorted(new))
+            self._last_refresh = time.time()
+            logger.info(f"Collector rebalance: {len(desired)} store_live symbols -> "
+                        f"{[len(s.symbols) for s in self._shards]}")
+
+    def _check_shards(self):
+        now = time.time()
+        for shard in self._shards:
+            proc = shard.process
+            if proc is not None and not proc.is_alive():
+                ran = now - shard.started_at
+                shard.failures = 1 if ran >= self._stable_after_s else shard.failures + 1
+                delay = min(self._backoff_max_s, self._backoff_base_s * 2 ** (shard.failures - 1))
+                delay *= random.uniform(0.8, 1.2)
+                shard.next_start = now + delay
+                shard.process = None
+                logger.error(f"Collector shard {shard.shard_id} died (exit {proc.exitcode}) after {ran:.0f}s, "
+                             f"restart in {delay:.1f}s")
+            if shard.process is None and now >= shard.next_start:
+                shard.restarts += 1
+                self._spawn(shard)
+
+    def _drain_status(self):
+        while True:
+            try:
+                status = self._status.get_nowait()
+            except queue.Empty:
+                return
+            self._shards[status["shard"]].last_status = status
+
+    async def _monitor_loop(self):
+        while self.running:
+            try:
+                await asyncio.sleep(1.0)
+                self._drain_status()
+                self._check_shards()
+                if time.time() - self._last_refresh >= self._refresh_interval_s:
+                    await self.refresh()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Collector supervisor error: {e}")
+                traceback.print_exc()
+
+    def get_metrics(self) -> dict:
+        return {
+            "running": self.running,
+            "workers": self.workers,
+            "shards": [
+                {
+                    "shard": s.shard_id,
+                    "pid": s.process.pid if s.process is not None else None,
+                    "alive": s.process is not None and s.process.is_alive(),
+                    "symbols": len(s.symbols),
+                    "restarts": s.restarts,
+                    "failures": s.failures,
+                    "uptime_s": round(time.time() - s.started_at) if s.process is not None else 0,
+                    "status": s.last_status,
+                }
+                for s in self._shards
+            ],
+        }
+
+
+# Globale Instanz (main.py startet sie, PUT /settings ruft refresh())
+collector_supervisor = CollectorSupervisor(
+    settings.COLLECTOR_WORKERS,
+    refresh_interval_s=settings.COLLECTOR_REFRESH_INTERVAL,
+    backoff_max_s=settings.COLLECTOR_BACKOFF_MAX,
+)
@@ -0,0 +1,235 @@
+"""
+Live-Ticker aller Symbole über den Bitget-WS-Channel "ticker".
+
+- BitgetTickerCollector: Mux-Collector auf dem ticker-Channel, abonniert alle handelbaren
+  Symbole der konfigurierten Märkte (Symbollisten per REST beim Start).
+- TickerTable: kompakte NumPy-Tabelle (eine Zeile je (symbol, market)); ein Update
+  markiert die Zeile nur, wenn sich ein Wert wirklich geändert hat.
+- LiveTickerService: sammelt geänderte Zeilen und verteilt sie alle TICKER_WS_FLUSH_INTERVAL s
+  als ein ticker_delta über den Bus (Topic "tickers"), einmal serialisiert für alle Clients.
+  Läuft nur, solange /ws/tickers-Clients verbunden sind (Start-/Stop-Hook des Busses).
+"""
+import asyncio
+import logging
+import time
+import traceback
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import orjson
+
+from core.config import settings
+from core.ws.bus import TradeBus, trade_bus
+from exchanges.bitget.collector import BitgetMuxCollector
+from exchanges.bitget.rest_utils import FUTURES_PRODUCT_TYPES, fetch_spot_symbols, fetch_futures_symbols
+
+logger = logging.getLogger("bitget-tickers")
+
+TOPIC = "tickers"
+# Spalten der Tabelle und der Zeilen in ticker_snapshot/ticker_delta (nach symbol, market)
+FIELDS = ("last", "high24h", "low24h", "baseVol", "quoteVol", "changeRate")
+ROW_FIELDS = ("symbol", "market", *FIELDS, "ts")
+
+
+def parse_ticker(entry: dict) -> Tuple[Tuple[float, ...], int]:
+    """Bitget-Ticker (Spot oder Mix, v1) -> (Werte in FIELDS-Reihenfolge, ts in ms)"""
+    last = float(entry.get("last") or 0)
+    if entry.get("priceChangePercent") not in (None, ""):
+        change = float(entry["priceChangePercent"])
+    else:
+        open24h = float(entry.get("open24h") or 0)
+        change = last / open24h - 1 if open24h else 0.0
+    values = (
+        last,
+        float(entry.get("high24h") or 0),
+        float(entry.get("low24h") or 0),
+        float(entry.get("baseVolume") or 0),
+        float(entry.get("quoteVolume") or 0),
+        change,
+    )
+    return values, int(entry.get("ts") or entry.get("systemTime") or time.time() * 1000)
+
+
+class TickerTable:
+    """
+    Spaltenblock values[n, len(FIELDS)] (float64) plus ts[n] (int64); die Zuordnung
+    (symbol, market) -> Zeile steht in index. Kapazität wächst bei Bedarf (Verdopplung).
+    """
+    def __init__(self, capacity: int = 2048):
+        self.values = np.full((capacity, len(FIELDS)), np.nan, dtype=np.float64)
+        self.ts = np.zeros(capacity, dtype=np.int64)
+        self.index: Dict[Tuple[str, str], int] = {}
+        self.keys: List[Tuple[str, str]] = []
+        self.dirty: set = set()
+        self.seq = 0          # Sequenz des letzten veröffentlichten Deltas
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def _row(self, key: Tuple[str, str]) -> int:
+        row = self.index.get(key)
+        if row is None:
+            row = len(self.keys)
+            if row == len(self.ts):
+                self.values = np.concatenate([self.values, np.full_like(self.values, np.nan)])
+                self.ts = np.concatenate([self.ts, np.zeros_like(self.ts)])
+            self.index[key] = row
+            self.keys.append(key)
+        return row
+
+    def update(self, key: Tuple[str, str], values: Tuple[float, ...], ts_ms: int) -> bool:
+        """True, wenn sich mindestens ein Wert geändert hat (Zeile wird dann als dirty markiert)"""
+        row = self._row(key)
+        current = self.values[row]
+        if ts_ms < self.ts[row] or np.array_equal(current, values):
+            return False
+        current[:] = values
+        self.ts[row] = ts_ms
+        self.dirty.add(row)
+        return True
+
+    def rows(self, rows=None) -> List[list]:
+        """Zeilen als [symbol, market, *FIELDS, ts]; ohne rows die ganze Tabelle"""
+        if rows is None:
+            rows = range(len(self.keys))
+        idx = np.fromiter(rows, dtype=np.int64)
+        values = self.values[idx].tolist()
+        ts = self.ts[idx].tolist()
+        return [[*self.keys[r], *v, t] for r, v, t in zip(idx.tolist(), values, ts)]
+
+    def take_dirty(self) -> List[list]:
+        rows, self.dirty = sorted(self.dirty), set()
+        return self.rows(rows) if rows else []
+
+    def clear(self):
+        self.values[:] = np.nan
+        self.ts[:] = 0
+        self.index.clear()
+        self.keys.clear()
+        self.dirty.clear()
+
+
+class BitgetTickerCollector(BitgetMuxCollector):
+    """Mux-Collector für den ticker-Channel; jedes Update geht an on_ticker(key, data), nichts wird persistiert"""
+    def __init__(self, on_ticker, **kwargs):
+        super().__init__(channel="ticker", persist=False, **kwargs)
+        self._on_ticker = on_ticker
+
+    async def _dispatch(self, key: Tuple[str, str], action: str, data: list):
+        self._on_ticker(key, data)
+
+
+class LiveTickerService:
+    def __init__(self, bus: TradeBus, markets: Tuple[str, ...], flush_interval_s: float = 0.25,
+                 per_connection: int = 100):
+        self._bus = bus
+        self.markets = markets
+        self.flush_interval_s = flush_interval_s
+        self.table = TickerTable()
+        self._collector = BitgetTickerCollector(self._on_ticker, max_per_connection=per_connection)
+        self._flusher: Optional[asyncio.Task] = None
+        self.running = False
+        self.metrics = {"updates": 0, "changed": 0, "deltas": 0, "delta_rows": 0, "delta_bytes": 0,
+                        "symbol_errors": 0}
+
+    async def _symbols(self) -> List[Tuple[str, str]]:
+        """Alle handelbaren (symbol, market) der konfigurierten Märkte"""
+        keys = []
+        for market in self.markets:
+            try:
+                if market == "spot":
+                    keys += [(s["symbol"], market) for s in await fetch_spot_symbols()
+                             if s.get("status", "online") == "online"]
+                else:
+                    keys += [(s["symbol"], market) for s in await fetch_futures_symbols(FUTURES_PRODUCT_TYPES[market])
+                             if s.get("symbolStatus", "normal") == "normal"]
+            except Exception as e:
+                self.metrics["symbol_errors"] += 1
+                logger.error(f"[LiveTickers] Symbol list for {market} failed: {e}")
+        return keys
+
+    async def start(self):
+        """Start-Hook des Busses (erster /ws/tickers-Client)"""
+        if self.running:
+            return
+        self.running = True
+        keys = await self._symbols()
+        # add() wartet nicht auf die Verbindung: alle instIds stehen fest, bevor sie verbinden,
+        # und werden dann in Blöcken abonniert
+        for symbol, market in keys:
+            await self._collector.add(symbol, market)
+        self._flusher = asyncio.create_task(self._flush_loop())
+        logger.info(f"[LiveTickers] Subscribed {len(keys)} tickers ({', '.join(self.markets)})")
+
+    async def stop(self):
+        """Stop-Hook des Busses (letzter Client weg): Verbindungen schließen, Tabelle leeren"""
+        if not self.running:
+            return
+        self.running = False
+        if self._flusher:
+            self._flusher.cancel()
+            try:
+                await self._flusher
+            except asyncio.CancelledError:
+                pass
+            self._flusher = None
+        await self._collector.stop()
+        self.table.clear()
+
+    def _on_ticker(self, key: Tuple[str, str], data: list):
+        for entry in data:
+            try:
+                values, ts_ms = parse_ticker(entry)
+            except (TypeError, ValueError):
+                logger.error(f"[LiveTickers] Bad ticker {key}:\n{traceback.format_exc()}")
+                continue
+            self.metrics["updates"] += 1
+            if self.table.update(key, values, ts_ms):
+                self.metrics["changed"] += 1
+
+    def flush(self) -> int:
+        """Geänderte Zeilen als ein ticker_delta veröffentlichen; liefert die Zeilenzahl"""
+        rows = self.table.take_dirty()
+        if not rows:
+            return 0
+        self.table.seq += 1
+        text = orjson.dumps({"type": "ticker_delta", "seq": self.table.seq, "rows": rows}).decode()
+        self._bus.publish(TOPIC, {"type": "ticker_delta", "seq": self.table.seq, "text": text})
+        self.metrics["deltas"] += 1
+        self.metrics["delta_rows"] += len(rows)
+        self.metrics["delta_bytes"] += len(text)
+        return len(rows)
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self.flush_interval_s)
+            try:
+                self.flush()
+            except Exception:
+                logger.error(f"[LiveTickers] Flush failed:\n{traceback.format_exc()}")
+
+    def snapshot(self) -> Tuple[int, str]:
+        """(seq, ticker_snapshot als JSON); Deltas mit seq <= diesem sind darin enthalten"""
+        self.flush()
+        seq = self.table.seq
+        return seq, orjson.dumps({"type": "ticker_snapshot", "seq": seq, "fields": ROW_FIELDS,
+                                  "rows": self.table.rows()}).decode()
+
+    def get_metrics(self) -> dict:
+        return {
+            "running": self.running,
+            "rows": len(self.table),
+            "seq": self.table.seq,
+            "subscribers": self._bus.subscriber_count(TOPIC),
+            **self.metrics,
+            "collector": self._collector.get_metrics(),
+        }
+
+
+# Globale Instanz (/ws/tickers)
+live_tickers = LiveTickerService(
+    trade_bus,
+    tuple(m.strip() for m in settings.TICKER_WS_MARKETS.split(",") if m.strip()),
+    settings.TICKER_WS_FLUSH_INTERVAL,
+    settings.TICKER_WS_PER_CONNECTION,
+)
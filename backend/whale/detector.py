@@ -9,18 +9,12 @@ from typing import Dict, Any, Optional
 from web3 import Web3
 from web3.middleware import geth_poa_middleware
 from whale.settings import fetch_active_coin_map
-import clickhouse_connect
+from db.pool import get_client
 
 # Logging
 logging.basicConfig(level=logging.INFO, format='[%(asctime)s] [%(levelname)s] %(message)s')
 logger = logging.getLogger(__name__)
 
-CLICKHOUSE_HOST = os.getenv("CLICKHOUSE_HOST", "localhost")
-CLICKHOUSE_PORT = int(os.getenv("CLICKHOUSE_PORT", "8123"))
-CLICKHOUSE_USER = "default"
-CLICKHOUSE_PASSWORD = ""
-CLICKHOUSE_DB = "bitget"
-
 ETHEREUM_NODE_URL = os.getenv("ETHEREUM_NODE_URL", "wss://mainnet.infura.io/ws/v3/YOUR_INFURA_PROJECT_ID")
 CHAIN = "ethereum"
 
@@ -36,23 +30,9 @@ def heartbeat():
 def is_detector_alive(timeout=60):
     return (int(time.time()) - _detector_last_heartbeat) < timeout
 
-def get_client():
-    try:
-        return clickhouse_connect.get_client(
-            host=CLICKHOUSE_HOST,
-            port=CLICKHOUSE_PORT,
-            username=CLICKHOUSE_USER,
-            password=CLICKHOUSE_PASSWORD,
-            database=CLICKHOUSE_DB,
-        )
-    except Exception as e:
-        logger.error(f"Failed to create ClickHouse client: {e}")
-        traceback.print_exc()
-        raise
 
 def insert_whale_event(event: Dict[str, Any]):
     try:
-        client = get_client()
         sql = """
         INSERT INTO whale_events (
             event_id, ts, chain, tx_hash, from_addr, to_addr,
@@ -63,7 +43,8 @@ def insert_whale_event(event: Dict[str, Any]):
             %(token)s, %(symbol)s, %(amount)s, %(is_native)s, %(exchange)s
         )
         """
-        client.command(sql, event)
+        with get_client() as client:
+            client.command(sql, event)
         logger.info(f"[WHLE_EVENT] {event['symbol']} {event['amount']} ({event['exchange']}) {event['tx_hash'][:10]}...")
     except Exception as e:
         logger.error(f"Failed to insert whale_event: {e}")
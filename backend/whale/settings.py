@@ -1,36 +1,15 @@
 # /backend/whale/settings.py
 
-import clickhouse_connect
-import os
 import logging
 import traceback
 from typing import List, Dict, Any, Optional
 
+from db.pool import get_client
+
 # Structured logging
 logging.basicConfig(level=logging.INFO, format='[%(asctime)s] [%(levelname)s] %(message)s')
 logger = logging.getLogger(__name__)
 
-CLICKHOUSE_HOST = os.getenv("CLICKHOUSE_HOST", "localhost")
-CLICKHOUSE_PORT = int(os.getenv("CLICKHOUSE_PORT", "8123"))
-CLICKHOUSE_USER = "default"
-CLICKHOUSE_PASSWORD = ""
-CLICKHOUSE_DB = "bitget"
-
-def get_client():
-    """Get ClickHouse client with error handling"""
-    try:
-        return clickhouse_connect.get_client(
-            host=CLICKHOUSE_HOST,
-            port=CLICKHOUSE_PORT,
-            username=CLICKHOUSE_USER,
-            password=CLICKHOUSE_PASSWORD,
-            database=CLICKHOUSE_DB,
-        )
-    except Exception as e:
-        logger.error(f"Failed to create ClickHouse client: {e}")
-        traceback.print_exc()
-        raise
-
 # --- Coins: Insert or Update ---
 def upsert_coin(
     symbol: str,
@@ -44,24 +23,24 @@ def upsert_coin(
     Insert or update a coin mapping.
     """
     try:
-        client = get_client()
         sql = """
         INSERT INTO coins
         (symbol, chain, contract_addr, is_native, exchange, active)
         VALUES
         (%(symbol)s, %(chain)s, %(contract_addr)s, %(is_native)s, %(exchange)s, %(active)s)
         """
-        client.command(
-            sql,
-            {
-                "symbol": symbol,
-                "chain": chain,
-                "contract_addr": contract_addr,
-                "is_native": is_native,
-                "exchange": exchange,
-                "active": active,
-            }
-        )
+        with get_client() as client:
+            client.command(
+                sql,
+                {
+                    "symbol": symbol,
+                    "chain": chain,
+                    "contract_addr": contract_addr,
+                    "is_native": is_native,
+                    "exchange": exchange,
+                    "active": active,
+                }
+            )
         logger.info(f"Upserted coin: {symbol}/{chain} (exchange={exchange}, active={active})")
     except Exception as e:
         logger.error(f"Error upserting coin {symbol}/{chain}: {e}")
@@ -79,7 +58,6 @@ def fetch_coins(
     Fetch coin mappings with optional filters.
     """
     try:
-        client = get_client()
         sql = "SELECT symbol, chain, contract_addr, is_native, exchange, active FROM coins"
         conditions = []
         params = {}
@@ -98,7 +76,8 @@ def fetch_coins(
         if conditions:
             sql += " WHERE " + " AND ".join(conditions)
         sql += " ORDER BY symbol, chain"
-        result = client.query(sql, params)
+        with get_client() as client:
+            result = client.query(sql, params)
         coins = [dict(zip(result.column_names, row)) for row in result.result_rows]
         logger.info(f"Fetched {len(coins)} coins (filters: {params})")
         return coins
@@ -113,9 +92,9 @@ def delete_coin(symbol: str, chain: str):
     Delete a coin mapping.
     """
     try:
-        client = get_client()
         sql = "ALTER TABLE coins DELETE WHERE symbol = %(symbol)s AND chain = %(chain)s"
-        client.command(sql, {"symbol": symbol, "chain": chain})
+        with get_client() as client:
+            client.command(sql, {"symbol": symbol, "chain": chain})
         logger.info(f"Deleted coin: {symbol}/{chain}")
     except Exception as e:
         logger.error(f"Error deleting coin {symbol}/{chain}: {e}")